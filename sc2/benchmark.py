@@ -0,0 +1,317 @@
+"""
+Benchmarks of the hot paths of the library that run without the SC2 client by replaying a capture file (see capture.py).
+The capture needs to contain the ResponseData, ResponseGameInfo and the ResponseObservation messages of a game.
+
+Usage::
+
+    python -m sc2.benchmark game.sc2cap
+    python -m sc2.benchmark game.sc2cap --save-baseline benchmark_baseline.json
+    python -m sc2.benchmark game.sc2cap --baseline benchmark_baseline.json --max-regression 0.15
+
+The last command exits with code 1 if a benchmark is slower than the baseline by more than the allowed fraction,
+so it can be used as a regression gate on a CI machine.
+
+Besides the operations per second, the report shows per operation the peak of memory allocated while it runs
+('peak KiB/op', from tracemalloc) and the change of the number of allocated memory blocks ('blocks/op', from
+sys.getallocatedblocks), i.e. the objects an operation allocated and did not free again.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Coroutine, Dict, Iterable, List, Optional, Tuple, Union
+
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from sc2.bot_ai import BotAI
+from sc2.capture import read_responses
+from sc2.game_data import GameData
+from sc2.game_info import GameInfo
+from sc2.game_state import GameState
+from sc2.pixel_map import PixelMap
+
+# A benchmark operation: an untimed setup function (or None) and the timed function
+Operation = Tuple[Optional[Callable[[], Any]], Callable[[], Any]]
+
+
+class CapturedGame:
+    """ The responses of one game that are needed to replay it without the SC2 client. """
+
+    def __init__(self, responses: Iterable[sc_pb.Response]):
+        """
+        :param responses:
+        """
+        self.response_data: Optional[sc_pb.Response] = None
+        self.response_game_info: Optional[sc_pb.Response] = None
+        self.observations: List[sc_pb.ResponseObservation] = []
+        self.base_build: int = -1
+        for response in responses:
+            if response.HasField("data"):
+                self.response_data = response
+            elif response.HasField("game_info"):
+                # The first game info has the map without structures, like main.py uses it for the first step
+                if self.response_game_info is None:
+                    self.response_game_info = response
+            elif response.HasField("observation"):
+                self.observations.append(response.observation)
+            elif response.HasField("ping"):
+                self.base_build = response.ping.base_build
+        assert self.response_data is not None, "Capture does not contain a ResponseData"
+        assert self.response_game_info is not None, "Capture does not contain a ResponseGameInfo"
+        assert self.observations, "Capture does not contain any ResponseObservation"
+        self.player_id: int = self.observations[0].observation.player_common.player_id
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path], max_frames: Optional[int] = None) -> CapturedGame:
+        """
+        :param path:
+        :param max_frames: only keep the first 'max_frames' observations
+        """
+        game = cls(read_responses(path))
+        if max_frames is not None:
+            game.observations = game.observations[:max_frames]
+        return game
+
+    def new_bot(self) -> BotAI:
+        """ Returns a bot that is prepared like main.py does it before the first on_step, with the first observation. """
+        bot = _BenchmarkBot()
+        bot._initialize_variables()
+        bot._prepare_start(
+            None,
+            self.player_id,
+            GameInfo(self.response_game_info.game_info),
+            GameData(self.response_data.data),
+            base_build=self.base_build,
+        )
+        bot._prepare_step(GameState(self.observations[0]), self.response_game_info)
+        bot._prepare_first_step()
+        return bot
+
+
+class _BenchmarkBot(BotAI):
+
+    async def on_step(self, iteration: int):
+        pass
+
+
+def _run_coroutine(coroutine: Coroutine) -> Any:
+    """Runs a coroutine that does not wait for I/O without an event loop, e.g. BotAI.issue_events.
+
+    :param coroutine:
+    """
+    try:
+        coroutine.send(None)
+    except StopIteration as e:
+        return e.value
+    coroutine.close()
+    raise RuntimeError("Coroutine waited for I/O, it can not be benchmarked offline")
+
+
+def _benchmark_game_state(game: CapturedGame) -> List[Operation]:
+    return [(None, lambda obs=obs: GameState(obs)) for obs in game.observations]
+
+
+def _benchmark_prepare_step(game: CapturedGame) -> List[Operation]:
+    bot = game.new_bot()
+    states = [GameState(obs) for obs in game.observations]
+    return [(None, lambda state=state: bot._prepare_step(state)) for state in states]
+
+
+def _benchmark_prepare_units(game: CapturedGame) -> List[Operation]:
+    bot = game.new_bot()
+    states = [GameState(obs) for obs in game.observations]
+
+    def set_state(state: GameState):
+        bot.state = state
+
+    return [(lambda state=state: set_state(state), bot._prepare_units) for state in states]
+
+
+def _benchmark_issue_events(game: CapturedGame) -> List[Operation]:
+    bot = game.new_bot()
+    states = [GameState(obs) for obs in game.observations]
+    return [
+        (lambda state=state: bot._prepare_step(state), lambda: _run_coroutine(bot.issue_events())) for state in states
+    ]
+
+
+def _benchmark_units_queries(game: CapturedGame) -> List[Operation]:
+    bot = game.new_bot()
+    states = [GameState(obs) for obs in game.observations]
+
+    def queries():
+        all_units = bot.all_units
+        _ = all_units.ready, all_units.not_ready, all_units.idle, all_units.flying, all_units.not_flying
+        _ = bot.structures.ready, bot.workers.idle, bot.units.not_flying
+        if bot.townhalls:
+            townhall = bot.townhalls.first
+            _ = bot.mineral_field.closer_than(10, townhall), bot.mineral_field.closest_to(townhall)
+            _ = bot.workers.sorted_by_distance_to(townhall)
+        if bot.units and bot.all_enemy_units:
+            _ = bot.units.in_distance_of_group(bot.all_enemy_units, 10)
+            _ = bot.all_enemy_units.in_distance_of_group(bot.units, 10)
+            for unit in bot.units.take(10):
+                _ = bot.all_enemy_units.closest_to(unit), bot.all_enemy_units.in_attack_range_of(unit)
+                _ = bot.all_enemy_units.closer_than(12, unit)
+
+    return [(lambda state=state: bot._prepare_step(state), queries) for state in states]
+
+
+def _benchmark_pixel_map(game: CapturedGame) -> List[Operation]:
+    start_raw = game.response_game_info.game_info.start_raw
+
+    def pixel_maps(obs: sc_pb.ResponseObservation):
+        PixelMap(start_raw.pathing_grid, in_bits=True)
+        PixelMap(start_raw.placement_grid, in_bits=True)
+        PixelMap(start_raw.terrain_height)
+        PixelMap(obs.observation.raw_data.map_state.creep, in_bits=True)
+        PixelMap(obs.observation.raw_data.map_state.visibility)
+
+    return [(None, lambda obs=obs: pixel_maps(obs)) for obs in game.observations]
+
+
+def _benchmark_expansion_locations(game: CapturedGame) -> List[Operation]:
+    bot = game.new_bot()
+    return [(None, bot._find_expansion_locations)]
+
+
+BENCHMARKS: Dict[str, Callable[[CapturedGame], List[Operation]]] = {
+    "game_state": _benchmark_game_state,
+    "prepare_step": _benchmark_prepare_step,
+    "prepare_units": _benchmark_prepare_units,
+    "issue_events": _benchmark_issue_events,
+    "units_queries": _benchmark_units_queries,
+    "pixel_map": _benchmark_pixel_map,
+    "expansion_locations": _benchmark_expansion_locations,
+}
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    # Amount of timed operations per run, one operation per frame for most benchmarks
+    operations: int
+    # Timed seconds of the fastest run
+    seconds: float
+    # Average peak of memory allocated during one operation
+    peak_kib_per_operation: float
+    # Average amount of memory blocks that one operation allocated and did not free
+    allocated_blocks_per_operation: float
+
+    @property
+    def operations_per_second(self) -> float:
+        return self.operations / self.seconds if self.seconds else float("inf")
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "operations_per_second": self.operations_per_second,
+            "peak_kib_per_operation": self.peak_kib_per_operation,
+            "allocated_blocks_per_operation": self.allocated_blocks_per_operation,
+        }
+
+
+def run_benchmark(name: str, game: CapturedGame, repeat: int = 3) -> BenchmarkResult:
+    """Runs one benchmark 'repeat' times and keeps the fastest run, then one more time to measure memory allocations.
+
+    :param name: key of BENCHMARKS
+    :param game:
+    :param repeat:
+    """
+    best: float = float("inf")
+    operations: List[Operation] = []
+    for _ in range(repeat):
+        # Operations can depend on each other (e.g. previous units for issue_events), so they are created per run
+        operations = BENCHMARKS[name](game)
+        seconds: float = 0
+        for setup, operation in operations:
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            operation()
+            seconds += time.perf_counter() - start
+        best = min(best, seconds)
+
+    operations = BENCHMARKS[name](game)
+    peak_bytes: int = 0
+    allocated_blocks: int = 0
+    tracemalloc.start()
+    # Collections during an operation would free blocks of earlier operations
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for setup, operation in operations:
+            if setup is not None:
+                setup()
+            current_bytes, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            blocks_before = sys.getallocatedblocks()
+            operation()
+            allocated_blocks += sys.getallocatedblocks() - blocks_before
+            peak_bytes += tracemalloc.get_traced_memory()[1] - current_bytes
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+        tracemalloc.stop()
+    count = max(1, len(operations))
+    return BenchmarkResult(name, len(operations), best, peak_bytes / 1024 / count, allocated_blocks / count)
+
+
+def compare_to_baseline(results: List[BenchmarkResult], baseline: Dict[str, Dict[str, float]],
+                        max_regression: float) -> List[str]:
+    """Returns the names of the benchmarks whose operations per second dropped by more than 'max_regression'.
+
+    :param results:
+    :param baseline: content of a file written by --save-baseline
+    :param max_regression: e.g. 0.15 allows to be 15% slower than the baseline
+    """
+    return [
+        result.name for result in results if result.name in baseline and result.operations_per_second <
+        baseline[result.name]["operations_per_second"] * (1 - max_regression)
+    ]
+
+
+def main(args: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m sc2.benchmark", description=__doc__.split("\n\n")[0].strip(),
+                                     epilog=__doc__.split("\n\n")[-1].strip())
+    parser.add_argument("capture", type=Path, help="capture file of a game, see sc2/capture.py")
+    parser.add_argument("--benchmark", action="append", choices=list(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--frames", type=int, default=None, help="only replay the first FRAMES observations")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, the fastest run is reported")
+    parser.add_argument("--baseline", type=Path, help="compare against this baseline file")
+    parser.add_argument("--max-regression", type=float, default=0.15, help="allowed slowdown against the baseline")
+    parser.add_argument("--save-baseline", type=Path, help="write the results to this baseline file")
+    parsed = parser.parse_args(args)
+
+    game = CapturedGame.from_file(parsed.capture, max_frames=parsed.frames)
+    baseline: Dict[str, Dict[str, float]] = json.loads(parsed.baseline.read_text()) if parsed.baseline else {}
+
+    results: List[BenchmarkResult] = []
+    print(f"{'benchmark':<22}{'ops':>8}{'ops/s':>14}{'peak KiB/op':>14}{'blocks/op':>12}{'vs baseline':>14}")
+    for name in parsed.benchmark or BENCHMARKS:
+        result = run_benchmark(name, game, repeat=parsed.repeat)
+        results.append(result)
+        ratio = ""
+        if name in baseline:
+            ratio = f"{result.operations_per_second / baseline[name]['operations_per_second']:.2f}x"
+        print(
+            f"{name:<22}{result.operations:>8}{result.operations_per_second:>14.1f}"
+            f"{result.peak_kib_per_operation:>14.1f}{result.allocated_blocks_per_operation:>12.1f}{ratio:>14}"
+        )
+
+    if parsed.save_baseline:
+        parsed.save_baseline.write_text(json.dumps({result.name: result.to_dict() for result in results}, indent=2))
+    regressions = compare_to_baseline(results, baseline, parsed.max_regression)
+    if regressions:
+        print(f"Slower than the baseline by more than {parsed.max_regression:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
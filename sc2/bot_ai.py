@@ -1,6 +1,7 @@
 # pylint: disable=W0212,R0916,R0904
 from __future__ import annotations
 
+import itertools
 import math
 import random
 import warnings
@@ -8,27 +9,35 @@ from collections import Counter
 from functools import cached_property
 from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple, Union
 
+import numpy as np
 from loguru import logger
 
 from sc2.bot_ai_internal import BotAIInternal
 from sc2.cache import property_cache_once_per_frame
 from sc2.constants import (
+    ALL_GAS,
     CREATION_ABILITY_FIX,
     EQUIVALENTS_FOR_TECH_PROGRESS,
     PROTOSS_TECH_REQUIREMENT,
+    STRUCTURES_NOT_REQUIRING_CREEP,
+    STRUCTURES_NOT_REQUIRING_POWER,
     TERRAN_STRUCTURES_REQUIRE_SCV,
     TERRAN_TECH_REQUIREMENT,
     ZERG_TECH_REQUIREMENT,
+    abilityid_to_unittypeid,
 )
-from sc2.data import Alert, Race, Result, Target
+from sc2.data import Alert, Race, Result, Target, race_townhalls
 from sc2.dicts.unit_research_abilities import RESEARCH_INFO
 from sc2.dicts.unit_train_build_abilities import TRAIN_INFO
 from sc2.dicts.unit_trained_from import UNIT_TRAINED_FROM
 from sc2.dicts.upgrade_researched_from import UPGRADE_RESEARCHED_FROM
+from sc2.flow_field import FlowFields
 from sc2.game_data import AbilityData, Cost
 from sc2.ids.ability_id import AbilityId
-from sc2.ids.unit_typeid import UnitTypeId
+from sc2.ids.unit_typeid import UnitTypeId, unit_type_id_from_value
 from sc2.ids.upgrade_id import UpgradeId
+from sc2.pathfinding import Pathfinder
+from sc2.placement_engine import footprint_index, footprint_offset
 from sc2.position import Point2
 from sc2.unit import Unit
 from sc2.units import Units
@@ -60,7 +69,8 @@ class BotAI(BotAIInternal):
         Second value is the average step duration
         Third value is the maximum step duration - the longest the bot ever took (including on_start())
         Fourth value is the step duration the bot took last iteration
-        If called in the first iteration, it returns (inf, 0, 0, 0)"""
+        If called in the first iteration, it returns (inf, 0, 0, 0)
+        See 'self.step_profiler' for the duration of each phase of an iteration (observation, parsing, on_step, ...)"""
         avg_step_duration = (
             (self._total_time_in_on_step / self._total_steps_iterations) if self._total_steps_iterations else 0
         )
@@ -244,6 +254,12 @@ class BotAI(BotAIInternal):
 
         closest = None
         distance = math.inf
+        startp = self.game_info.player_start_location
+        local_distances: Dict[Point2, Optional[float]] = {}
+        if self.use_local_pathing:
+            # One search for all expansions instead of one query per expansion
+            locations = self.expansion_locations_list
+            local_distances = dict(zip(locations, self.pathfinder.distances(startp, locations)))
         for el in self.expansion_locations_list:
 
             def is_near_to_expansion(t):
@@ -253,8 +269,10 @@ class BotAI(BotAIInternal):
                 # already taken
                 continue
 
-            startp = self.game_info.player_start_location
-            d = await self.client.query_pathing(startp, el)
+            if self.use_local_pathing:
+                d = local_distances[el]
+            else:
+                d = await self.client.query_pathing(startp, el)
             if d is None:
                 continue
 
@@ -370,6 +388,42 @@ class BotAI(BotAIInternal):
                 # so dont move him
                 pass
 
+    @property_cache_once_per_frame
+    def pathfinder(self) -> Pathfinder:
+        """Finds paths on the current pathing grid without querying the server, see pathfinding.py.
+
+        Example::
+
+            length, waypoints = self.pathfinder.find_path(self.start_location, self.enemy_start_locations[0])
+        """
+        if self._pathfinder is None:
+            self._pathfinder = Pathfinder(self.game_info.pathing_grid.data_numpy)
+        else:
+            self._pathfinder.update(self.game_info.pathing_grid.data_numpy)
+        return self._pathfinder
+
+    @property
+    def flow_fields(self) -> FlowFields:
+        """Distances and directions to targets that can be looked up for any position, see flow_field.py.
+        The fields are computed on the current pathing grid. When the pathing grid changes (e.g. structures were built),
+        the fields of start locations, expansions and ramps are computed again in the background, see FlowFields.update.
+
+        Example::
+
+            target = self.enemy_start_locations[0]
+            for marine in self.units(UnitTypeId.MARINE):
+                marine.move(self.flow_fields.next_step(marine.position, target, steps=4) or target)
+        """
+        if self._flow_fields is None:
+            self._flow_fields = FlowFields(self.game_info.pathing_grid.data_numpy)
+        return self._flow_fields
+
+    def _flow_field_targets(self) -> List[Point2]:
+        """ Targets whose flow fields are kept for the whole game: start locations, expansions and ramps. """
+        targets = [self.start_location, *self.enemy_start_locations, *self._expansion_positions_list]
+        targets.extend(ramp.top_center for ramp in self.game_info.map_ramps)
+        return list(dict.fromkeys(targets))
+
     @property_cache_once_per_frame
     def owned_expansions(self) -> Dict[Point2, Unit]:
         """Dict of expansions owned by the player with mapping {expansion_location: townhall_structure}."""
@@ -398,19 +452,7 @@ class BotAI(BotAIInternal):
             baneling_supply_cost = self.calculate_supply_cost(UnitTypeId.BANELING) # Is 0
 
         :param unit_type:"""
-        if unit_type in {UnitTypeId.ZERGLING}:
-            return 1
-        if unit_type in {UnitTypeId.BANELING}:
-            return 0
-        unit_supply_cost = self.game_data.units[unit_type.value]._proto.food_required
-        if unit_supply_cost > 0 and unit_type in UNIT_TRAINED_FROM and len(UNIT_TRAINED_FROM[unit_type]) == 1:
-            producer: UnitTypeId
-            for producer in UNIT_TRAINED_FROM[unit_type]:
-                producer_unit_data = self.game_data.units[producer.value]
-                if producer_unit_data._proto.food_required <= unit_supply_cost:
-                    producer_supply_cost = producer_unit_data._proto.food_required
-                    unit_supply_cost -= producer_supply_cost
-        return unit_supply_cost
+        return self.game_data.unit_supply_cost(unit_type)
 
     def can_feed(self, unit_type: UnitTypeId) -> bool:
         """Checks if you have enough free supply to build the unit
@@ -473,26 +515,11 @@ class BotAI(BotAIInternal):
         :param item_id:
         """
         if isinstance(item_id, UnitTypeId):
-            # Fix cost for reactor and techlab where the API returns 0 for both
-            if item_id in {UnitTypeId.REACTOR, UnitTypeId.TECHLAB, UnitTypeId.ARCHON, UnitTypeId.BANELING}:
-                if item_id == UnitTypeId.REACTOR:
-                    return Cost(50, 50)
-                if item_id == UnitTypeId.TECHLAB:
-                    return Cost(50, 25)
-                if item_id == UnitTypeId.BANELING:
-                    return Cost(25, 25)
-                if item_id == UnitTypeId.ARCHON:
-                    return self.calculate_unit_value(UnitTypeId.ARCHON)
-            unit_data = self.game_data.units[item_id.value]
-            # Cost of morphs is automatically correctly calculated by 'calculate_ability_cost'
-            return self.game_data.calculate_ability_cost(unit_data.creation_ability.exact_id)
-
+            return self.game_data.unit_cost(item_id)
         if isinstance(item_id, UpgradeId):
-            cost = self.game_data.upgrades[item_id.value].cost
-        else:
-            # Is already AbilityId
-            cost = self.game_data.calculate_ability_cost(item_id)
-        return cost
+            return self.game_data.upgrade_cost(item_id)
+        # Is already AbilityId
+        return self.game_data.calculate_ability_cost(item_id)
 
     def can_afford(self, item_id: Union[UnitTypeId, UpgradeId, AbilityId], check_supply_cost: bool = True) -> bool:
         """Tests if the player has enough resources to build a unit or structure.
@@ -608,8 +635,8 @@ class BotAI(BotAIInternal):
         """ Checks the placement for only one position. """
         if isinstance(building, UnitTypeId):
             creation_ability = self.game_data.units[building.value].creation_ability.id
-            return (await self.client._query_building_placement_fast(creation_ability, [position]))[0]
-        return (await self.client._query_building_placement_fast(building, [position]))[0]
+            return (await self._query_placement(creation_ability, [position]))[0]
+        return (await self._query_placement(building, [position]))[0]
 
     async def can_place(self, building: Union[AbilityData, AbilityId, UnitTypeId],
                         positions: List[Point2]) -> List[bool]:
@@ -648,7 +675,170 @@ class BotAI(BotAIInternal):
         assert isinstance(
             positions[0], Point2
         ), f"List is expected to have Point2, but instead had: {positions[0]} {type(positions[0])}"
-        return await self.client._query_building_placement_fast(building, positions)
+        return await self._query_placement(building, positions)
+
+    def placement_mask(
+        self,
+        building: Union[UnitTypeId, AbilityId],
+        near: Optional[Point2] = None,
+        max_distance: Optional[float] = None,
+        addon_place: bool = False,
+    ) -> np.ndarray:
+        """Returns a mask of all positions where the building can be placed, computed from the placement grid,
+        the footprints of structures and resources, creep and power without querying the server.
+        Gas buildings can be placed on the vespene geysers that don't have a gas building yet.
+        See placement_engine.py for the layout of the mask, use self.placement_positions to get the positions instead.
+        Units that are not structures are not taken into account, so confirm a position with can_place_single.
+
+        Example::
+
+            mask = self.placement_mask(UnitTypeId.BARRACKS, near=self.start_location, max_distance=15, addon_place=True)
+            print(f"{mask.sum()} positions for barracks with addon")
+
+        :param building:
+        :param near: only positions within 'max_distance' of this position
+        :param max_distance:
+        :param addon_place: the addon of the building has to fit as well"""
+        if isinstance(building, UnitTypeId):
+            unit_type = building
+            building = self.game_data.units[building.value].creation_ability.id
+        else:
+            # abilityid_to_unittypeid has no build abilities, these are looked up in the abilities of the game data
+            unit_data = self.game_data._ability_units.get(building.value)
+            unit_type = unit_data.id if unit_data is not None else abilityid_to_unittypeid.get(building)
+        self._update_placement_engine()
+        size = round(2 * self.game_data.abilities[building.value]._proto.footprint_radius)
+        if not size:
+            return np.zeros(self.game_info.placement_grid.data_numpy.shape, dtype=bool)
+        offset = footprint_offset(size)
+        if unit_type in ALL_GAS:
+            taken: Set[Point2] = {
+                structure.position
+                for structure in itertools.chain(self.structures, self.enemy_structures) if structure.type_id in ALL_GAS
+            }
+            mask = self.placement_engine.geyser_mask(
+                (geyser.position for geyser in self.vespene_geyser if geyser.position not in taken), size
+            )
+        else:
+            mask = self._building_placement_mask(unit_type, size, addon_place)
+
+        if near is not None and max_distance is not None:
+            ys, xs = np.ogrid[0:mask.shape[0], 0:mask.shape[1]]
+            mask &= (xs + offset - near.x)**2 + (ys + offset - near.y)**2 <= max_distance**2
+        return mask
+
+    def _building_placement_mask(self, unit_type: Optional[UnitTypeId], size: int, addon_place: bool) -> np.ndarray:
+        """Returns the placement mask of a building that is placed on the placement grid, see self.placement_mask.
+
+        :param unit_type:
+        :param size:
+        :param addon_place:"""
+        needs_creep: Optional[bool] = None
+        power_sources = None
+        race = self.game_data.units[unit_type.value].race if unit_type is not None else None
+        if race == Race.Zerg:
+            if unit_type not in STRUCTURES_NOT_REQUIRING_CREEP:
+                needs_creep = True
+        else:
+            needs_creep = False
+            if race == Race.Protoss and unit_type not in STRUCTURES_NOT_REQUIRING_POWER:
+                power_sources = [(*source.position, source.radius) for source in self.state.psionic_matrix.sources]
+        mask = self.placement_engine.mask(
+            size,
+            townhall=unit_type in race_townhalls[Race.Random],
+            creep=self.state.creep.data_numpy,
+            needs_creep=needs_creep,
+            power_sources=power_sources,
+        )
+
+        if addon_place:
+            # The addon is a 2x2 footprint at offset (2.5, -0.5) and has the placement rules of a supply depot
+            offset = footprint_offset(size)
+            addon_mask = self.placement_engine.mask(2, creep=self.state.creep.data_numpy, needs_creep=False)
+            shift_x, shift_y = footprint_index(offset + 2.5, offset - 0.5, 2)
+            shifted = np.zeros_like(addon_mask)
+            height, width = addon_mask.shape
+            shifted[max(0, -shift_y):min(height, height - shift_y), max(0, -shift_x):min(width, width - shift_x)] = (
+                addon_mask[max(0, shift_y):min(height, height + shift_y), max(0, shift_x):min(width, width + shift_x)]
+            )
+            mask &= shifted
+        return mask
+
+    def placement_positions(
+        self,
+        building: Union[UnitTypeId, AbilityId],
+        near: Point2,
+        max_distance: float,
+        addon_place: bool = False,
+    ) -> List[Point2]:
+        """Returns all positions within 'max_distance' of 'near' where the building can be placed according to
+        self.placement_mask, closest first.
+
+        :param building:
+        :param near:
+        :param max_distance:
+        :param addon_place:"""
+        if isinstance(building, UnitTypeId):
+            building = self.game_data.units[building.value].creation_ability.id
+        mask = self.placement_mask(building, near, max_distance, addon_place)
+        offset = footprint_offset(round(2 * self.game_data.abilities[building.value]._proto.footprint_radius))
+        ys, xs = np.nonzero(mask)
+        positions_x = xs + offset
+        positions_y = ys + offset
+        order = np.argsort((positions_x - near.x)**2 + (positions_y - near.y)**2, kind="stable")
+        return [Point2((x, y)) for x, y in zip(positions_x[order].tolist(), positions_y[order].tolist())]
+
+    async def _find_placement_with_engine(
+        self,
+        building: AbilityId,
+        near: Point2,
+        max_distance: int,
+        random_alternative: bool,
+        placement_step: int,
+        addon_place: bool,
+        confirmations: int = 3,
+    ) -> Optional[Point2]:
+        """Checks the same positions as find_placement against self.placement_mask and only queries the server to
+        confirm the chosen position. Returns None if no position was confirmed.
+
+        :param building:
+        :param near:
+        :param max_distance:
+        :param random_alternative:
+        :param placement_step:
+        :param addon_place:
+        :param confirmations: amount of positions that are queried at most"""
+        mask = self.placement_mask(building, addon_place=addon_place)
+        size = round(2 * self.game_data.abilities[building.value]._proto.footprint_radius)
+        height, width = mask.shape
+        steps = (max_distance - 1) // placement_step if max_distance > 0 else 0
+        offsets = np.arange(-steps, steps + 1) * placement_step
+        dx, dy = (grid.ravel() for grid in np.meshgrid(offsets, offsets))
+        rings = np.maximum(np.abs(dx), np.abs(dy))
+        xs = np.floor(near.x + dx - footprint_offset(size) + 0.5).astype(int)
+        ys = np.floor(near.y + dy - footprint_offset(size) + 0.5).astype(int)
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        valid = np.zeros(rings.shape, dtype=bool)
+        valid[inside] = mask[ys[inside], xs[inside]]
+
+        for ring in np.unique(rings[valid]).tolist():
+            candidates = [
+                near if ring == 0 else Point2((near.x + x, near.y + y))
+                for x, y in zip(dx[valid & (rings == ring)].tolist(), dy[valid & (rings == ring)].tolist())
+            ]
+            if random_alternative:
+                random.shuffle(candidates)
+            else:
+                candidates.sort(key=lambda p: p.distance_to_point2(near))
+            for position in candidates:
+                if confirmations <= 0:
+                    return None
+                confirmations -= 1
+                if await self.can_place_single(building, position) and (
+                    not addon_place or await self.can_place_single(UnitTypeId.SUPPLYDEPOT, position.offset((2.5, -0.5)))
+                ):
+                    return position
+        return None
 
     async def find_placement(
         self,
@@ -680,6 +870,14 @@ class BotAI(BotAIInternal):
         if isinstance(building, UnitTypeId):
             building = self.game_data.units[building.value].creation_ability.id
 
+        if self.use_placement_engine:
+            position = await self._find_placement_with_engine(
+                building, near, max_distance, random_alternative, placement_step, addon_place
+            )
+            if position is not None:
+                return position
+            # The placement engine approximates some footprints, fall back to querying the rings
+
         if await self.can_place_single(
             building, near
         ) and (not addon_place or await self.can_place_single(UnitTypeId.SUPPLYDEPOT, near.offset((2.5, -0.5)))):
@@ -697,13 +895,13 @@ class BotAI(BotAIInternal):
                     [(distance, dy) for dy in range(-distance, distance + 1, placement_step)]
                 )
             ]
-            res = await self.client._query_building_placement_fast(building, possible_positions)
+            res = await self._query_placement(building, possible_positions)
             # Filter all positions if building can be placed
             possible = [p for r, p in zip(res, possible_positions) if r]
 
             if addon_place:
                 # Filter remaining positions if addon can be placed
-                res = await self.client._query_building_placement_fast(
+                res = await self._query_placement(
                     AbilityId.TERRANBUILDDROP_SUPPLYDEPOTDROP,
                     [p.offset((2.5, -0.5)) for p in possible],
                 )
@@ -775,7 +973,7 @@ class BotAI(BotAIInternal):
         ), f"Needs to be int or UnitTypeId, but was: {type(structure_type)}"
         if isinstance(structure_type, int):
             structure_type_value: int = structure_type
-            structure_type = UnitTypeId(structure_type_value)
+            structure_type = unit_type_id_from_value(structure_type_value)
         else:
             structure_type_value = structure_type.value
         assert structure_type_value, f"structure_type can not be 0 or NOTAUNIT, but was: {structure_type_value}"
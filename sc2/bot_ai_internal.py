@@ -10,7 +10,7 @@ from collections import Counter
 from contextlib import suppress
 from typing import TYPE_CHECKING, Any
 from typing import Counter as CounterType
-from typing import Dict, Generator, Iterable, List, Set, Tuple, Union, final
+from typing import Dict, Generator, Iterable, List, Optional, Set, Tuple, Union, final
 
 import numpy as np
 from loguru import logger
@@ -21,26 +21,39 @@ from sc2.constants import (
     ALL_GAS,
     CREATION_ABILITY_FIX,
     IS_PLACEHOLDER,
+    IS_STRUCTURE,
+    STRUCTURES_NOT_BLOCKING_PATHING,
     TERRAN_STRUCTURES_REQUIRE_SCV,
+    TOWNHALL_RESOURCE_DISTANCE,
     FakeEffectID,
     abilityid_to_unittypeid,
     geyser_ids,
     mineral_ids,
 )
 from sc2.data import ActionResult, Race, race_townhalls
+from sc2.file_utils import game_file_path
+from sc2.flow_field import FlowFields
 from sc2.game_data import Cost, GameData
 from sc2.game_state import Blip, EffectData, GameState
 from sc2.ids.ability_id import AbilityId
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.ids.upgrade_id import UpgradeId
+from sc2.map_cache import MapAnalysis, MapAnalysisCache, ramp_properties
+from sc2.pathfinding import Pathfinder
 from sc2.pixel_map import PixelMap
+from sc2.placement_cache import PlacementCache
+from sc2.placement_engine import PlacementEngine, Rectangle
 from sc2.position import Point2
+from sc2.request_trace import RequestTrace
+from sc2.step_profiler import StepPhase, StepProfiler
 from sc2.unit import Unit
 from sc2.unit_command import UnitCommand
+from sc2.unit_frame import UnitFrame
 from sc2.units import Units
 
 with warnings.catch_warnings():
     warnings.simplefilter("ignore")
+    from scipy.spatial import cKDTree
     from scipy.spatial.distance import cdist, pdist
 
 if TYPE_CHECKING:
@@ -67,9 +80,72 @@ class BotAIInternal(ABC):
         # Select if the Unit.command should return UnitCommand objects. Set this to True if your bot uses 'self.do(unit(ability, target))'
         if not hasattr(self, "unit_command_uses_self_do"):
             self.unit_command_uses_self_do: bool = False
+        # Select if the pathing grid should be updated from structure events instead of requesting the game info every step
+        if not hasattr(self, "incremental_pathing_grid"):
+            self.incremental_pathing_grid: bool = False
+        # Amount of game loops after which the incrementally updated pathing grid is replaced by the one from the game info
+        if not hasattr(self, "pathing_grid_resync_interval"):
+            self.pathing_grid_resync_interval: int = 224
+        # Amount of iterations of which the step profiler keeps the duration of each phase, see step_profiler.py
+        if not hasattr(self, "step_profiler_capacity"):
+            self.step_profiler_capacity: int = 2048
+        # If set, the step profiler timings are written to this file at the end of the game, see StepProfiler.dump.
+        # The process id, game number and player id are added to the file name, see file_utils.game_file_path
+        if not hasattr(self, "step_profile_path"):
+            self.step_profile_path: Optional[str] = None
+        self.step_profiler: StepProfiler = StepProfiler(self.step_profiler_capacity)
+        # If set before the game starts, all requests and responses of the game are written to this file, see capture.py
+        if not hasattr(self, "capture_path"):
+            self.capture_path: Optional[str] = None
+        # Compress the capture file with zstd, requires the 'zstandard' package
+        if not hasattr(self, "capture_compress"):
+            self.capture_compress: bool = False
+        # Amount of requests of which type, size and latency are recorded, 0 disables it, see request_trace.py
+        if not hasattr(self, "request_trace_capacity"):
+            self.request_trace_capacity: int = 0
+        # If set, the request trace is written to this file at the end of the game, see RequestTrace.dump.
+        # The process id, game number and player id are added to the file name, see file_utils.game_file_path
+        if not hasattr(self, "request_trace_path"):
+            self.request_trace_path: Optional[str] = None
+        # Set by main.py before the game starts if 'self.request_trace_capacity' is positive
+        if not hasattr(self, "request_trace"):
+            self.request_trace: Optional[RequestTrace] = None
+        # Send the action, debug and step requests at the end of a frame together with the next observation request,
+        # which saves three round trips per frame. Their time is then measured in the OBSERVATION step profiler phase
+        if not hasattr(self, "pipeline_requests"):
+            self.pipeline_requests: bool = False
+        # Answer repeated building placement queries from a cache that is invalidated by structure, creep and power changes
+        if not hasattr(self, "use_placement_cache"):
+            self.use_placement_cache: bool = False
+        self.placement_cache: PlacementCache = PlacementCache()
+        self._placement_cache_game_loop: int = -1
+        # Let find_placement pick the position from the placement engine and only confirm it with a query
+        if not hasattr(self, "use_placement_engine"):
+            self.use_placement_engine: bool = False
+        # Created on first use, see self.placement_mask
+        self.placement_engine: Optional[PlacementEngine] = None
+        self._placement_engine_game_loop: int = -1
+        # Let get_next_expansion compute path distances with self.pathfinder instead of querying the server
+        if not hasattr(self, "use_local_pathing"):
+            self.use_local_pathing: bool = False
+        self._pathfinder: Optional[Pathfinder] = None
+        # Compute the flow fields to the start locations, expansions and ramps in a background thread at game start
+        if not hasattr(self, "precompute_flow_fields"):
+            self.precompute_flow_fields: bool = False
+        # Created on first use, see self.flow_fields
+        self._flow_fields: Optional[FlowFields] = None
+        # If set, the expansion locations, ramps and vision blockers are stored in and loaded from this directory,
+        # so that they are computed only once per map, see map_cache.py
+        if not hasattr(self, "map_analysis_cache_dir"):
+            self.map_analysis_cache_dir: Optional[str] = None
+        # If set, the game data is stored in and loaded from this directory, so that it is requested only once per
+        # game version, see game_data_cache.py
+        if not hasattr(self, "game_data_cache_dir"):
+            self.game_data_cache_dir: Optional[str] = None
         # This value will be set to True by main.py in self._prepare_start if game is played in realtime (if true, the bot will have limited time per step)
         self.realtime: bool = False
         self.base_build: int = -1
+        self.unit_frame: UnitFrame = UnitFrame([], -1)
         self.all_units: Units = Units([], self)
         self.units: Units = Units([], self)
         self.workers: Units = Units([], self)
@@ -111,6 +187,15 @@ class BotAIInternal(ABC):
         self._enemy_units_previous_map: Dict[int, Unit] = {}
         self._enemy_structures_previous_map: Dict[int, Unit] = {}
         self._all_units_previous_map: Dict[int, Unit] = {}
+        self._pathing_grid_footprints: Dict[int, Optional[Tuple[int, int, int, int]]] = {}
+        self._pathing_grid_last_sync: int = -1
+        self._pathing_grid_resync_requested: bool = True
+        self._static_structure_types: Set[int] = set()
+        self._static_units_count: int = 0
+        self._static_distances_tags: np.ndarray = np.empty(0, dtype=np.uint64)
+        self._static_distances_positions: np.ndarray = np.empty((0, 2))
+        self._static_distances: np.ndarray = np.empty((0, 0))
+        self._distances_buffer: np.ndarray = np.empty((0, 0))
         self._previous_upgrades: Set[UpgradeId] = set()
         self._expansion_positions_list: List[Point2] = []
         self._resource_location_to_expansion_position_dict: Dict[Point2, Point2] = {}
@@ -179,72 +264,77 @@ class BotAIInternal(ABC):
 
         # Distance we group resources by
         resource_spread_threshold: float = 8.5
-        # Create a group for every resource
-        resource_groups: List[List[Unit]] = [
-            [resource] for resource in self.resources
+        resources: List[Unit] = [
+            resource for resource in self.resources
             if resource.name != "MineralField450"  # dont use low mineral count patches
         ]
-        # Loop the merging process as long as we change something
-        merged_group = True
+        if not resources:
+            return
+        positions = np.array([resource.position_tuple for resource in resources])
+        # check if terrain height measurement at resources is within 10 units
+        # this is since some older maps have inconsistent terrain height
+        # tiles at certain expansion locations
         height_grid: PixelMap = self.game_info.terrain_height
-        while merged_group:
-            merged_group = False
-            # Check every combination of two groups
-            for group_a, group_b in itertools.combinations(resource_groups, 2):
-                # Check if any pair of resource of these groups is closer than threshold together
-                # And that they are on the same terrain level
-                if any(
-                    resource_a.distance_to(resource_b) <= resource_spread_threshold
-                    # check if terrain height measurement at resources is within 10 units
-                    # this is since some older maps have inconsistent terrain height
-                    # tiles at certain expansion locations
-                    and abs(height_grid[resource_a.position.rounded] - height_grid[resource_b.position.rounded]) <= 10
-                    for resource_a, resource_b in itertools.product(group_a, group_b)
-                ):
-                    # Remove the single groups and add the merged group
-                    resource_groups.remove(group_a)
-                    resource_groups.remove(group_b)
-                    resource_groups.append(group_a + group_b)
-                    merged_group = True
-                    break
+        heights = [height_grid[resource.position.rounded] for resource in resources]
+
+        # Union find: merge the groups of all pairs of resources that are close together and on the same terrain level
+        parents = list(range(len(resources)))
+
+        def find(index: int) -> int:
+            while parents[index] != index:
+                parents[index] = parents[parents[index]]
+                index = parents[index]
+            return index
+
+        # The kd-tree only returns pairs that are about close enough, the exact check is done on squared distances
+        for a, b in cKDTree(positions).query_pairs(resource_spread_threshold + 1e-6):
+            dx, dy = positions[a] - positions[b]
+            if dx * dx + dy * dy <= resource_spread_threshold**2 and abs(heights[a] - heights[b]) <= 10:
+                parents[find(a)] = find(b)
+        groups: Dict[int, List[int]] = {}
+        for index in range(len(resources)):
+            groups.setdefault(find(index), []).append(index)
+
         # Distance offsets we apply to center of each resource group to find expansion position
         offset_range = 7
-        offsets = [
+        offsets = np.array([
             (x, y) for x, y in itertools.product(range(-offset_range, offset_range + 1), repeat=2)
             if 4 < math.hypot(x, y) <= 8
-        ]
-        # Dict we want to return
-        centers = {}
+        ])
+        placement_grid = self.game_info.placement_grid.data_numpy
+        height, width = placement_grid.shape
         # For every resource group:
-        for resources in resource_groups:
-            # Possible expansion points
-            amount = len(resources)
+        for indices in groups.values():
+            group_positions = positions[indices]
             # Calculate center, round and add 0.5 because expansion location will have (x.5, y.5)
             # coordinates because bases have size 5.
-            center_x = int(sum(resource.position.x for resource in resources) / amount) + 0.5
-            center_y = int(sum(resource.position.y for resource in resources) / amount) + 0.5
-            possible_points = (Point2((offset[0] + center_x, offset[1] + center_y)) for offset in offsets)
-            # Filter out points that are too near
-            possible_points = (
-                point for point in possible_points
-                # Check if point can be built on
-                if self.game_info.placement_grid[point.rounded] == 1
-                # Check if all resources have enough space to point
-                and all(
-                    point.distance_to(resource) >= (7 if resource._proto.unit_type in geyser_ids else 6)
-                    for resource in resources
-                )
-            )
-            # Choose best fitting point
-            result: Point2 = min(
-                possible_points, key=lambda point: sum(point.distance_to(resource_) for resource_ in resources)
-            )
-            centers[result] = resources
+            center_x = int(group_positions[:, 0].sum() / len(indices)) + 0.5
+            center_y = int(group_positions[:, 1].sum() / len(indices)) + 0.5
+            # Possible expansion points
+            points = offsets + (center_x, center_y)
+            # Check if point can be built on
+            xs, ys = np.floor(points[:, 0]).astype(int), np.floor(points[:, 1]).astype(int)
+            inside = (0 <= xs) & (xs < width) & (0 <= ys) & (ys < height)
+            possible = inside & (placement_grid[ys.clip(0, height - 1), xs.clip(0, width - 1)] == 1)
+            # Check if all resources have enough space to point, distances[i, j] from point i to resource j
+            differences = points[:, None, :] - group_positions[None, :, :]
+            squared_distances = (differences**2).sum(axis=2)
+            minimum_distances = np.array([
+                7 if resources[index]._proto.unit_type in geyser_ids else 6 for index in indices
+            ])
+            possible &= (squared_distances >= minimum_distances**2).all(axis=1)
+            # Choose best fitting point, the sum is added up in resource order to match summing the single distances
+            distances = np.sqrt(squared_distances[possible])
+            scores = np.zeros(len(distances))
+            for column in distances.T:
+                scores += column
+            best = points[possible][np.argmin(scores)]
+            result = Point2((float(best[0]), float(best[1])))
             # Put all expansion locations in a list
             self._expansion_positions_list.append(result)
             # Maps all resource positions to the expansion position
-            for resource in resources:
-                self._resource_location_to_expansion_position_dict[resource.position] = result
+            for index in indices:
+                self._resource_location_to_expansion_position_dict[resources[index].position] = result
 
     @final
     def _correct_zerg_supply(self):
@@ -473,28 +563,92 @@ class BotAIInternal(ABC):
         if len(self.game_info.player_races) == 2:
             self.enemy_race: Race = Race(self.game_info.player_races[3 - self.player_id])
 
+        # Structure types that can't move while they are landed, their distances to each other are cached across frames
+        self._static_structure_types: Set[int] = {
+            unit_id
+            for unit_id, unit_data in self.game_data.units.items() if IS_STRUCTURE in unit_data.attributes
+        } - {UnitTypeId.SPINECRAWLERUPROOTED.value, UnitTypeId.SPORECRAWLERUPROOTED.value}
+
         self._distances_override_functions(self.distance_calculation_method)
 
     @final
     def _prepare_first_step(self):
         """First step extra preparations. Must not be called before _prepare_step."""
-        if self.townhalls:
+        if self.townhalls and self.map_analysis_cache_dir is not None:
             self.game_info.player_start_location = self.townhalls.first.position
-            # Calculate and cache expansion locations forever inside 'self._cache_expansion_locations', this is done to prevent a bug when this is run and cached later in the game
-            self._find_expansion_locations()
-        self.game_info.map_ramps, self.game_info.vision_blockers = self.game_info._find_ramps_and_vision_blockers()
+            self._analyze_map_with_cache()
+        else:
+            if self.townhalls:
+                self.game_info.player_start_location = self.townhalls.first.position
+                # Calculate and cache expansion locations forever inside 'self._cache_expansion_locations', this is done to prevent a bug when this is run and cached later in the game
+                self._find_expansion_locations()
+            self.game_info.map_ramps, self.game_info.vision_blockers = self.game_info._find_ramps_and_vision_blockers()
+        if self.precompute_flow_fields:
+            self.flow_fields.precompute(self._flow_field_targets())
         self._time_before_step: float = time.perf_counter()
 
     @final
-    def _prepare_step(self, state, proto_game_info):
+    def _analyze_map_with_cache(self):
+        """Loads the expansion locations, ramps and vision blockers from the map analysis cache,
+        or computes and stores them if the map was not analyzed before."""
+        # pylint: disable=C0415
+        from sc2.game_info import Ramp
+
+        cache = MapAnalysisCache(self.map_analysis_cache_dir)
+        map_name = self.game_info.map_name
+        key = cache.key(self.game_info, self.resources)
+        analysis: Optional[MapAnalysis] = cache.load(map_name, key)
+        if analysis is None:
+            self._find_expansion_locations()
+            ramps, vision_blockers = self.game_info._find_ramps_and_vision_blockers()
+            analysis = MapAnalysis(
+                expansion_locations=list(self._expansion_positions_list),
+                resource_expansions=dict(self._resource_location_to_expansion_position_dict),
+                ramps=[ramp.points for ramp in ramps],
+                vision_blockers=vision_blockers,
+            )
+            cache.save(map_name, key, analysis)
+        else:
+            logger.info(f"Loaded the analysis of map {map_name} from {cache.path(map_name, key)}")
+            self._expansion_positions_list = list(analysis.expansion_locations)
+            self._resource_location_to_expansion_position_dict = dict(analysis.resource_expansions)
+            ramps = [Ramp(points, self.game_info) for points in analysis.ramps]
+            vision_blockers = analysis.vision_blockers
+        self.game_info.map_ramps, self.game_info.vision_blockers = ramps, vision_blockers
+
+        start_location = self.game_info.player_start_location
+        stored_properties = cache.load_ramp_properties(map_name, key, start_location)
+        if stored_properties is not None:
+            for ramp, properties in zip(ramps, stored_properties):
+                # Fills the cached properties as if they had been accessed
+                ramp.__dict__.update(properties)
+        else:
+            cache.save_ramp_properties(map_name, key, start_location, [ramp_properties(ramp) for ramp in ramps])
+
+    @final
+    def _pathing_grid_resync_due(self, game_loop: int) -> bool:
+        """Returns True if main.py has to request the game info in this step to refresh the pathing grid.
+        Always True if 'self.incremental_pathing_grid' is disabled.
+
+        :param game_loop:
+        """
+        if not self.incremental_pathing_grid or self._pathing_grid_resync_requested:
+            return True
+        return game_loop - self._pathing_grid_last_sync >= self.pathing_grid_resync_interval
+
+    @final
+    def _prepare_step(self, state, proto_game_info=None):
         """
         :param state:
-        :param proto_game_info:
+        :param proto_game_info: Can be None if 'self.incremental_pathing_grid' is enabled and no resync is due
         """
         # Set attributes from new state before on_step."""
         self.state: GameState = state  # See game_state.py
         # update pathing grid, which unfortunately is in GameInfo instead of GameState
-        self.game_info.pathing_grid = PixelMap(proto_game_info.game_info.start_raw.pathing_grid, in_bits=True)
+        if proto_game_info is not None:
+            self.game_info.pathing_grid = PixelMap(proto_game_info.game_info.start_raw.pathing_grid, in_bits=True)
+            self._pathing_grid_last_sync = state.game_loop
+            self._pathing_grid_resync_requested = False
         # Required for events, needs to be before self.units are initialized so the old units are stored
         self._units_previous_map: Dict[int, Unit] = {unit.tag: unit for unit in self.units}
         self._structures_previous_map: Dict[int, Unit] = {structure.tag: structure for structure in self.structures}
@@ -505,7 +659,15 @@ class BotAIInternal(ABC):
         }
         self._all_units_previous_map: Dict[int, Unit] = {unit.tag: unit for unit in self.all_units}
 
+        self.step_profiler.set_game_loop(state.game_loop)
+        time_before_units: float = time.perf_counter()
         self._prepare_units()
+        self.step_profiler.add(StepPhase.PREPARE_UNITS, time.perf_counter() - time_before_units)
+        if self.incremental_pathing_grid:
+            self._update_pathing_grid(synced=proto_game_info is not None)
+        if self._flow_fields is not None:
+            # Recomputes the fields in the background if structures changed the pathing grid, see FlowFields.update
+            self._flow_fields.update(self.game_info.pathing_grid.data_numpy)
         self.minerals: int = state.common.minerals
         self.vespene: int = state.common.vespene
         self.supply_army: int = state.common.food_army
@@ -553,77 +715,100 @@ class BotAIInternal(ABC):
 
         worker_types: Set[UnitTypeId] = {UnitTypeId.DRONE, UnitTypeId.DRONEBURROWED, UnitTypeId.SCV, UnitTypeId.PROBE}
 
-        index: int = 0
+        raw_units: List[Any] = []
+        # Units that can't move (resources, rocks, landed structures) get the first distance calculation indices
+        static_units: List[Any] = []
+        dynamic_units: List[Any] = []
+        static_structure_types: Set[int] = self._static_structure_types
         for unit in self.state.observation_raw.units:
             if unit.is_blip:
                 self.blips.add(Blip(unit))
+            # Convert these units to effects: reaper grenade, parasitic bomb dummy, forcefield
+            elif unit.unit_type in FakeEffectID:
+                self.state.effects.add(EffectData(unit, fake=True))
             else:
-                unit_type: int = unit.unit_type
-                # Convert these units to effects: reaper grenade, parasitic bomb dummy, forcefield
-                if unit_type in FakeEffectID:
-                    self.state.effects.add(EffectData(unit, fake=True))
-                    continue
-                unit_obj = Unit(unit, self, distance_calculation_index=index, base_build=self.base_build)
-                index += 1
-                self.all_units.append(unit_obj)
-                if unit.display_type == IS_PLACEHOLDER:
-                    self.placeholders.append(unit_obj)
-                    continue
-                alliance = unit.alliance
+                raw_units.append(unit)
                 # Alliance.Neutral.value = 3
-                if alliance == 3:
-                    # XELNAGATOWER = 149
-                    if unit_type == 149:
-                        self.watchtowers.append(unit_obj)
-                    # mineral field enums
-                    elif unit_type in mineral_ids:
-                        self.mineral_field.append(unit_obj)
-                        self.resources.append(unit_obj)
-                    # geyser enums
-                    elif unit_type in geyser_ids:
-                        self.vespene_geyser.append(unit_obj)
-                        self.resources.append(unit_obj)
-                    # all destructable rocks
-                    else:
-                        self.destructables.append(unit_obj)
-                # Alliance.Self.value = 1
-                elif alliance == 1:
-                    self.all_own_units.append(unit_obj)
-                    unit_id: UnitTypeId = unit_obj.type_id
-                    if unit_obj.is_structure:
-                        self.structures.append(unit_obj)
-                        if unit_id in race_townhalls[self.race]:
-                            self.townhalls.append(unit_obj)
-                        elif unit_id in ALL_GAS or unit_obj.vespene_contents:
-                            # TODO: remove "or unit_obj.vespene_contents" when a new linux client newer than version 4.10.0 is released
-                            self.gas_buildings.append(unit_obj)
-                        elif unit_id in {
-                            UnitTypeId.TECHLAB,
-                            UnitTypeId.BARRACKSTECHLAB,
-                            UnitTypeId.FACTORYTECHLAB,
-                            UnitTypeId.STARPORTTECHLAB,
-                        }:
-                            self.techlab_tags.add(unit_obj.tag)
-                        elif unit_id in {
-                            UnitTypeId.REACTOR,
-                            UnitTypeId.BARRACKSREACTOR,
-                            UnitTypeId.FACTORYREACTOR,
-                            UnitTypeId.STARPORTREACTOR,
-                        }:
-                            self.reactor_tags.add(unit_obj.tag)
-                    else:
-                        self.units.append(unit_obj)
-                        if unit_id in worker_types:
-                            self.workers.append(unit_obj)
-                        elif unit_id == UnitTypeId.LARVA:
-                            self.larva.append(unit_obj)
-                # Alliance.Enemy.value = 4
-                elif alliance == 4:
-                    self.all_enemy_units.append(unit_obj)
-                    if unit_obj.is_structure:
-                        self.enemy_structures.append(unit_obj)
-                    else:
-                        self.enemy_units.append(unit_obj)
+                if unit.alliance == 3 or (
+                    unit.unit_type in static_structure_types and unit.build_progress == 1 and not unit.is_flying
+                ):
+                    static_units.append(unit)
+                else:
+                    dynamic_units.append(unit)
+        self._static_units_count: int = len(static_units)
+        frame_units: List[Any] = static_units + dynamic_units
+        # Column store of all units, row 'index' belongs to the unit with distance_calculation_index 'index'
+        self.unit_frame: UnitFrame = UnitFrame(frame_units, self.state.game_loop)
+        distance_calculation_indices: Dict[int, int] = {id(unit): index for index, unit in enumerate(frame_units)}
+
+        for unit in raw_units:
+            unit_obj = Unit(
+                unit,
+                self,
+                distance_calculation_index=distance_calculation_indices[id(unit)],
+                base_build=self.base_build,
+                unit_frame=self.unit_frame,
+            )
+            self.all_units.append(unit_obj)
+            if unit.display_type == IS_PLACEHOLDER:
+                self.placeholders.append(unit_obj)
+                continue
+            unit_type: int = unit.unit_type
+            alliance = unit.alliance
+            # Alliance.Neutral.value = 3
+            if alliance == 3:
+                # XELNAGATOWER = 149
+                if unit_type == 149:
+                    self.watchtowers.append(unit_obj)
+                # mineral field enums
+                elif unit_type in mineral_ids:
+                    self.mineral_field.append(unit_obj)
+                    self.resources.append(unit_obj)
+                # geyser enums
+                elif unit_type in geyser_ids:
+                    self.vespene_geyser.append(unit_obj)
+                    self.resources.append(unit_obj)
+                # all destructable rocks
+                else:
+                    self.destructables.append(unit_obj)
+            # Alliance.Self.value = 1
+            elif alliance == 1:
+                self.all_own_units.append(unit_obj)
+                unit_id: UnitTypeId = unit_obj.type_id
+                if unit_obj.is_structure:
+                    self.structures.append(unit_obj)
+                    if unit_id in race_townhalls[self.race]:
+                        self.townhalls.append(unit_obj)
+                    elif unit_id in ALL_GAS or unit_obj.vespene_contents:
+                        # TODO: remove "or unit_obj.vespene_contents" when a new linux client newer than version 4.10.0 is released
+                        self.gas_buildings.append(unit_obj)
+                    elif unit_id in {
+                        UnitTypeId.TECHLAB,
+                        UnitTypeId.BARRACKSTECHLAB,
+                        UnitTypeId.FACTORYTECHLAB,
+                        UnitTypeId.STARPORTTECHLAB,
+                    }:
+                        self.techlab_tags.add(unit_obj.tag)
+                    elif unit_id in {
+                        UnitTypeId.REACTOR,
+                        UnitTypeId.BARRACKSREACTOR,
+                        UnitTypeId.FACTORYREACTOR,
+                        UnitTypeId.STARPORTREACTOR,
+                    }:
+                        self.reactor_tags.add(unit_obj.tag)
+                else:
+                    self.units.append(unit_obj)
+                    if unit_id in worker_types:
+                        self.workers.append(unit_obj)
+                    elif unit_id == UnitTypeId.LARVA:
+                        self.larva.append(unit_obj)
+            # Alliance.Enemy.value = 4
+            elif alliance == 4:
+                self.all_enemy_units.append(unit_obj)
+                if unit_obj.is_structure:
+                    self.enemy_structures.append(unit_obj)
+                else:
+                    self.enemy_units.append(unit_obj)
 
         # Force distance calculation and caching on all units using scipy pdist or cdist
         if self.distance_calculation_method == 1:
@@ -631,6 +816,144 @@ class BotAIInternal(ABC):
         elif self.distance_calculation_method in {2, 3}:
             _ = self._cdist
 
+    @final
+    @staticmethod
+    def _pathing_footprint(unit: Unit) -> Optional[Tuple[int, int, int, int]]:
+        """Returns the rectangle (x0, y0, x1, y1) of grid cells the unit blocks in the pathing grid, or None if unknown.
+
+        :param unit:
+        """
+        if unit._proto.unit_type in mineral_ids:
+            # Mineral fields are 2x1
+            half_width, half_height = 1, 0.5
+        else:
+            radius = unit.footprint_radius
+            if radius is None:
+                return None
+            half_width = half_height = radius
+        x, y = unit.position_tuple
+        return round(x - half_width), round(y - half_height), round(x + half_width), round(y + half_height)
+
+    @final
+    def _placement_footprint(self, unit: Unit) -> Rectangle:
+        """Returns the rectangle (x0, y0, x1, y1) of grid cells in which the unit blocks building placement.
+
+        :param unit:
+        """
+        rectangle = self._pathing_footprint(unit)
+        if rectangle is not None:
+            return rectangle
+        # Geysers and destructables have no creation ability, approximate their footprint by their radius
+        half_size = math.floor(unit.radius * 2) / 2
+        x, y = unit.position_tuple
+        return round(x - half_size), round(y - half_size), round(x + half_size), round(y + half_size)
+
+    @final
+    def _update_placement_engine(self):
+        """ Rebuilds the occupancy raster of the placement engine, at most once per frame. """
+        game_loop: int = self.state.game_loop
+        if game_loop == self._placement_engine_game_loop:
+            return
+        self._placement_engine_game_loop = game_loop
+        if self.placement_engine is None:
+            self.placement_engine = PlacementEngine(self.game_info.placement_grid.data_numpy)
+        self.placement_engine.update(
+            (
+                self._placement_footprint(unit)
+                for unit in itertools.chain(self.structures, self.enemy_structures, self.destructables)
+                if not unit.is_flying
+            ),
+            (self._placement_footprint(unit) for unit in self.resources),
+            TOWNHALL_RESOURCE_DISTANCE,
+        )
+
+    @final
+    def _update_placement_cache(self):
+        """Invalidates the placement cache entries that changes since the last update can affect.
+        Runs at most once per frame and only in frames in which placement is queried."""
+        game_loop: int = self.state.game_loop
+        if game_loop == self._placement_cache_game_loop:
+            return
+        self._placement_cache_game_loop = game_loop
+        self.placement_cache.update_blockers(
+            {
+                unit.tag: (*unit.position_tuple, unit.radius)
+                for unit in itertools.chain(self.structures, self.enemy_structures, self.resources, self.destructables)
+                if not unit.is_flying
+            }
+        )
+        self.placement_cache.update_power_sources(
+            (*source.position, source.radius) for source in self.state.psionic_matrix.sources
+        )
+        self.placement_cache.update_creep(self.state.creep.data_numpy)
+
+    @final
+    async def _query_placement(self, ability: AbilityId, positions: List[Point2]) -> List[bool]:
+        """Like client._query_building_placement_fast, but only queries the positions that are not in the placement cache
+        if 'self.use_placement_cache' is set.
+
+        :param ability: creation ability of the building
+        :param positions:
+        """
+        if not self.use_placement_cache:
+            return await self.client._query_building_placement_fast(ability, positions)
+        self._update_placement_cache()
+        cache = self.placement_cache
+        game_loop: int = self.state.game_loop
+        results: List[Optional[bool]] = [cache.get(ability.value, p.x, p.y, game_loop) for p in positions]
+        missing: List[int] = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            queried = await self.client._query_building_placement_fast(ability, [positions[i] for i in missing])
+            for i, result in zip(missing, queried):
+                results[i] = result
+                cache.set(ability.value, positions[i].x, positions[i].y, result, game_loop)
+        return results
+
+    @final
+    def _update_pathing_grid(self, synced: bool):
+        """Applies the footprints of structures and resources that appeared or disappeared since last step to the pathing grid.
+        Footprints are approximated by rectangles, so every 'self.pathing_grid_resync_interval' game loops the grid is replaced by the one from the game info.
+        If a change can not be modelled (e.g. destructable rocks were destroyed), a resync is requested for the next step.
+
+        :param synced: True if the pathing grid was refreshed from the game info this step
+        """
+        footprints: Dict[int, Optional[Tuple[int, int, int, int]]] = {}
+        for structure in itertools.chain(self.structures, self.enemy_structures):
+            unit_id: UnitTypeId = structure.type_id
+            # Gas buildings stand on geysers which are blocking anyway
+            if structure.is_flying or unit_id in STRUCTURES_NOT_BLOCKING_PATHING or unit_id in ALL_GAS:
+                continue
+            footprints[structure.tag] = self._pathing_footprint(structure)
+        for mineral_field in self.mineral_field:
+            footprints[mineral_field.tag] = self._pathing_footprint(mineral_field)
+        for destructable in self.destructables:
+            # The shape of destructables is not known (e.g. diagonal rocks)
+            footprints[destructable.tag] = None
+
+        if not synced:
+            grid: np.ndarray = self.game_info.pathing_grid.data_numpy
+            previous_footprints = self._pathing_grid_footprints
+            # Free the cells of footprints that disappeared or changed
+            for tag, rect in previous_footprints.items():
+                if tag in footprints and footprints[tag] == rect:
+                    continue
+                if rect is None:
+                    self._pathing_grid_resync_requested = True
+                    continue
+                x0, y0, x1, y1 = rect
+                grid[y0:y1, x0:x1] = 1
+            # Block the cells of footprints that appeared or changed
+            for tag, rect in footprints.items():
+                if tag in previous_footprints and previous_footprints[tag] == rect:
+                    continue
+                if rect is None:
+                    self._pathing_grid_resync_requested = True
+                    continue
+                x0, y0, x1, y1 = rect
+                grid[y0:y1, x0:x1] = 0
+
+        self._pathing_grid_footprints = footprints
+
     @final
     async def _after_step(self) -> int:
         """ Executed by main.py after each on_step function. """
@@ -644,27 +967,63 @@ class BotAIInternal(ABC):
         self._total_steps_iterations += 1
         # Commit and clear bot actions
         if self.actions:
-            await self._do_actions(self.actions)
+            if self.pipeline_requests:
+                self.client._queue_actions(list(filter(self.prevent_double_actions, self.actions)))
+            else:
+                await self._do_actions(self.actions)
             self.actions.clear()
+            self.step_profiler.add(StepPhase.DO_ACTIONS, time.perf_counter() - self._time_after_step)
         # Clear set of unit tags that were given an order this frame by self.do()
         self.unit_tags_received_action.clear()
         # Commit debug queries
-        await self.client._send_debug()
+        time_before_debug: float = time.perf_counter()
+        await self.client._send_debug(queue=self.pipeline_requests)
+        self.step_profiler.add(StepPhase.SEND_DEBUG, time.perf_counter() - time_before_debug)
 
         return self.state.game_loop
 
+    @final
+    def _dump_step_profile(self, player_id: int, game_number: int):
+        """Executed by main.py at the end of the game, also if it ended with an exception.
+        Writes the step profiler timings if 'self.step_profile_path' is set, see file_utils.game_file_path.
+
+        :param player_id:
+        :param game_number:"""
+        if self.step_profile_path is None:
+            return
+        path = game_file_path(self.step_profile_path, player_id, game_number)
+        self.step_profiler.dump(path)
+        logger.info(f"Wrote timings of {len(self.step_profiler)} steps to {path}")
+
+    @final
+    def _dump_request_trace(self, player_id: int, game_number: int):
+        """Executed by main.py at the end of the game, also if it ended with an exception.
+        Writes the request trace if 'self.request_trace_path' is set, see file_utils.game_file_path.
+
+        :param player_id:
+        :param game_number:"""
+        if self.request_trace is None or self.request_trace_path is None:
+            return
+        path = game_file_path(self.request_trace_path, player_id, game_number)
+        self.request_trace.dump(path)
+        logger.info(f"Wrote {len(self.request_trace)} traced requests to {path}")
+
     @final
     async def _advance_steps(self, steps: int):
         """Advances the game loop by amount of 'steps'. This function is meant to be used as a debugging and testing tool only.
         If you are using this, please be aware of the consequences, e.g. 'self.units' will be filled with completely new data."""
-        await self._after_step()
-        # Advance simulation by exactly "steps" frames
-        await self.client.step(steps)
-        state = await self.client.observation()
-        gs = GameState(state.observation)
-        proto_game_info = await self.client._execute(game_info=sc_pb.RequestGameInfo())
-        self._prepare_step(gs, proto_game_info)
-        await self.issue_events()
+        # Runs during on_step, so the time is already counted in the ON_STEP phase of the current iteration
+        with self.step_profiler.paused():
+            await self._after_step()
+            # Advance simulation by exactly "steps" frames
+            await self.client.step(steps)
+            state = await self.client.observation()
+            gs = GameState(state.observation)
+            proto_game_info = None
+            if self._pathing_grid_resync_due(gs.game_loop):
+                proto_game_info = await self.client._execute(game_info=sc_pb.RequestGameInfo())
+            self._prepare_step(gs, proto_game_info)
+            await self.issue_events()
 
     @final
     async def issue_events(self):
@@ -781,17 +1140,19 @@ class BotAIInternal(ABC):
             return self.calculate_distances()
         return self._cached_cdist
 
+    @final
+    @property
+    def _spatial_index(self) -> cKDTree:
+        """ KD-tree over the positions of all units, built on first access in each game_loop (distance method 4). """
+        if self._generated_frame != self.state.game_loop:
+            return self.calculate_distances()
+        return self._cached_spatial_index
+
     @final
     def _calculate_distances_method1(self) -> np.ndarray:
         self._generated_frame = self.state.game_loop
-        # Converts tuple [(1, 2), (3, 4)] to flat list like [1, 2, 3, 4]
-        flat_positions = (coord for unit in self.all_units for coord in unit.position_tuple)
-        # Converts to numpy array, then converts the flat array back to shape (n, 2): [[1, 2], [3, 4]]
-        positions_array: np.ndarray = np.fromiter(
-            flat_positions,
-            dtype=float,
-            count=2 * self._units_count,
-        ).reshape((self._units_count, 2))
+        # Array of shape (n, 2): [[1, 2], [3, 4]], row i belongs to the unit with distance_calculation_index i
+        positions_array: np.ndarray = self.unit_frame.positions
         assert len(positions_array) == self._units_count
         # See performance benchmarks
         self._cached_pdist = pdist(positions_array, "sqeuclidean")
@@ -801,17 +1162,11 @@ class BotAIInternal(ABC):
     @final
     def _calculate_distances_method2(self) -> np.ndarray:
         self._generated_frame = self.state.game_loop
-        # Converts tuple [(1, 2), (3, 4)] to flat list like [1, 2, 3, 4]
-        flat_positions = (coord for unit in self.all_units for coord in unit.position_tuple)
-        # Converts to numpy array, then converts the flat array back to shape (n, 2): [[1, 2], [3, 4]]
-        positions_array: np.ndarray = np.fromiter(
-            flat_positions,
-            dtype=float,
-            count=2 * self._units_count,
-        ).reshape((self._units_count, 2))
+        # Array of shape (n, 2): [[1, 2], [3, 4]], row i belongs to the unit with distance_calculation_index i
+        positions_array: np.ndarray = self.unit_frame.positions
         assert len(positions_array) == self._units_count
         # See performance benchmarks
-        self._cached_cdist = cdist(positions_array, positions_array, "sqeuclidean")
+        self._cached_cdist = self._cdist_with_static_block(positions_array)
 
         return self._cached_cdist
 
@@ -819,17 +1174,118 @@ class BotAIInternal(ABC):
     def _calculate_distances_method3(self) -> np.ndarray:
         """ Nearly same as above, but without asserts"""
         self._generated_frame = self.state.game_loop
-        flat_positions = (coord for unit in self.all_units for coord in unit.position_tuple)
-        positions_array: np.ndarray = np.fromiter(
-            flat_positions,
-            dtype=float,
-            count=2 * self._units_count,
-        ).reshape((-1, 2))
+        positions_array: np.ndarray = self.unit_frame.positions
         # See performance benchmarks
-        self._cached_cdist = cdist(positions_array, positions_array, "sqeuclidean")
+        self._cached_cdist = self._cdist_with_static_block(positions_array)
 
         return self._cached_cdist
 
+    @final
+    def _update_static_distances(self) -> bool:
+        """Updates the squared distance matrix between the static units, which are the first rows of the unit frame.
+        The matrix is kept across frames by tag and only recalculated if a static unit appeared or moved.
+        If static units only disappeared (mined out mineral field, destroyed structure), the cached matrix is reduced.
+        Returns True if the matrix changed since the last frame."""
+        static_count: int = self._static_units_count
+        tags: np.ndarray = self.unit_frame.tag[:static_count]
+        positions: np.ndarray = self.unit_frame.positions[:static_count]
+        cached_tags: np.ndarray = self._static_distances_tags
+        if np.array_equal(tags, cached_tags):
+            if np.array_equal(positions, self._static_distances_positions):
+                return False
+        elif len(cached_tags):
+            # Find the rows of the current static units in the cached matrix
+            sorter = np.argsort(cached_tags)
+            found = sorter[np.searchsorted(cached_tags, tags, sorter=sorter).clip(max=len(cached_tags) - 1)]
+            if np.array_equal(cached_tags[found], tags) and np.array_equal(
+                self._static_distances_positions[found], positions
+            ):
+                self._static_distances = self._static_distances[np.ix_(found, found)]
+                self._static_distances_tags = tags
+                self._static_distances_positions = positions
+                return True
+        self._static_distances = cdist(positions, positions, "sqeuclidean")
+        self._static_distances_tags = tags
+        self._static_distances_positions = positions
+        return True
+
+    @final
+    def _cdist_with_static_block(self, positions_array: np.ndarray) -> np.ndarray:
+        """Calculates the squared distance matrix of all units into a buffer that is reused across frames.
+        The block of static units stays in the buffer as long as the static units don't change, only the rows and
+        columns of units that can move are calculated each frame.
+        Returns a copy of the buffer, so a matrix that is kept after the frame doesn't change.
+
+        :param positions_array:
+        """
+        units_count: int = len(positions_array)
+        static_count: int = self._static_units_count
+        static_changed: bool = self._update_static_distances()
+        buffer: np.ndarray = self._distances_buffer
+        if len(buffer) < units_count:
+            # Leave some room so that the buffer does not have to be reallocated every time a unit spawns
+            buffer = self._distances_buffer = np.empty((units_count + 64, units_count + 64))
+            static_changed = True
+        if static_changed:
+            buffer[:static_count, :static_count] = self._static_distances
+        dynamic_distances = cdist(positions_array[static_count:], positions_array, "sqeuclidean")
+        buffer[static_count:units_count, :units_count] = dynamic_distances
+        buffer[:static_count, static_count:units_count] = dynamic_distances[:, :static_count].T
+        return buffer[:units_count, :units_count].copy()
+
+    @final
+    def _calculate_distances_method4(self) -> cKDTree:
+        """ Builds the spatial index instead of a distance matrix, rows of the tree are distance calculation indices. """
+        self._generated_frame = self.state.game_loop
+        self._cached_spatial_index = cKDTree(self.unit_frame.positions)
+
+        return self._cached_spatial_index
+
+    @final
+    def _rows_closer_than(self, distance: float, position: Union[Tuple[float, float], Point2, np.ndarray]) -> np.ndarray:
+        """Returns the distance calculation indices of all units that are closer than 'distance' to the position(s).
+        Uses the spatial index of distance method 4.
+
+        :param distance:
+        :param position: a single position or an array of shape (n, 2)
+        """
+        if not self.unit_frame.size or distance <= 0:
+            return np.empty(0, dtype=np.intp)
+        if not isinstance(position, np.ndarray):
+            # The index is 2 dimensional, e.g. Point3 positions are cut to x and y
+            position = (position[0], position[1])
+        # query_ball_point includes units at exactly 'distance', the next smaller float makes the check strict
+        rows = self._spatial_index.query_ball_point(position, np.nextafter(distance, 0), return_sorted=False)
+        if isinstance(position, np.ndarray) and position.ndim == 2:
+            rows = [row for rows_of_position in rows for row in rows_of_position]
+        return np.fromiter(rows, dtype=np.intp, count=len(rows))
+
+    @final
+    def _rows_closest_to(
+        self, position: Union[Tuple[float, float], Point2], members: np.ndarray, n: int = 1
+    ) -> np.ndarray:
+        """Returns the distance calculation indices of the n closest units to the position, sorted by distance.
+        Only units where 'members' is True are considered.
+        Uses the spatial index of distance method 4, asks the index for more neighbours until enough members were found.
+
+        :param position:
+        :param members: boolean array of the size of the unit frame
+        :param n:
+        """
+        size = self.unit_frame.size
+        n = min(n, int(np.count_nonzero(members)))
+        # The index is 2 dimensional, e.g. Point3 positions are cut to x and y
+        position = (position[0], position[1])
+        k = min(size, max(8, 4 * n))
+        while True:
+            _, rows = self._spatial_index.query(position, k=k)
+            # With k == 1, query returns a scalar instead of an array
+            rows = np.atleast_1d(rows)
+            rows = rows[members[rows]]
+            if len(rows) >= n or k == size:
+                return rows[:n]
+            k = min(size, 4 * k)
+
     # Helper functions
 
     @final
@@ -925,8 +1381,11 @@ class BotAIInternal(ABC):
         The following methods calculate the distances between all units once:
         method 1: Use scipy's pdist condensed matrix (1d array)
         method 2: Use scipy's cidst square matrix (2d array)
-        method 3: Use scipy's cidst square matrix (2d array) without asserts (careful: very weird error messages, but maybe slightly faster)"""
-        assert 0 <= method <= 3, f"Selected method was: {method}"
+        method 3: Use scipy's cidst square matrix (2d array) without asserts (careful: very weird error messages, but maybe slightly faster)
+        The following method does not calculate a distance matrix:
+        method 4: Use python's math.hypot for single distances and a KD-tree over all units, built lazily once per frame,
+            for Units.closer_than, closest_to, closest_n_units and in_distance_of_group"""
+        assert 0 <= method <= 4, f"Selected method was: {method}"
         if method == 0:
             self._distance_squared_unit_to_unit = self._distance_squared_unit_to_unit_method0
         elif method == 1:
@@ -938,3 +1397,6 @@ class BotAIInternal(ABC):
         elif method == 3:
             self._distance_squared_unit_to_unit = self._distance_squared_unit_to_unit_method2
             self.calculate_distances = self._calculate_distances_method3
+        elif method == 4:
+            self._distance_squared_unit_to_unit = self._distance_squared_unit_to_unit_method0
+            self.calculate_distances = self._calculate_distances_method4
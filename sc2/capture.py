@@ -0,0 +1,237 @@
+"""
+Capture files store the protobuf messages a bot exchanged with the SC2 client, so that games can be replayed offline.
+
+Layout: an 8 byte header (b"SC2CAP", format version, flags) followed by records of
+a 1 byte record kind (REQUEST or RESPONSE), the payload length as 4 byte little endian unsigned int and the payload,
+which is a serialized sc2api_pb2.Request or sc2api_pb2.Response.
+If the FLAG_ZSTD bit is set in the header, all records are compressed as one zstd stream (requires 'zstandard').
+
+Recording a game: set 'capture_path' (and optionally 'capture_compress') on the bot before the game starts.
+Replaying it without SC2: see main.py run_capture, which uses the ReplayWebSocket in this file.
+"""
+from __future__ import annotations
+
+import struct
+from collections import deque
+from pathlib import Path
+from typing import BinaryIO, Deque, Generator, Optional, Tuple, Union
+
+from loguru import logger
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC: bytes = b"SC2CAP"
+FORMAT_VERSION: int = 1
+FLAG_ZSTD: int = 1 << 0
+
+# Record kinds
+REQUEST: int = 0
+RESPONSE: int = 1
+
+_HEADER = struct.Struct("<6sBB")
+_RECORD = struct.Struct("<BI")
+
+
+class CaptureFormatError(Exception):
+    pass
+
+
+class CaptureMismatchError(Exception):
+    """ Raised by the ReplayWebSocket if the bot sends a request that the recorded game did not send at this point. """
+
+
+class CaptureWriter:
+    """Writes requests and responses to a capture file.
+
+    Example::
+
+        with CaptureWriter("game.sc2cap") as writer:
+            writer.write_response(response_game_data)
+            writer.write_response(response_game_info)
+            for response_observation in responses:
+                writer.write_response(response_observation)
+    """
+
+    def __init__(self, path: Union[str, Path], compress: bool = False):
+        """
+        :param path:
+        :param compress: compress the records with zstd
+        """
+        if compress and zstandard is None:
+            raise ImportError("Compressed captures require the 'zstandard' package")
+        self.path: Path = Path(path)
+        self._raw_file: BinaryIO = open(self.path, "wb")
+        self._raw_file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, FLAG_ZSTD if compress else 0))
+        self._file: Optional[BinaryIO] = (
+            zstandard.ZstdCompressor().stream_writer(self._raw_file) if compress else self._raw_file
+        )
+
+    def write(self, kind: int, payload: bytes):
+        """
+        :param kind: REQUEST or RESPONSE
+        :param payload: serialized protobuf message
+        """
+        self._file.write(_RECORD.pack(kind, len(payload)))
+        self._file.write(payload)
+
+    def write_request(self, request: Union[sc_pb.Request, bytes]):
+        self.write(REQUEST, request if isinstance(request, bytes) else request.SerializeToString())
+
+    def write_response(self, response: Union[sc_pb.Response, bytes]):
+        self.write(RESPONSE, response if isinstance(response, bytes) else response.SerializeToString())
+
+    def close(self):
+        if self._file is not None:
+            # Closing the zstd writer also closes the underlying file
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> CaptureWriter:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_capture(path: Union[str, Path]) -> Generator[Tuple[int, bytes], None, None]:
+    """Yields (record kind, payload) of all records of a capture file in order.
+
+    :param path:
+    """
+    with open(path, "rb") as raw_file:
+        header = raw_file.read(_HEADER.size)
+        if len(header) != _HEADER.size:
+            raise CaptureFormatError(f"{path} is not a capture file")
+        magic, version, flags = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise CaptureFormatError(f"{path} is not a capture file")
+        if version != FORMAT_VERSION:
+            raise CaptureFormatError(f"{path} has capture format version {version}, expected {FORMAT_VERSION}")
+        file: BinaryIO = raw_file
+        if flags & FLAG_ZSTD:
+            if zstandard is None:
+                raise ImportError(f"{path} is compressed, reading it requires the 'zstandard' package")
+            file = zstandard.ZstdDecompressor().stream_reader(raw_file)
+        while True:
+            record = _read_exactly(file, _RECORD.size)
+            if not record:
+                return
+            if len(record) != _RECORD.size:
+                raise CaptureFormatError(f"{path} ends with a truncated record")
+            kind, length = _RECORD.unpack(record)
+            payload = _read_exactly(file, length)
+            if len(payload) != length:
+                raise CaptureFormatError(f"{path} ends with a truncated record")
+            yield kind, payload
+
+
+def _read_exactly(file: BinaryIO, size: int) -> bytes:
+    """Reads 'size' bytes, or less if the end of the file is reached. Streams may return less bytes per read call.
+
+    :param file:
+    :param size:
+    """
+    data = file.read(size)
+    if len(data) == size or not data:
+        return data
+    chunks = [data]
+    remaining = size - len(data)
+    while remaining:
+        chunk = file.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def read_responses(path: Union[str, Path]) -> Generator[sc_pb.Response, None, None]:
+    """Yields all responses of a capture file in order, requests are skipped.
+
+    :param path:
+    """
+    for kind, payload in read_capture(path):
+        if kind == RESPONSE:
+            response = sc_pb.Response()
+            response.ParseFromString(payload)
+            yield response
+
+
+class ReplayWebSocket:
+    """Stand-in for the websocket of an SC2 client, answers requests with the responses of a capture file.
+
+    Only the parts of aiohttp.ClientWebSocketResponse that Protocol uses are implemented.
+    Requests are matched to the recorded ones by their type. Action and debug requests that the bot sends in addition to
+    the recorded ones are answered with an empty response, recorded ones that the bot did not send are skipped,
+    so a bot that issues slightly different commands than the recorded bot can still be replayed.
+    """
+
+    # Request types that don't change the recorded game state in the replay, so they can be skipped or added
+    OPTIONAL_REQUESTS = frozenset({"action", "debug", "obs_action"})
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        :param path: capture file that was recorded with 'capture_path'
+        """
+        self.path: Path = Path(path)
+        self._records: Generator[Tuple[int, bytes], None, None] = read_capture(path)
+        # Recorded exchange that was looked at but not answered yet
+        self._peeked: Optional[Tuple[sc_pb.Request, bytes]] = None
+        self._pending: Deque[bytes] = deque()
+        self._status: int = sc_pb.Status.launched
+        self.closed: bool = False
+
+    def _next_exchange(self) -> Optional[Tuple[sc_pb.Request, bytes]]:
+        """ Returns the next recorded request and the serialized response to it, or None at the end of the capture. """
+        if self._peeked is not None:
+            exchange, self._peeked = self._peeked, None
+            return exchange
+        request: Optional[sc_pb.Request] = None
+        for kind, payload in self._records:
+            if kind == REQUEST:
+                request = sc_pb.Request()
+                request.ParseFromString(payload)
+            elif request is not None:
+                return request, payload
+        return None
+
+    async def send_bytes(self, data: bytes):
+        request = sc_pb.Request()
+        request.ParseFromString(data)
+        request_type: str = request.WhichOneof("request")
+        while True:
+            exchange = self._next_exchange()
+            if exchange is None:
+                raise CaptureMismatchError(f"{self.path} has no recorded response left for a '{request_type}' request")
+            recorded_request, response_bytes = exchange
+            recorded_type: str = recorded_request.WhichOneof("request")
+            if recorded_type == request_type:
+                break
+            if recorded_type in self.OPTIONAL_REQUESTS:
+                logger.debug(f"Skipping recorded '{recorded_type}' request that was not sent in the replay")
+                continue
+            if request_type in self.OPTIONAL_REQUESTS:
+                # Answer the additional request with an empty response and keep the recorded one for the next request
+                self._peeked = exchange
+                response = sc_pb.Response(status=self._status)
+                getattr(response, request_type).SetInParent()
+                self._pending.append(response.SerializeToString())
+                return
+            raise CaptureMismatchError(
+                f"Replay sent a '{request_type}' request, but the recorded game sent '{recorded_type}' at this point"
+            )
+        response = sc_pb.Response()
+        response.ParseFromString(response_bytes)
+        self._status = response.status
+        self._pending.append(response_bytes)
+
+    async def receive_bytes(self) -> bytes:
+        return self._pending.popleft()
+
+    async def close(self):
+        self.closed = True
+        self._records.close()
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 from loguru import logger
 from s2clientprotocol import debug_pb2 as debug_pb
@@ -10,10 +12,12 @@ from s2clientprotocol import sc2api_pb2 as sc_pb
 from s2clientprotocol import spatial_pb2 as spatial_pb
 
 from sc2.action import combine_actions
+from sc2.capture import ReplayWebSocket
 from sc2.data import ActionResult, ChatChannel, Race, Result, Status
 from sc2.game_data import AbilityData, GameData
+from sc2.game_data_cache import GameDataCache
 from sc2.game_info import GameInfo
-from sc2.ids.ability_id import AbilityId
+from sc2.ids.ability_id import AbilityId, ability_id_from_value
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.position import Point2, Point3
 from sc2.protocol import ConnectionAlreadyClosed, Protocol, ProtocolError
@@ -22,6 +26,17 @@ from sc2.unit import Unit
 from sc2.units import Units
 
 
+@dataclass
+class _PendingQuery:
+    """ A query that waits to be sent as part of the next RequestQuery, see Client._query. """
+
+    pathing: List[query_pb.RequestQueryPathing]
+    placements: List[query_pb.RequestQueryBuildingPlacement]
+    abilities: List[query_pb.RequestQueryAvailableAbilities]
+    ignore_resource_requirements: bool
+    future: asyncio.Future = field(repr=False)
+
+
 # pylint: disable=R0904
 class Client(Protocol):
 
@@ -45,6 +60,12 @@ class Client(Protocol):
 
         self._renderer = None
         self.raw_affects_selection = False
+        # Merge the queries that are awaited at the same time (e.g. with asyncio.gather) into one RequestQuery
+        self.batch_queries: bool = False
+        # Seconds to wait for more queries before sending a batch, 0 only merges queries of the same event loop iteration
+        self.query_batch_window: float = 0
+        self._pending_queries: List[_PendingQuery] = []
+        self._query_batch_task: Optional[asyncio.Task] = None
 
     @property
     def in_game(self) -> bool:
@@ -155,11 +176,37 @@ class Client(Protocol):
         step_size = step_size or self.game_step
         return await self._execute(step=sc_pb.RequestStep(count=step_size))
 
-    async def get_game_data(self) -> GameData:
+    def _queue_step(self, step_size: int = None):
+        """Like step, but the request is sent together with the next request, see Protocol._queue.
+
+        :param step_size:"""
+        step_size = step_size or self.game_step
+        self._queue(step=sc_pb.RequestStep(count=step_size))
+
+    async def get_game_data(self,
+                            cache_dir: Optional[str] = None,
+                            ping: Optional[sc_pb.ResponsePing] = None) -> GameData:
+        """
+        :param cache_dir: if set, the game data is loaded from this directory instead of requested if it was stored
+            there before, see game_data_cache.py. The cache is not used while a game is captured or a capture is
+            replayed, so that every capture contains the data request and replays don't depend on the cache.
+        :param ping: response of a ping to this client, identifies the game version in the cache, requested if None
+        """
+        cache: Optional[GameDataCache] = None
+        if cache_dir is not None and self._capture is None and not isinstance(self._ws, ReplayWebSocket):
+            cache = GameDataCache(cache_dir)
+            if ping is None:
+                ping = (await self.ping()).ping
+            game_data = cache.load(ping)
+            if game_data is not None:
+                return game_data
         result = await self._execute(
             data=sc_pb.RequestData(ability_id=True, unit_type_id=True, upgrade_id=True, buff_id=True, effect_id=True)
         )
-        return GameData(result.data)
+        game_data = GameData(result.data)
+        if cache is not None:
+            cache.save(ping, result.data, game_data)
+        return game_data
 
     async def dump_data(self, ability_id=True, unit_type_id=True, upgrade_id=True, buff_id=True, effect_id=True):
         """
@@ -202,6 +249,148 @@ class Client(Protocol):
             return [ActionResult(r) for r in res.action.result]
         return [ActionResult(r) for r in res.action.result if ActionResult(r) != ActionResult.Success]
 
+    def _queue_actions(self, actions: List):
+        """Like actions, but the request is sent together with the next request, see Protocol._queue.
+        The action results are not returned and errors are ignored, like actions does on realtime=True.
+
+        :param actions:"""
+        if actions:
+            self._queue(
+                action=sc_pb.RequestAction(actions=(sc_pb.Action(action_raw=a) for a in combine_actions(actions))),
+                ignore_errors=True,
+            )
+
+    async def _query(
+        self,
+        pathing: Iterable[query_pb.RequestQueryPathing] = (),
+        placements: Iterable[query_pb.RequestQueryBuildingPlacement] = (),
+        abilities: Iterable[query_pb.RequestQueryAvailableAbilities] = (),
+        ignore_resource_requirements: bool = False,
+    ) -> Tuple[List[Any], List[Any], List[Any]]:
+        """Sends a query and returns the results of its pathing, placement and ability queries.
+        If 'self.batch_queries' is set, all queries that are made before the event loop continues are sent
+        together as one RequestQuery and each caller receives its part of the response. If a batch fails, its queries
+        are sent again one by one, so each caller only receives the error of its own query.
+
+        :param pathing:
+        :param placements:
+        :param abilities:
+        :param ignore_resource_requirements: only applies to placement and ability queries
+        """
+        pathing, placements, abilities = list(pathing), list(placements), list(abilities)
+        if not self.batch_queries:
+            return await self._query_now(pathing, placements, abilities, ignore_resource_requirements)
+        future = asyncio.get_event_loop().create_future()
+        self._pending_queries.append(
+            _PendingQuery(pathing, placements, abilities, ignore_resource_requirements, future)
+        )
+        if self._query_batch_task is None:
+            # Runs after the coroutines that are ready to run now, so their queries end up in the same batch
+            self._query_batch_task = asyncio.ensure_future(self._send_query_batches())
+        return await future
+
+    async def _query_now(
+        self,
+        pathing: List[query_pb.RequestQueryPathing],
+        placements: List[query_pb.RequestQueryBuildingPlacement],
+        abilities: List[query_pb.RequestQueryAvailableAbilities],
+        ignore_resource_requirements: bool,
+    ) -> Tuple[List[Any], List[Any], List[Any]]:
+        """Sends a query on its own, see _query.
+
+        :param pathing:
+        :param placements:
+        :param abilities:
+        :param ignore_resource_requirements:
+        """
+        result = await self._execute(
+            query=query_pb.RequestQuery(
+                pathing=pathing,
+                placements=placements,
+                abilities=abilities,
+                ignore_resource_requirements=ignore_resource_requirements,
+            )
+        )
+        return list(result.query.pathing), list(result.query.placements), list(result.query.abilities)
+
+    async def _send_query_batches(self):
+        """Sends the pending queries until there are none left. Only one batch is in flight at a time,
+        queries that are made while a batch is sent are sent with the next batch."""
+        try:
+            while self._pending_queries:
+                if self.query_batch_window > 0:
+                    await asyncio.sleep(self.query_batch_window)
+                queries, self._pending_queries = self._pending_queries, []
+                await self._send_query_batch(queries)
+        finally:
+            self._query_batch_task = None
+
+    async def _send_query_batch(self, queries: List[_PendingQuery]):
+        """
+        :param queries:
+        """
+        # ignore_resource_requirements is set per RequestQuery, queries that only contain pathing don't depend on it
+        batches: Dict[Optional[bool], List[_PendingQuery]] = {}
+        for query in queries:
+            key = query.ignore_resource_requirements if query.placements or query.abilities else None
+            batches.setdefault(key, []).append(query)
+        if None in batches and len(batches) > 1:
+            pathing_queries = batches.pop(None)
+            next(iter(batches.values())).extend(pathing_queries)
+
+        for ignore_resource_requirements, batch in batches.items():
+            try:
+                result = await self._execute(
+                    query=query_pb.RequestQuery(
+                        pathing=[request for query in batch for request in query.pathing],
+                        placements=[request for query in batch for request in query.placements],
+                        abilities=[request for query in batch for request in query.abilities],
+                        ignore_resource_requirements=bool(ignore_resource_requirements),
+                    )
+                )
+            except asyncio.CancelledError:
+                for query in batch:
+                    query.future.cancel()
+                raise
+            except Exception as e:  # pylint: disable=W0703
+                if len(batch) == 1:
+                    if not batch[0].future.done():
+                        batch[0].future.set_exception(e)
+                    continue
+                # Find the failing queries by sending each one on its own
+                for query in batch:
+                    if query.future.done():
+                        continue
+                    try:
+                        query_result = await self._query_now(
+                            query.pathing, query.placements, query.abilities, query.ignore_resource_requirements
+                        )
+                    except asyncio.CancelledError:
+                        for remaining_query in batch:
+                            remaining_query.future.cancel()
+                        raise
+                    except Exception as query_error:  # pylint: disable=W0703
+                        if not query.future.done():
+                            query.future.set_exception(query_error)
+                        continue
+                    if not query.future.done():
+                        query.future.set_result(query_result)
+                continue
+            pathing_index = placement_index = ability_index = 0
+            for query in batch:
+                pathing_end = pathing_index + len(query.pathing)
+                placement_end = placement_index + len(query.placements)
+                ability_end = ability_index + len(query.abilities)
+                if not query.future.done():
+                    query.future.set_result(
+                        (
+                            result.query.pathing[pathing_index:pathing_end],
+                            result.query.placements[placement_index:placement_end],
+                            result.query.abilities[ability_index:ability_end],
+                        )
+                    )
+                pathing_index, placement_index, ability_index = pathing_end, placement_end, ability_end
+
     async def query_pathing(self, start: Union[Unit, Point2, Point3],
                             end: Union[Point2, Point3]) -> Optional[Union[int, float]]:
         """Caution: returns "None" when path not found
@@ -215,8 +404,8 @@ class Client(Protocol):
             path = [query_pb.RequestQueryPathing(start_pos=start.as_Point2D, end_pos=end.as_Point2D)]
         else:
             path = [query_pb.RequestQueryPathing(unit_tag=start.tag, end_pos=end.as_Point2D)]
-        result = await self._execute(query=query_pb.RequestQuery(pathing=path))
-        distance = float(result.query.pathing[0].distance)
+        pathing_results, _, _ = await self._query(pathing=path)
+        distance = float(pathing_results[0].distance)
         if distance <= 0.0:
             return None
         return distance
@@ -240,8 +429,8 @@ class Client(Protocol):
             )
         else:
             path = (query_pb.RequestQueryPathing(unit_tag=p1.tag, end_pos=p2.as_Point2D) for p1, p2 in zipped_list)
-        results = await self._execute(query=query_pb.RequestQuery(pathing=path))
-        return [float(d.distance) for d in results.query.pathing]
+        pathing_results, _, _ = await self._query(pathing=path)
+        return [float(d.distance) for d in pathing_results]
 
     async def _query_building_placement_fast(
         self, ability: AbilityId, positions: List[Union[Point2, Point3]], ignore_resources: bool = True
@@ -253,17 +442,15 @@ class Client(Protocol):
         :param positions:
         :param ignore_resources:
         """
-        result = await self._execute(
-            query=query_pb.RequestQuery(
-                placements=(
-                    query_pb.RequestQueryBuildingPlacement(ability_id=ability.value, target_pos=position.as_Point2D)
-                    for position in positions
-                ),
-                ignore_resource_requirements=ignore_resources,
-            )
+        _, placement_results, _ = await self._query(
+            placements=(
+                query_pb.RequestQueryBuildingPlacement(ability_id=ability.value, target_pos=position.as_Point2D)
+                for position in positions
+            ),
+            ignore_resource_requirements=ignore_resources,
         )
         # Success enum value is 1, see https://github.com/Blizzard/s2client-proto/blob/9906df71d6909511907d8419b33acc1a3bd51ec0/s2clientprotocol/error.proto#L7
-        return [p.result == 1 for p in result.query.placements]
+        return [p.result == 1 for p in placement_results]
 
     async def query_building_placement(
         self,
@@ -277,17 +464,15 @@ class Client(Protocol):
         :param positions:
         :param ignore_resources:"""
         assert isinstance(ability, AbilityData)
-        result = await self._execute(
-            query=query_pb.RequestQuery(
-                placements=(
-                    query_pb.RequestQueryBuildingPlacement(ability_id=ability.id.value, target_pos=position.as_Point2D)
-                    for position in positions
-                ),
-                ignore_resource_requirements=ignore_resources,
-            )
+        _, placement_results, _ = await self._query(
+            placements=(
+                query_pb.RequestQueryBuildingPlacement(ability_id=ability.id.value, target_pos=position.as_Point2D)
+                for position in positions
+            ),
+            ignore_resource_requirements=ignore_resources,
         )
         # Unnecessary converting to ActionResult?
-        return [ActionResult(p.result) for p in result.query.placements]
+        return [ActionResult(p.result) for p in placement_results]
 
     async def query_available_abilities(
         self, units: Union[List[Unit], Units], ignore_resource_requirements: bool = False
@@ -300,29 +485,25 @@ class Client(Protocol):
             units = [units]
             input_was_a_list = False
         assert units
-        result = await self._execute(
-            query=query_pb.RequestQuery(
-                abilities=(query_pb.RequestQueryAvailableAbilities(unit_tag=unit.tag) for unit in units),
-                ignore_resource_requirements=ignore_resource_requirements,
-            )
+        _, _, ability_results = await self._query(
+            abilities=(query_pb.RequestQueryAvailableAbilities(unit_tag=unit.tag) for unit in units),
+            ignore_resource_requirements=ignore_resource_requirements,
         )
         """ Fix for bots that only query a single unit, may be removed soon """
         if not input_was_a_list:
-            return [[AbilityId(a.ability_id) for a in b.abilities] for b in result.query.abilities][0]
-        return [[AbilityId(a.ability_id) for a in b.abilities] for b in result.query.abilities]
+            return [[ability_id_from_value(a.ability_id) for a in b.abilities] for b in ability_results][0]
+        return [[ability_id_from_value(a.ability_id) for a in b.abilities] for b in ability_results]
 
     async def query_available_abilities_with_tag(
         self, units: Union[List[Unit], Units], ignore_resource_requirements: bool = False
     ) -> Dict[int, Set[AbilityId]]:
         """ Query abilities of multiple units """
 
-        result = await self._execute(
-            query=query_pb.RequestQuery(
-                abilities=(query_pb.RequestQueryAvailableAbilities(unit_tag=unit.tag) for unit in units),
-                ignore_resource_requirements=ignore_resource_requirements,
-            )
+        _, _, ability_results = await self._query(
+            abilities=(query_pb.RequestQueryAvailableAbilities(unit_tag=unit.tag) for unit in units),
+            ignore_resource_requirements=ignore_resource_requirements,
         )
-        return {b.unit_tag: {AbilityId(a.ability_id) for a in b.abilities} for b in result.query.abilities}
+        return {b.unit_tag: {ability_id_from_value(a.ability_id) for a in b.abilities} for b in ability_results}
 
     async def chat_send(self, message: str, team_only: bool):
         """ Writes a message to the chat """
@@ -577,9 +758,11 @@ class Client(Protocol):
         assert isinstance(p, Point3)
         self._debug_spheres.append(DrawItemSphere(start_point=p, radius=r, color=color))
 
-    async def _send_debug(self):
+    async def _send_debug(self, queue: bool = False):
         """Sends the debug draw execution. This is run by main.py now automatically, if there is any items in the list. You do not need to run this manually any longer.
         Check examples/terran/ramp_wall.py for example drawing. Each draw request needs to be sent again in every single on_step iteration.
+
+        :param queue: send the request together with the next request, see Protocol._queue
         """
         debug_hash = (
             sum(hash(item) for item in self._debug_texts),
@@ -591,27 +774,26 @@ class Client(Protocol):
             if debug_hash != self._debug_hash_tuple_last_iteration:
                 # Something has changed, either more or less is to be drawn, or a position of a drawing changed (e.g. when drawing on a moving unit)
                 self._debug_hash_tuple_last_iteration = debug_hash
-                try:
-                    await self._execute(
-                        debug=sc_pb.RequestDebug(
-                            debug=[
-                                debug_pb.DebugCommand(
-                                    draw=debug_pb.DebugDraw(
-                                        text=[text.to_proto()
-                                              for text in self._debug_texts] if self._debug_texts else None,
-                                        lines=[line.to_proto()
-                                               for line in self._debug_lines] if self._debug_lines else None,
-                                        boxes=[box.to_proto()
-                                               for box in self._debug_boxes] if self._debug_boxes else None,
-                                        spheres=[sphere.to_proto()
-                                                 for sphere in self._debug_spheres] if self._debug_spheres else None,
-                                    )
-                                )
-                            ]
+                debug_request = sc_pb.RequestDebug(
+                    debug=[
+                        debug_pb.DebugCommand(
+                            draw=debug_pb.DebugDraw(
+                                text=[text.to_proto() for text in self._debug_texts] if self._debug_texts else None,
+                                lines=[line.to_proto() for line in self._debug_lines] if self._debug_lines else None,
+                                boxes=[box.to_proto() for box in self._debug_boxes] if self._debug_boxes else None,
+                                spheres=[sphere.to_proto()
+                                         for sphere in self._debug_spheres] if self._debug_spheres else None,
+                            )
                         )
-                    )
-                except ProtocolError:
-                    return
+                    ]
+                )
+                if queue:
+                    self._queue(debug=debug_request, ignore_errors=True)
+                else:
+                    try:
+                        await self._execute(debug=debug_request)
+                    except ProtocolError:
+                        return
             self._debug_draw_last_frame = True
             self._debug_texts.clear()
             self._debug_lines.clear()
@@ -620,13 +802,13 @@ class Client(Protocol):
         elif self._debug_draw_last_frame:
             # Clear drawing if we drew last frame but nothing to draw this frame
             self._debug_hash_tuple_last_iteration = (0, 0, 0, 0)
-            await self._execute(
-                debug=sc_pb.RequestDebug(
-                    debug=[
-                        debug_pb.DebugCommand(draw=debug_pb.DebugDraw(text=None, lines=None, boxes=None, spheres=None))
-                    ]
-                )
+            debug_request = sc_pb.RequestDebug(
+                debug=[debug_pb.DebugCommand(draw=debug_pb.DebugDraw(text=None, lines=None, boxes=None, spheres=None))]
             )
+            if queue:
+                self._queue(debug=debug_request)
+            else:
+                await self._execute(debug=debug_request)
             self._debug_draw_last_frame = False
 
     async def debug_leave(self):
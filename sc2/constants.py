@@ -490,6 +490,30 @@ ALL_GAS: Set[UnitTypeId] = {
     UnitTypeId.EXTRACTOR,
     UnitTypeId.EXTRACTORRICH,
 }
+# Structures that do not block ground pathing, used when the pathing grid is updated incrementally
+STRUCTURES_NOT_BLOCKING_PATHING: Set[UnitTypeId] = {
+    UnitTypeId.SUPPLYDEPOTLOWERED,
+    UnitTypeId.CREEPTUMOR,
+    UnitTypeId.CREEPTUMORBURROWED,
+    UnitTypeId.CREEPTUMORQUEEN,
+    UnitTypeId.SPINECRAWLERUPROOTED,
+    UnitTypeId.SPORECRAWLERUPROOTED,
+}
+# Protoss structures that can be placed without power, used by the placement engine
+STRUCTURES_NOT_REQUIRING_POWER: Set[UnitTypeId] = {
+    UnitTypeId.NEXUS,
+    UnitTypeId.PYLON,
+    UnitTypeId.ASSIMILATOR,
+    UnitTypeId.ASSIMILATORRICH,
+}
+# Zerg structures that can be placed with or without creep, all other zerg structures need creep
+STRUCTURES_NOT_REQUIRING_CREEP: Set[UnitTypeId] = {
+    UnitTypeId.HATCHERY,
+    UnitTypeId.EXTRACTOR,
+    UnitTypeId.EXTRACTORRICH,
+}
+# Amount of cells between the footprint of a town hall and the footprints of resources
+TOWNHALL_RESOURCE_DISTANCE: int = 3
 DAMAGE_BONUS_PER_UPGRADE: Dict[UnitTypeId, Dict[TargetType, Any]] = {
     #
     # Protoss
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+
+
+def write_atomically(path: Path, data: bytes):
+    """Writes the data to a temporary file next to 'path' and then replaces 'path' with it,
+    so that other processes either read the previous or the complete new file.
+
+    :param path: the parent directory is created if it does not exist
+    :param data:
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle, temporary_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.stem}-", suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as f:
+            f.write(data)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+def game_file_path(path: str | Path, player_id: int, game_number: int) -> Path:
+    """Adds the process id, the game number and the player id to the file name of 'path', so that the files of
+    consecutive games, of both bots in a game and of games in other processes don't overwrite each other.
+    E.g. 'profile.npz' becomes 'profile_4242_1_p2.npz' for player 2 in the first game of process 4242.
+
+    :param path:
+    :param player_id:
+    :param game_number: counts the games of this process, starting at 1
+    """
+    path = Path(path)
+    return path.with_name(f"{path.stem}_{os.getpid()}_{game_number}_p{player_id}{path.suffix}")
@@ -0,0 +1,231 @@
+"""
+Distance and direction fields to fixed targets, so that ground distances and the next step towards a target can be
+looked up for any position without a search or a server query.
+
+A field is computed once per target with one Dijkstra search over the whole pathing grid, see Pathfinder.distance_field.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from sc2.pathfinding import _MOVES, Pathfinder
+from sc2.position import Point2
+
+Position = Union[Point2, Tuple[float, float]]
+
+
+def direction_field(grid: np.ndarray, distance_field: np.ndarray) -> np.ndarray:
+    """Returns for every cell the index into pathfinding._MOVES of the move towards the target, indexed [y, x].
+    -1 for the target cell itself and for cells that can't reach the target.
+
+    :param grid: pathing grid the distance field was computed on, indexed [y, x]
+    :param distance_field: path lengths to the target, inf where the target can't be reached
+    """
+    height, width = grid.shape
+    padded_grid = np.pad(grid, 1, constant_values=False)
+    padded_distance = np.pad(distance_field, 1, constant_values=np.inf)
+
+    def shifted(padded: np.ndarray, dx: int, dy: int) -> np.ndarray:
+        """ result[y, x] = padded value of the cell (x + dx, y + dy) """
+        return padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+
+    neighbor_distances = np.empty((len(_MOVES), height, width))
+    costs = np.empty((len(_MOVES), 1, 1))
+    for i, (dx, dy, cost) in enumerate(_MOVES):
+        allowed = grid & shifted(padded_grid, dx, dy)
+        if dx and dy:
+            # Same rule as the graph of the Pathfinder: no corner cutting
+            allowed &= shifted(padded_grid, dx, 0) & shifted(padded_grid, 0, dy)
+        neighbor_distances[i] = np.where(allowed, shifted(padded_distance, dx, dy), np.inf)
+        costs[i] = cost
+    directions = np.argmin(neighbor_distances + costs, axis=0)
+    # Only moves that get closer to the target, which excludes the target itself and unreachable cells
+    closer = np.take_along_axis(neighbor_distances, directions[None], axis=0)[0] < distance_field
+    return np.where(closer, directions, -1).astype(np.int8)
+
+
+class FlowField:
+    """ Distance and direction field of one target. """
+
+    __slots__ = ("target", "distances", "directions")
+
+    def __init__(self, target: Point2, distances: np.ndarray, directions: np.ndarray):
+        self.target: Point2 = target
+        # Path lengths to the target, indexed [y, x], inf where the target can't be reached
+        self.distances: np.ndarray = distances
+        # Index into pathfinding._MOVES of the next move, indexed [y, x], see direction_field
+        self.directions: np.ndarray = directions
+
+
+class FlowFields:
+    """Flow fields to many targets over one pathing grid.
+
+    Fields of the 'static' targets (e.g. start locations, expansions and ramps) are kept for the whole game and can be
+    computed in a background thread with precompute(). Fields of any other target are computed on first use and the
+    least recently used of them are dropped once there are more than 'max_dynamic'.
+
+    When the pathing grid changes, the static fields are computed again in the background and the previous fields are
+    used until their replacement is ready, so structures are ignored by a field for a few steps after they were built.
+
+    Targets are identified by their position, so lookups for the same Point2 always use the same field.
+
+    Example::
+
+        fields = self.flow_fields
+        distance = fields.distance_to(marine.position, self.enemy_start_locations[0])
+        marine.move(fields.next_step(marine.position, self.enemy_start_locations[0], steps=4))
+    """
+
+    def __init__(self, pathing_grid: np.ndarray, max_dynamic: int = 32):
+        """
+        :param pathing_grid: GameInfo.pathing_grid.data_numpy, indexed [y, x], non-zero where ground units can walk
+        :param max_dynamic: amount of fields of targets that are not static which are kept
+        """
+        self.max_dynamic: int = max_dynamic
+        # Only used by the thread that calls field() and update(), background threads use their own copy of the grid
+        self.pathfinder: Pathfinder = Pathfinder(pathing_grid)
+        self._static_targets: Set[Point2] = set()
+        self._static: Dict[Point2, FlowField] = {}
+        self._dynamic: OrderedDict[Point2, FlowField] = OrderedDict()
+        # Increased when the grid changes, background threads only store fields of the current grid
+        self._generation: int = 0
+        # Held while a background thread stores a field or the generation is increased, never during a computation
+        self._lock: threading.Lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._static) + len(self._dynamic)
+
+    @property
+    def ready(self) -> bool:
+        """ True if no fields are computed in the background. """
+        return self._worker is None or not self._worker.is_alive()
+
+    def precompute(self, targets: Iterable[Position], background: bool = True):
+        """Marks the targets as static and computes their fields.
+        Fields that are used before the background thread reached them are computed right away.
+
+        :param targets:
+        :param background: compute in a background thread instead of blocking until all fields are done
+        """
+        targets = [Point2(target) for target in targets]
+        self._static_targets.update(targets)
+        if not background:
+            for target in targets:
+                self.field(target)
+            return
+        self._start_worker(targets)
+
+    def _start_worker(self, targets: List[Point2]):
+        """Computes the fields of the targets on the current grid in a background thread.
+        A thread that is still running stops once the generation changed.
+
+        :param targets:
+        """
+        self._worker = threading.Thread(
+            target=self._compute_static,
+            args=(targets, Pathfinder(self.pathfinder.grid), self._generation),
+            daemon=True,
+        )
+        self._worker.start()
+
+    def _compute_static(self, targets: Iterable[Point2], pathfinder: Pathfinder, generation: int):
+        for target in targets:
+            if generation != self._generation:
+                return
+            field = self._compute(target, pathfinder)
+            with self._lock:
+                if generation != self._generation:
+                    return
+                self._static[target] = field
+
+    @staticmethod
+    def _compute(target: Point2, pathfinder: Pathfinder) -> FlowField:
+        distances = pathfinder.distance_field(target)
+        if distances is None:
+            distances = np.full(pathfinder.grid.shape, np.inf)
+        return FlowField(target, distances.astype(np.float32), direction_field(pathfinder.grid, distances))
+
+    def field(self, target: Position) -> FlowField:
+        """Returns the field of the target, computes it if it is not cached.
+
+        :param target:
+        """
+        target = Point2(target)
+        field = self._static.get(target)
+        if field is not None:
+            return field
+        if target in self._static_targets:
+            # Not reached by the background thread yet
+            field = self._compute(target, self.pathfinder)
+            with self._lock:
+                # Keep a field that the background thread stored in the meantime
+                return self._static.setdefault(target, field)
+        field = self._dynamic.get(target)
+        if field is not None:
+            self._dynamic.move_to_end(target)
+            return field
+        field = self._compute(target, self.pathfinder)
+        self._dynamic[target] = field
+        while len(self._dynamic) > self.max_dynamic:
+            self._dynamic.popitem(last=False)
+        return field
+
+    def update(self, pathing_grid: np.ndarray):
+        """Replaces the pathing grid, e.g. after the walls of a base were built.
+        If the grid changed, the fields of dynamic targets are dropped and computed again on their next use,
+        the fields of static targets are computed again in a background thread and replaced once they are ready.
+
+        :param pathing_grid:
+        """
+        previous = self.pathfinder.grid
+        self.pathfinder.update(pathing_grid)
+        if self.pathfinder.grid is previous:
+            return
+        with self._lock:
+            self._generation += 1
+        self._dynamic.clear()
+        if self._static_targets:
+            self._start_worker(list(self._static_targets))
+
+    def distance_to(self, position: Position, target: Position) -> Optional[float]:
+        """Returns the ground distance from the position to the target, None if the target can't be reached.
+
+        :param position:
+        :param target:
+        """
+        cell = self.pathfinder._cell(position)
+        if cell is None:
+            return None
+        distance = self.field(target).distances.item(cell[1], cell[0])
+        return None if distance == np.inf else distance
+
+    def next_step(self, position: Position, target: Position, steps: int = 1) -> Optional[Point2]:
+        """Returns the center of the cell that is 'steps' cells further on the shortest path to the target.
+        Returns the target cell if it is closer than that, None if the target can't be reached.
+
+        :param position:
+        :param target:
+        :param steps:
+        """
+        cell = self.pathfinder._cell(position)
+        if cell is None:
+            return None
+        field = self.field(target)
+        directions = field.directions
+        x, y = cell
+        direction = directions.item(y, x)
+        if direction == -1:
+            # Either the target cell or not connected to the target
+            return Point2((x + 0.5, y + 0.5)) if field.distances.item(y, x) == 0 else None
+        for _ in range(steps):
+            if direction == -1:
+                break
+            dx, dy, _cost = _MOVES[direction]
+            x, y = x + dx, y + dy
+            direction = directions.item(y, x)
+        return Point2((x + 0.5, y + 0.5))
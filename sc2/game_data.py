@@ -4,12 +4,25 @@ from __future__ import annotations
 from bisect import bisect_left
 from contextlib import suppress
 from dataclasses import dataclass
-from functools import lru_cache
-from typing import Dict, List, Optional, Union
-
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from sc2.constants import (
+    IS_ARMORED,
+    IS_BIOLOGICAL,
+    IS_LIGHT,
+    IS_MASSIVE,
+    IS_MECHANICAL,
+    IS_PSIONIC,
+    IS_STRUCTURE,
+    TARGET_AIR,
+    TARGET_GROUND,
+)
 from sc2.data import Attribute, Race
-from sc2.ids.ability_id import AbilityId
-from sc2.ids.unit_typeid import UnitTypeId
+from sc2.ids.ability_id import AbilityId, ability_id_from_value
+from sc2.ids.unit_typeid import UnitTypeId, unit_type_id_from_value
+from sc2.ids.upgrade_id import UpgradeId
 from sc2.unit_command import UnitCommand
 
 with suppress(ImportError):
@@ -22,9 +35,10 @@ FREE_ABILITIES = {"Lower", "Raise", "Land", "Lift", "Hold", "Harvest"}
 
 class GameData:
 
-    def __init__(self, data):
+    def __init__(self, data, lookup_tables: Optional[Dict[str, Any]] = None):
         """
         :param data:
+        :param lookup_tables: tables of GameData.lookup_tables of the same data, built from 'data' if None
         """
         ids = set(a.value for a in AbilityId if a.value != 0)
         self.abilities: Dict[int, AbilityData] = {
@@ -34,45 +48,311 @@ class GameData:
         self.units: Dict[int, UnitTypeData] = {u.unit_id: UnitTypeData(self, u) for u in data.units if u.available}
         self.upgrades: Dict[int, UpgradeData] = {u.upgrade_id: UpgradeData(self, u) for u in data.upgrades}
         # Cached UnitTypeIds so that conversion does not take long. This needs to be moved elsewhere if a new GameData object is created multiple times per game
+        if lookup_tables is None:
+            self._build_cost_tables()
+            self.unit_type_table: UnitTypeTable = UnitTypeTable(self.units)
+        else:
+            self._set_lookup_tables(lookup_tables)
+
+    def lookup_tables(self) -> Dict[str, Any]:
+        """Returns the precomputed cost and unit type tables, so that they can be stored next to the game data and don't
+        have to be built again, see game_data_cache.py."""
+        return {
+            "ability_units": {ability_id: unit._proto.unit_id for ability_id, unit in self._ability_units.items()},
+            "ability_upgrades": {
+                ability_id: upgrade._proto.upgrade_id
+                for ability_id, upgrade in self._ability_upgrades.items()
+            },
+            "ability_costs": self._ability_costs,
+            "unit_costs": self._unit_costs,
+            "unit_supply_costs": self._unit_supply_costs,
+            "upgrade_costs": self._upgrade_costs,
+            "unit_type_table": self.unit_type_table,
+        }
+
+    def _set_lookup_tables(self, lookup_tables: Dict[str, Any]):
+        """
+        :param lookup_tables: see GameData.lookup_tables
+        """
+        self._ability_units: Dict[int, UnitTypeData] = {
+            ability_id: self.units[unit_id]
+            for ability_id, unit_id in lookup_tables["ability_units"].items()
+        }
+        self._ability_upgrades: Dict[int, UpgradeData] = {
+            ability_id: self.upgrades[upgrade_id]
+            for ability_id, upgrade_id in lookup_tables["ability_upgrades"].items()
+        }
+        self._ability_costs: List[Optional[Cost]] = lookup_tables["ability_costs"]
+        self._unit_costs: List[Optional[Cost]] = lookup_tables["unit_costs"]
+        self._unit_supply_costs: List[Optional[float]] = lookup_tables["unit_supply_costs"]
+        self._upgrade_costs: List[Optional[Cost]] = lookup_tables["upgrade_costs"]
+        self.unit_type_table: UnitTypeTable = lookup_tables["unit_type_table"]
+
+    def _build_cost_tables(self):
+        """Fills the lookup tables of calculate_ability_cost, unit_cost, unit_supply_cost and upgrade_cost.
+        The tables are indexed by ability, unit type or upgrade id, entries that are None are computed on use."""
+        # Exact ability id -> the unit type or upgrade the ability creates
+        self._ability_units: Dict[int, UnitTypeData] = {}
+        for unit in self.units.values():
+            with suppress(ValueError):
+                ability = unit.creation_ability
+                if ability is None or not AbilityData.id_exists(ability.id.value) or ability.is_free_morph:
+                    continue
+                self._ability_units.setdefault(ability._proto.ability_id, unit)
+        self._ability_upgrades: Dict[int, UpgradeData] = {}
+        for upgrade in self.upgrades.values():
+            ability = upgrade.research_ability
+            if ability is not None:
+                self._ability_upgrades.setdefault(ability._proto.ability_id, upgrade)
+
+        # Entries whose computation fails (e.g. ids missing in UnitTypeId) stay None, so that the error happens on use
+        self._ability_costs: List[Optional[Cost]] = [None] * (max(self.abilities, default=0) + 1)
+        for ability_id, ability in self.abilities.items():
+            with suppress(Exception):
+                self._ability_costs[ability_id] = self._calculate_ability_cost(ability)
+        unit_table_size = max(self.units, default=0) + 1
+        self._unit_costs: List[Optional[Cost]] = [None] * unit_table_size
+        self._unit_supply_costs: List[Optional[float]] = [None] * unit_table_size
+        for unit_id in self.units:
+            with suppress(Exception):
+                self._unit_costs[unit_id] = self._calculate_unit_cost(unit_type_id_from_value(unit_id))
+            with suppress(Exception):
+                self._unit_supply_costs[unit_id] = self._calculate_unit_supply_cost(unit_type_id_from_value(unit_id))
+        self._upgrade_costs: List[Optional[Cost]] = [None] * (max(self.upgrades, default=0) + 1)
+        for upgrade_id, upgrade in self.upgrades.items():
+            self._upgrade_costs[upgrade_id] = upgrade.cost
 
-    @lru_cache(maxsize=256)
     def calculate_ability_cost(self, ability: Union[AbilityData, AbilityId, UnitCommand]) -> Cost:
+        """Returns the cost of the unit, structure, morph or upgrade the ability creates, Cost(0, 0) for other abilities.
+
+        :param ability:
+        """
         if isinstance(ability, AbilityId):
-            ability = self.abilities[ability.value]
+            ability_id = ability.value
         elif isinstance(ability, UnitCommand):
-            ability = self.abilities[ability.ability.value]
+            ability_id = ability.ability.value
+        else:
+            assert isinstance(ability, AbilityData), f"Ability is not of type 'AbilityData', but was {type(ability)}"
+            ability_id = ability._proto.ability_id
+            if self.abilities.get(ability_id) is not ability:
+                # Ability data of other game data objects doesn't create anything of this game data
+                return Cost(0, 0)
+        if ability_id < len(self._ability_costs):
+            cost = self._ability_costs[ability_id]
+            if cost is not None:
+                return cost
+        return self._calculate_ability_cost(self.abilities[ability_id])
+
+    def _calculate_ability_cost(self, ability: AbilityData) -> Cost:
+        unit = self._ability_units.get(ability._proto.ability_id)
+        if unit is not None:
+            if unit.id == UnitTypeId.ZERGLING:
+                # HARD CODED: zerglings are generated in pairs
+                return Cost(unit.cost.minerals * 2, unit.cost.vespene * 2, unit.cost.time)
+            if unit.id == UnitTypeId.BANELING:
+                # HARD CODED: banelings don't cost 50/25 as described in the API, but 25/25
+                return Cost(25, 25, unit.cost.time)
+            # Correction for morphing units, e.g. orbital would return 550/0 instead of actual 150/0
+            morph_cost = unit.morph_cost
+            if morph_cost:  # can be None
+                return morph_cost
+            # Correction for zerg structures without morph: Extractor would return 75 instead of actual 25
+            return unit.cost_zerg_corrected
+
+        upgrade = self._ability_upgrades.get(ability._proto.ability_id)
+        if upgrade is not None:
+            return upgrade.cost
 
-        assert isinstance(ability, AbilityData), f"Ability is not of type 'AbilityData', but was {type(ability)}"
+        return Cost(0, 0)
 
-        for unit in self.units.values():
-            if unit.creation_ability is None:
-                continue
-
-            if not AbilityData.id_exists(unit.creation_ability.id.value):
-                continue
-
-            if unit.creation_ability.is_free_morph:
-                continue
-
-            if unit.creation_ability == ability:
-                if unit.id == UnitTypeId.ZERGLING:
-                    # HARD CODED: zerglings are generated in pairs
-                    return Cost(unit.cost.minerals * 2, unit.cost.vespene * 2, unit.cost.time)
-                if unit.id == UnitTypeId.BANELING:
-                    # HARD CODED: banelings don't cost 50/25 as described in the API, but 25/25
-                    return Cost(25, 25, unit.cost.time)
-                # Correction for morphing units, e.g. orbital would return 550/0 instead of actual 150/0
-                morph_cost = unit.morph_cost
-                if morph_cost:  # can be None
-                    return morph_cost
-                # Correction for zerg structures without morph: Extractor would return 75 instead of actual 25
-                return unit.cost_zerg_corrected
+    def unit_cost(self, unit_type: UnitTypeId) -> Cost:
+        """Returns the build, train or morph cost of a unit type, see BotAI.calculate_cost.
 
-        for upgrade in self.upgrades.values():
-            if upgrade.research_ability == ability:
-                return upgrade.cost
+        :param unit_type:
+        """
+        if unit_type.value < len(self._unit_costs):
+            cost = self._unit_costs[unit_type.value]
+            if cost is not None:
+                return cost
+        return self._calculate_unit_cost(unit_type)
+
+    def _calculate_unit_cost(self, unit_type: UnitTypeId) -> Cost:
+        # Fix cost for reactor and techlab where the API returns 0 for both
+        if unit_type == UnitTypeId.REACTOR:
+            return Cost(50, 50)
+        if unit_type == UnitTypeId.TECHLAB:
+            return Cost(50, 25)
+        if unit_type == UnitTypeId.BANELING:
+            return Cost(25, 25)
+        unit_data = self.units[unit_type.value]
+        if unit_type == UnitTypeId.ARCHON:
+            return Cost(unit_data._proto.mineral_cost, unit_data._proto.vespene_cost)
+        # Cost of morphs is automatically correctly calculated by 'calculate_ability_cost'
+        return self.calculate_ability_cost(unit_data.creation_ability.exact_id)
+
+    def unit_supply_cost(self, unit_type: UnitTypeId) -> float:
+        """Returns the supply required to train or morph a unit type, see BotAI.calculate_supply_cost.
+
+        :param unit_type:
+        """
+        if unit_type.value < len(self._unit_supply_costs):
+            supply_cost = self._unit_supply_costs[unit_type.value]
+            if supply_cost is not None:
+                return supply_cost
+        return self._calculate_unit_supply_cost(unit_type)
+
+    def _calculate_unit_supply_cost(self, unit_type: UnitTypeId) -> float:
+        if unit_type in {UnitTypeId.ZERGLING}:
+            return 1
+        if unit_type in {UnitTypeId.BANELING}:
+            return 0
+        unit_supply_cost = self.units[unit_type.value]._proto.food_required
+        if unit_supply_cost > 0 and unit_type in UNIT_TRAINED_FROM and len(UNIT_TRAINED_FROM[unit_type]) == 1:
+            producer: UnitTypeId
+            for producer in UNIT_TRAINED_FROM[unit_type]:
+                producer_unit_data = self.units[producer.value]
+                if producer_unit_data._proto.food_required <= unit_supply_cost:
+                    producer_supply_cost = producer_unit_data._proto.food_required
+                    unit_supply_cost -= producer_supply_cost
+        return unit_supply_cost
+
+    def upgrade_cost(self, upgrade: UpgradeId) -> Cost:
+        """
+        :param upgrade:
+        """
+        if upgrade.value < len(self._upgrade_costs):
+            cost = self._upgrade_costs[upgrade.value]
+            if cost is not None:
+                return cost
+        return self.upgrades[upgrade.value].cost
 
-        return Cost(0, 0)
+
+class UnitTypeTable:
+    """Static attributes and weapon stats of all unit types as numpy arrays indexed by unit type id, used by the
+    properties of Unit and to evaluate many units at once, e.g. with Units.unit_type_values.
+
+    Example::
+
+        table = self.game_data.unit_type_table
+        marine_dps = table.ground_dps[UnitTypeId.MARINE.value]
+
+    Rows of unit types that are not in the game data are False / 0, see 'known'.
+    """
+
+    # Tables are pickled into the game data cache files, changes of the columns or their dtypes have to increase
+    # GAME_DATA_CACHE_VERSION in game_data_cache.py
+    BOOL_COLUMNS = (
+        "known",
+        "is_structure",
+        "is_light",
+        "is_armored",
+        "is_biological",
+        "is_mechanical",
+        "is_massive",
+        "is_psionic",
+        "can_attack",
+        "can_attack_ground",
+        "can_attack_air",
+    )
+    FLOAT_COLUMNS = (
+        "ground_dps",
+        "ground_range",
+        "air_dps",
+        "air_range",
+        "armor",
+        "sight_range",
+        "movement_speed",
+        # NaN for unit types without creation ability, see UnitTypeData.footprint_radius
+        "footprint_radius",
+    )
+    INT_COLUMNS = ("cargo_size", )
+
+    def __init__(self, units: Dict[int, UnitTypeData]):
+        """
+        :param units: GameData.units
+        """
+        self.size: int = max(max(units, default=0), max(unit_type.value for unit_type in UnitTypeId)) + 1
+        size = self.size
+        # BOOL_COLUMNS
+        self.known: np.ndarray = np.zeros(size, dtype=bool)
+        self.is_structure: np.ndarray = np.zeros(size, dtype=bool)
+        self.is_light: np.ndarray = np.zeros(size, dtype=bool)
+        self.is_armored: np.ndarray = np.zeros(size, dtype=bool)
+        self.is_biological: np.ndarray = np.zeros(size, dtype=bool)
+        self.is_mechanical: np.ndarray = np.zeros(size, dtype=bool)
+        self.is_massive: np.ndarray = np.zeros(size, dtype=bool)
+        self.is_psionic: np.ndarray = np.zeros(size, dtype=bool)
+        self.can_attack: np.ndarray = np.zeros(size, dtype=bool)
+        self.can_attack_ground: np.ndarray = np.zeros(size, dtype=bool)
+        self.can_attack_air: np.ndarray = np.zeros(size, dtype=bool)
+        # FLOAT_COLUMNS
+        self.ground_dps: np.ndarray = np.zeros(size, dtype=float)
+        self.ground_range: np.ndarray = np.zeros(size, dtype=float)
+        self.air_dps: np.ndarray = np.zeros(size, dtype=float)
+        self.air_range: np.ndarray = np.zeros(size, dtype=float)
+        self.armor: np.ndarray = np.zeros(size, dtype=float)
+        self.sight_range: np.ndarray = np.zeros(size, dtype=float)
+        self.movement_speed: np.ndarray = np.zeros(size, dtype=float)
+        # NaN for unit types without creation ability, see UnitTypeData.footprint_radius
+        self.footprint_radius: np.ndarray = np.full(size, np.nan)
+        # INT_COLUMNS
+        self.cargo_size: np.ndarray = np.zeros(size, dtype=np.int32)
+        for unit_id, unit_data in units.items():
+            self._fill_row(unit_id, unit_data)
+
+    def _fill_row(self, unit_id: int, unit_data: UnitTypeData):
+        proto = unit_data._proto
+        attributes = set(proto.attributes)
+        self.known[unit_id] = True
+        self.is_structure[unit_id] = IS_STRUCTURE in attributes
+        self.is_light[unit_id] = IS_LIGHT in attributes
+        self.is_armored[unit_id] = IS_ARMORED in attributes
+        self.is_biological[unit_id] = IS_BIOLOGICAL in attributes
+        self.is_mechanical[unit_id] = IS_MECHANICAL in attributes
+        self.is_massive[unit_id] = IS_MASSIVE in attributes
+        self.is_psionic[unit_id] = IS_PSIONIC in attributes
+        self.armor[unit_id] = proto.armor
+        self.sight_range[unit_id] = proto.sight_range
+        self.movement_speed[unit_id] = proto.movement_speed
+        self.cargo_size[unit_id] = proto.cargo_size
+        footprint_radius = unit_data.footprint_radius
+        if footprint_radius is not None:
+            self.footprint_radius[unit_id] = footprint_radius
+
+        weapons = proto.weapons
+        # The battlecruiser and the oracle attack with abilities instead of weapons
+        is_battlecruiser = unit_id == UnitTypeId.BATTLECRUISER.value
+        is_oracle = unit_id == UnitTypeId.ORACLE.value
+        self.can_attack[unit_id] = bool(weapons) or is_battlecruiser or is_oracle
+        ground_weapon = next((weapon for weapon in weapons if weapon.type in TARGET_GROUND), None)
+        air_weapon = next((weapon for weapon in weapons if weapon.type in TARGET_AIR), None)
+        self.can_attack_ground[unit_id] = ground_weapon is not None or is_battlecruiser or is_oracle
+        self.can_attack_air[unit_id] = air_weapon is not None or is_battlecruiser
+        if ground_weapon is not None:
+            self.ground_dps[unit_id] = (ground_weapon.damage * ground_weapon.attacks) / ground_weapon.speed
+            self.ground_range[unit_id] = ground_weapon.range
+        if air_weapon is not None:
+            self.air_dps[unit_id] = (air_weapon.damage * air_weapon.attacks) / air_weapon.speed
+            self.air_range[unit_id] = air_weapon.range
+        if is_oracle:
+            self.ground_range[unit_id] = 4
+        if is_battlecruiser:
+            self.ground_range[unit_id] = 6
+            self.air_range[unit_id] = 6
+
+    def gather(self, column: str, unit_types: np.ndarray) -> np.ndarray:
+        """Returns the values of a column for an array of unit type ids, False / 0 for ids outside of the table.
+
+        :param column: one of BOOL_COLUMNS, FLOAT_COLUMNS or INT_COLUMNS
+        :param unit_types:
+        """
+        values: np.ndarray = getattr(self, column)
+        inside = unit_types < self.size
+        if inside.all():
+            return values[unit_types]
+        result = np.zeros(unit_types.shape, dtype=values.dtype)
+        result[inside] = values[unit_types[inside]]
+        return result
 
 
 class AbilityData:
@@ -101,13 +381,13 @@ class AbilityData:
     def id(self) -> AbilityId:
         """ Returns the generic remap ID. See sc2/dicts/generic_redirect_abilities.py """
         if self._proto.remaps_to_ability_id:
-            return AbilityId(self._proto.remaps_to_ability_id)
-        return AbilityId(self._proto.ability_id)
+            return ability_id_from_value(self._proto.remaps_to_ability_id)
+        return ability_id_from_value(self._proto.ability_id)
 
     @property
     def exact_id(self) -> AbilityId:
         """ Returns the exact ID of the ability """
-        return AbilityId(self._proto.ability_id)
+        return ability_id_from_value(self._proto.ability_id)
 
     @property
     def link_name(self) -> str:
@@ -154,7 +434,7 @@ class UnitTypeData:
 
     @property
     def id(self) -> UnitTypeId:
-        return UnitTypeId(self._proto.unit_id)
+        return unit_type_id_from_value(self._proto.unit_id)
 
     @property
     def name(self) -> str:
@@ -203,7 +483,7 @@ class UnitTypeData:
             return None
         if self._proto.tech_requirement not in self._game_data.units:
             return None
-        return UnitTypeId(self._proto.tech_requirement)
+        return unit_type_id_from_value(self._proto.tech_requirement)
 
     @property
     def tech_alias(self) -> Optional[List[UnitTypeId]]:
@@ -212,7 +492,9 @@ class UnitTypeData:
         For Hive, this returns [UnitTypeId.Hatchery, UnitTypeId.Lair]
         For SCV, this returns None"""
         return_list = [
-            UnitTypeId(tech_alias) for tech_alias in self._proto.tech_alias if tech_alias in self._game_data.units
+            unit_type_id_from_value(tech_alias)
+            for tech_alias in self._proto.tech_alias
+            if tech_alias in self._game_data.units
         ]
         return return_list if return_list else None
 
@@ -224,7 +506,7 @@ class UnitTypeData:
         if self._proto.unit_alias not in self._game_data.units:
             return None
         """ For flying OrbitalCommand, this returns UnitTypeId.OrbitalCommand """
-        return UnitTypeId(self._proto.unit_alias)
+        return unit_type_id_from_value(self._proto.unit_alias)
 
     @property
     def race(self) -> Race:
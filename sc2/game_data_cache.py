@@ -0,0 +1,81 @@
+"""
+Stores the game data (abilities, unit types, upgrades, buffs and effects) of each game version in files, so that games on
+a version that was played before don't have to request it.
+The lookup tables GameData builds from the data (costs and unit type attributes) are stored with it.
+
+Example::
+
+    bot = MyBot()
+    bot.game_data_cache_dir = "data/game_data_cache"
+"""
+from __future__ import annotations
+
+import pickle
+from pathlib import Path
+from typing import Optional, Union
+
+from loguru import logger
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from sc2.file_utils import write_atomically
+from sc2.game_data import GameData
+
+# Increase when the file format or the lookup tables of GameData change (e.g. the columns of UnitTypeTable),
+# files of other versions are ignored
+GAME_DATA_CACHE_VERSION: int = 2
+
+
+class GameDataCache:
+    """Files with the ResponseData and the GameData lookup tables of a game version,
+    identified by the base build and data version of a ping."""
+
+    def __init__(self, directory: Union[str, Path]):
+        """
+        :param directory: directory of the cache files, created if it does not exist
+        """
+        self.directory: Path = Path(directory)
+
+    def path(self, base_build: int, data_version: str) -> Path:
+        return self.directory / f"game_data_{base_build}_{data_version or 'unknown'}.pickle"
+
+    def load(self, ping: sc_pb.ResponsePing) -> Optional[GameData]:
+        """Returns the stored game data of the version of the client or None if there is none.
+
+        :param ping: response of a ping to the client
+        """
+        path = self.path(ping.base_build, ping.data_version)
+        try:
+            with path.open("rb") as f:
+                version, base_build, data_version, data, lookup_tables = pickle.load(f)
+            if version != GAME_DATA_CACHE_VERSION or (base_build, data_version) != (ping.base_build, ping.data_version):
+                return None
+            return GameData(sc_pb.ResponseData.FromString(data), lookup_tables)
+        except FileNotFoundError:
+            return None
+        except Exception as e:  # pylint: disable=W0703
+            logger.warning(f"Ignoring game data cache file {path}: {e}")
+            return None
+
+    def save(self, ping: sc_pb.ResponsePing, data: sc_pb.ResponseData, game_data: GameData):
+        """
+        :param ping: response of a ping to the client the data was requested from
+        :param data:
+        :param game_data: game data created from 'data', its lookup tables are stored
+        """
+        path = self.path(ping.base_build, ping.data_version)
+        try:
+            write_atomically(
+                path,
+                pickle.dumps(
+                    (
+                        GAME_DATA_CACHE_VERSION,
+                        ping.base_build,
+                        ping.data_version,
+                        data.SerializeToString(),
+                        game_data.lookup_tables(),
+                    ),
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                ),
+            )
+        except OSError as e:
+            logger.warning(f"Could not write game data cache file {path}: {e}")
@@ -1,14 +1,15 @@
 from __future__ import annotations
 
 import heapq
-from collections import deque
+import math
 from dataclasses import dataclass
 from functools import cached_property
-from typing import Deque, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
 
 import numpy as np
+from scipy import ndimage
 
-from sc2.pixel_map import PixelMap
+from sc2.pixel_map import PixelMap, label_mask
 from sc2.player import Player, Race
 from sc2.position import Point2, Rect, Size
 
@@ -248,68 +249,45 @@ class GameInfo:
         """Calculate points that are pathable but not placeable.
         Then divide them into ramp points if not all points around the points are equal height
         and into vision blockers if they are."""
-
-        def equal_height_around(tile):
-            # mask to slice array 1 around tile
-            sliced = self.terrain_height.data_numpy[tile[1] - 1:tile[1] + 2, tile[0] - 1:tile[0] + 2]
-            return len(np.unique(sliced)) == 1
-
         map_area = self.playable_area
+        in_map_area = np.zeros(self.pathing_grid.data_numpy.shape, dtype=bool)
+        x0, y0 = math.ceil(map_area.x), math.ceil(map_area.y)
+        x1, y1 = math.ceil(map_area.x + map_area.width), math.ceil(map_area.y + map_area.height)
+        in_map_area[max(0, y0):max(0, y1), max(0, x0):max(0, x1)] = True
         # all points in the playable area that are pathable but not placable
-        points = [
-            Point2((a, b)) for (b, a), value in np.ndenumerate(self.pathing_grid.data_numpy)
-            if value == 1 and map_area.x <= a < map_area.x + map_area.width and map_area.y <= b < map_area.y +
-            map_area.height and self.placement_grid[(a, b)] == 0
-        ]
+        points = (self.pathing_grid.data_numpy == 1) & (self.placement_grid.data_numpy == 0) & in_map_area
+        # The 3x3 area around a point has equal height if its minimum and maximum height are the same
+        terrain_height = self.terrain_height.data_numpy
+        equal_height_around = ndimage.maximum_filter(terrain_height, size=3, mode="nearest") == ndimage.minimum_filter(
+            terrain_height, size=3, mode="nearest"
+        )
         # divide points into ramp points and vision blockers
-        ramp_points = [point for point in points if not equal_height_around(point)]
-        vision_blockers = frozenset(point for point in points if equal_height_around(point))
-        ramps = [Ramp(group, self) for group in self._find_groups(ramp_points)]
+        ys, xs = np.nonzero(points & equal_height_around)
+        vision_blockers = frozenset(Point2(point) for point in zip(xs.tolist(), ys.tolist()))
+        ramps = [Ramp(group, self) for group in self._label_groups(points & ~equal_height_around)]
         return ramps, vision_blockers
 
     def _find_groups(self, points: FrozenSet[Point2], minimum_points_per_group: int = 8) -> Iterable[FrozenSet[Point2]]:
         """
         From a set of points, this function will try to group points together by
-        painting clusters of points in a rectangular map using flood fill algorithm.
+        labelling the connected points (including diagonal neighbors) in a grid of the map size.
         Returns groups of points as list, like [{p1, p2, p3}, {p4, p5, p6, p7, p8}]
         """
-        # TODO do we actually need colors here? the ramps will never touch anyways.
-        NOT_COLORED_YET = -1
-        map_width = self.pathing_grid.width
-        map_height = self.pathing_grid.height
-        current_color: int = NOT_COLORED_YET
-        picture: List[List[int]] = [[-2 for _ in range(map_width)] for _ in range(map_height)]
-
-        def paint(pt: Point2) -> None:
-            picture[pt.y][pt.x] = current_color
-
-        nearby: List[Tuple[int, int]] = [(a, b) for a in [-1, 0, 1] for b in [-1, 0, 1] if a != 0 or b != 0]
-
-        remaining: Set[Point2] = set(points)
-        for point in remaining:
-            paint(point)
-        current_color = 1
-        queue: Deque[Point2] = deque()
-        while remaining:
-            current_group: Set[Point2] = set()
-            if not queue:
-                start = remaining.pop()
-                paint(start)
-                queue.append(start)
-                current_group.add(start)
-            while queue:
-                base: Point2 = queue.popleft()
-                for offset in nearby:
-                    px, py = base.x + offset[0], base.y + offset[1]
-                    # Do we ever reach out of map bounds?
-                    if not (0 <= px < map_width and 0 <= py < map_height):
-                        continue
-                    if picture[py][px] != NOT_COLORED_YET:
-                        continue
-                    point: Point2 = Point2((px, py))
-                    remaining.discard(point)
-                    paint(point)
-                    queue.append(point)
-                    current_group.add(point)
-            if len(current_group) >= minimum_points_per_group:
-                yield frozenset(current_group)
+        mask = np.zeros(self.pathing_grid.data_numpy.shape, dtype=bool)
+        if points:
+            xs, ys = zip(*points)
+            mask[list(ys), list(xs)] = True
+        return self._label_groups(mask, minimum_points_per_group)
+
+    @staticmethod
+    def _label_groups(mask: np.ndarray, minimum_points_per_group: int = 8) -> List[FrozenSet[Point2]]:
+        """Returns the connected groups of points of the mask that have at least 'minimum_points_per_group' points.
+
+        :param mask: indexed [y, x]
+        :param minimum_points_per_group:
+        """
+        components = label_mask(mask)
+        return [
+            frozenset(Point2(point) for point in zip(xs.tolist(), ys.tolist()))
+            for xs, ys in components.pixels() if xs.size >= minimum_points_per_group
+        ]
@@ -9,9 +9,9 @@ from loguru import logger
 
 from sc2.constants import IS_ENEMY, IS_MINE, FakeEffectID, FakeEffectRadii
 from sc2.data import Alliance, DisplayType
-from sc2.ids.ability_id import AbilityId
-from sc2.ids.effect_id import EffectId
-from sc2.ids.upgrade_id import UpgradeId
+from sc2.ids.ability_id import AbilityId, ability_id_from_value
+from sc2.ids.effect_id import EffectId, effect_id_from_value
+from sc2.ids.upgrade_id import UpgradeId, upgrade_id_from_value
 from sc2.pixel_map import PixelMap
 from sc2.position import Point2, Point3
 from sc2.power_source import PsionicMatrix
@@ -106,7 +106,7 @@ class EffectData:
         if self.fake:
             # Returns the string from constants.py, e.g. "KD8CHARGE"
             return FakeEffectID[self._proto.unit_type]
-        return EffectId(self._proto.effect_id)
+        return effect_id_from_value(self._proto.effect_id)
 
     @property
     def positions(self) -> Set[Point2]:
@@ -153,7 +153,7 @@ class AbilityLookupTemplateClass:
 
     @property
     def exact_id(self) -> AbilityId:
-        return AbilityId(self.ability_id)
+        return ability_id_from_value(self.ability_id)
 
     @property
     def generic_id(self) -> AbilityId:
@@ -218,7 +218,9 @@ class GameState:
         # https://github.com/Blizzard/s2client-proto/blob/33f0ecf615aa06ca845ffe4739ef3133f37265a9/s2clientprotocol/score.proto#L31
         self.score: ScoreDetails = ScoreDetails(self.observation.score)
         self.abilities = self.observation.abilities  # abilities of selected units
-        self.upgrades: Set[UpgradeId] = {UpgradeId(upgrade) for upgrade in self.observation_raw.player.upgrade_ids}
+        self.upgrades: Set[UpgradeId] = {
+            upgrade_id_from_value(upgrade) for upgrade in self.observation_raw.player.upgrade_ids
+        }
 
         # self.visibility[point]: 0=Hidden, 1=Fogged, 2=Visible
         self.visibility: PixelMap = PixelMap(self.observation_raw.map_state.visibility)
@@ -2,6 +2,7 @@
 import importlib
 import json
 import platform
+import re
 import sys
 from pathlib import Path
 
@@ -42,6 +43,12 @@ class IdGenerator:
             "Effects": "EffectId",
         }
 
+        # Member that is returned for unknown values instead of raising a ValueError
+        self.MISSING_MEMBER = {
+            "AbilityId": "NULL_NULL",
+            "BuffId": "NULL",
+        }
+
         self.FILE_TRANSLATE = {
             "Units": "unit_typeid",
             "Abilities": "ability_id",
@@ -144,7 +151,15 @@ class IdGenerator:
         for name, body in enums.items():
             class_name = self.ENUM_TRANSLATE[name]
 
-            code = [self.HEADER, "import enum", "\n", f"class {class_name}(enum.Enum):"]
+            # e.g. UnitTypeId -> unit_type_id
+            snake_name = re.sub(r"(?<!^)(?=[A-Z])", "_", class_name).lower()
+            lookup_name = f"{snake_name.upper()}_BY_VALUE"
+            function_name = f"{snake_name}_from_value"
+            missing_member = self.MISSING_MEMBER.get(class_name)
+
+            code = [
+                self.HEADER, "import enum", "from typing import List, Optional", "\n", f"class {class_name}(enum.Enum):"
+            ]
 
             for key, value in sorted(body.items(), key=lambda p: p[1]):
                 code.append(f"    {key} = {value}")
@@ -155,24 +170,38 @@ class IdGenerator:
         return f"{class_name}.{{self.name}}"
 """.split("\n")
 
-            # Add missing ids function to not make the game crash when unknown BuffId was detected
-            if class_name == "BuffId":
+            # Add missing ids function to not make the game crash when unknown ids were detected
+            if missing_member is not None:
                 code += f"""
     @classmethod
     def _missing_(cls, value: int) -> {class_name}:
-        return cls.NULL
+        return cls.{missing_member}
 """.split("\n")
 
-            if class_name == "AbilityId":
-                code += f"""
-    @classmethod
-    def _missing_(cls, value: int) -> {class_name}:
-        return cls.NULL_NULL
+            code += f"""
+for item in {class_name}:
+    globals()[item.name] = item
 """.split("\n")
 
+            # Add a list lookup from value to member, calling the enum goes through the slow EnumMeta.__call__
+            default = "None" if missing_member is None else f"{class_name}.{missing_member}"
             code += f"""
+# {class_name} members by value, {default} for values without member, see {function_name}
+{lookup_name}: List[Optional[{class_name}]] = [{default}] * (max(item.value for item in {class_name}) + 1)
 for item in {class_name}:
-    globals()[item.name] = item
+    {lookup_name}[item.value] = item
+
+
+def {function_name}(value: int) -> {class_name}:
+    \"\"\"Returns {class_name}(value), but looks the member up in {lookup_name} instead of calling the enum.
+
+    :param value:
+    \"\"\"
+    if 0 <= value < len({lookup_name}):
+        member = {lookup_name}[value]
+        if member is not None:
+            return member
+    return {class_name}(value)
 """.split("\n")
 
             ids_file_path = (idsdir / self.FILE_TRANSLATE[name]).with_suffix(".py")
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import enum
+from typing import List, Optional
 
 # DO NOT EDIT!
 # This file was automatically generated by "generate_ids.py"
@@ -1603,3 +1604,20 @@ class AbilityId(enum.Enum):
 
 for item in AbilityId:
     globals()[item.name] = item
+
+# AbilityId members by value, AbilityId.NULL_NULL for values without member, see ability_id_from_value
+ABILITY_ID_BY_VALUE: List[Optional[AbilityId]] = [AbilityId.NULL_NULL] * (max(item.value for item in AbilityId) + 1)
+for item in AbilityId:
+    ABILITY_ID_BY_VALUE[item.value] = item
+
+
+def ability_id_from_value(value: int) -> AbilityId:
+    """Returns AbilityId(value), but looks the member up in ABILITY_ID_BY_VALUE instead of calling the enum.
+
+    :param value:
+    """
+    if 0 <= value < len(ABILITY_ID_BY_VALUE):
+        member = ABILITY_ID_BY_VALUE[value]
+        if member is not None:
+            return member
+    return AbilityId(value)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import enum
+from typing import List, Optional
 
 # DO NOT EDIT!
 # This file was automatically generated by "generate_ids.py"
@@ -326,3 +327,20 @@ class BuffId(enum.Enum):
 
 for item in BuffId:
     globals()[item.name] = item
+
+# BuffId members by value, BuffId.NULL for values without member, see buff_id_from_value
+BUFF_ID_BY_VALUE: List[Optional[BuffId]] = [BuffId.NULL] * (max(item.value for item in BuffId) + 1)
+for item in BuffId:
+    BUFF_ID_BY_VALUE[item.value] = item
+
+
+def buff_id_from_value(value: int) -> BuffId:
+    """Returns BuffId(value), but looks the member up in BUFF_ID_BY_VALUE instead of calling the enum.
+
+    :param value:
+    """
+    if 0 <= value < len(BUFF_ID_BY_VALUE):
+        member = BUFF_ID_BY_VALUE[value]
+        if member is not None:
+            return member
+    return BuffId(value)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import enum
+from typing import List, Optional
 
 # DO NOT EDIT!
 # This file was automatically generated by "generate_ids.py"
@@ -27,3 +28,20 @@ class EffectId(enum.Enum):
 
 for item in EffectId:
     globals()[item.name] = item
+
+# EffectId members by value, None for values without member, see effect_id_from_value
+EFFECT_ID_BY_VALUE: List[Optional[EffectId]] = [None] * (max(item.value for item in EffectId) + 1)
+for item in EffectId:
+    EFFECT_ID_BY_VALUE[item.value] = item
+
+
+def effect_id_from_value(value: int) -> EffectId:
+    """Returns EffectId(value), but looks the member up in EFFECT_ID_BY_VALUE instead of calling the enum.
+
+    :param value:
+    """
+    if 0 <= value < len(EFFECT_ID_BY_VALUE):
+        member = EFFECT_ID_BY_VALUE[value]
+        if member is not None:
+            return member
+    return EffectId(value)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import enum
+from typing import List, Optional
 
 # DO NOT EDIT!
 # This file was automatically generated by "generate_ids.py"
@@ -2071,3 +2072,20 @@ class UnitTypeId(enum.Enum):
 
 for item in UnitTypeId:
     globals()[item.name] = item
+
+# UnitTypeId members by value, None for values without member, see unit_type_id_from_value
+UNIT_TYPE_ID_BY_VALUE: List[Optional[UnitTypeId]] = [None] * (max(item.value for item in UnitTypeId) + 1)
+for item in UnitTypeId:
+    UNIT_TYPE_ID_BY_VALUE[item.value] = item
+
+
+def unit_type_id_from_value(value: int) -> UnitTypeId:
+    """Returns UnitTypeId(value), but looks the member up in UNIT_TYPE_ID_BY_VALUE instead of calling the enum.
+
+    :param value:
+    """
+    if 0 <= value < len(UNIT_TYPE_ID_BY_VALUE):
+        member = UNIT_TYPE_ID_BY_VALUE[value]
+        if member is not None:
+            return member
+    return UnitTypeId(value)
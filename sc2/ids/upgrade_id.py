@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import enum
+from typing import List, Optional
 
 # DO NOT EDIT!
 # This file was automatically generated by "generate_ids.py"
@@ -319,3 +320,20 @@ class UpgradeId(enum.Enum):
 
 for item in UpgradeId:
     globals()[item.name] = item
+
+# UpgradeId members by value, None for values without member, see upgrade_id_from_value
+UPGRADE_ID_BY_VALUE: List[Optional[UpgradeId]] = [None] * (max(item.value for item in UpgradeId) + 1)
+for item in UpgradeId:
+    UPGRADE_ID_BY_VALUE[item.value] = item
+
+
+def upgrade_id_from_value(value: int) -> UpgradeId:
+    """Returns UpgradeId(value), but looks the member up in UPGRADE_ID_BY_VALUE instead of calling the enum.
+
+    :param value:
+    """
+    if 0 <= value < len(UPGRADE_ID_BY_VALUE):
+        member = UPGRADE_ID_BY_VALUE[value]
+        if member is not None:
+            return member
+    return UpgradeId(value)
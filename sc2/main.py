@@ -2,11 +2,13 @@
 from __future__ import annotations
 
 import asyncio
+import itertools
 import json
 import os
 import platform
 import signal
 import sys
+import time
 from contextlib import suppress
 from dataclasses import dataclass
 from io import BytesIO
@@ -20,6 +22,7 @@ from loguru import logger
 from s2clientprotocol import sc2api_pb2 as sc_pb
 
 from sc2.bot_ai import BotAI
+from sc2.capture import ReplayWebSocket
 from sc2.client import Client
 from sc2.controller import Controller
 from sc2.data import CreateGameError, Result, Status
@@ -27,9 +30,12 @@ from sc2.game_state import GameState
 from sc2.maps import Map
 from sc2.player import AbstractPlayer, Bot, BotProcess, Human
 from sc2.portconfig import Portconfig
+from sc2.process_pool import SC2ProcessPool
 from sc2.protocol import ConnectionAlreadyClosed, ProtocolError
 from sc2.proxy import Proxy
+from sc2.request_trace import RequestTrace
 from sc2.sc2process import SC2Process, kill_switch
+from sc2.step_profiler import StepPhase
 
 # Set the global logging level
 logger.remove()
@@ -114,9 +120,9 @@ async def _play_game_ai(
         nonlocal gs
         ai._initialize_variables()
 
-        game_data = await client.get_game_data()
-        game_info = await client.get_game_info()
         ping_response = await client.ping()
+        game_data = await client.get_game_data(ai.game_data_cache_dir, ping_response.ping)
+        game_info = await client.get_game_info()
 
         # This game_data will become self.game_data in botAI
         ai._prepare_start(
@@ -148,9 +154,12 @@ async def _play_game_ai(
 
     async def run_bot_iteration(iteration: int):
         nonlocal gs
-        logger.debug(f"Running AI step, it={iteration} {gs.game_loop / 22.4:.2f}s")
+        logger.debug("Running AI step, it={} {:.2f}s", iteration, gs.game_loop / 22.4)
         # Issue event like unit created or unit destroyed
+        time_before_events = time.perf_counter()
         await ai.issue_events()
+        time_before_step = time.perf_counter()
+        profiler.add(StepPhase.ISSUE_EVENTS, time_before_step - time_before_events)
         # In on_step various errors can occur - log properly
         try:
             await ai.on_step(iteration)
@@ -160,12 +169,17 @@ async def _play_game_ai(
         except Exception as e:
             logger.exception(f"Caught unknown exception: {e}")
             raise
+        finally:
+            profiler.add(StepPhase.ON_STEP, time.perf_counter() - time_before_step)
         await ai._after_step()
         logger.debug("Running AI step: done")
 
     # Only used in realtime=True
     previous_state_observation = None
+    profiler = ai.step_profiler
     for iteration in range(10**10):
+        profiler.begin_step()
+        time_before_observation = time.perf_counter()
         if realtime and gs:
             # On realtime=True, might get an error here: sc2.protocol.ProtocolError: ['Not in a game']
             with suppress(ProtocolError):
@@ -183,17 +197,27 @@ async def _play_game_ai(
         if client._game_result:
             await ai.on_end(client._game_result[player_id])
             return client._game_result[player_id]
+        time_before_game_state = time.perf_counter()
+        profiler.add(StepPhase.OBSERVATION, time_before_game_state - time_before_observation)
         gs = GameState(state.observation, previous_state_observation)
         previous_state_observation = None
-        logger.debug(f"Score: {gs.score.score}")
+        logger.debug("Score: {}", gs.score.score)
 
         if game_time_limit and gs.game_loop / 22.4 > game_time_limit:
             await ai.on_end(Result.Tie)
             return Result.Tie
-        proto_game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
+        time_before_game_info = time.perf_counter()
+        profiler.add(StepPhase.GAME_STATE, time_before_game_info - time_before_game_state)
+        proto_game_info = None
+        if ai._pathing_grid_resync_due(gs.game_loop):
+            proto_game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
+        time_before_prepare = time.perf_counter()
+        profiler.add(StepPhase.OBSERVATION, time_before_prepare - time_before_game_info)
         ai._prepare_step(gs, proto_game_info)
+        profiler.add(StepPhase.PREPARE_STEP, time.perf_counter() - time_before_prepare)
 
         await run_bot_iteration(iteration)  # Main bot loop
+        profiler.end_step()
 
         if not realtime:
             if not client.in_game:  # Client left (resigned) the game
@@ -201,10 +225,18 @@ async def _play_game_ai(
                 return client._game_result[player_id]
 
             # TODO: In bot vs bot, if the other bot ends the game, this bot gets stuck in requesting an observation when using main.py:run_multiple_games
-            await client.step()
+            if ai.pipeline_requests:
+                # Sent together with the next observation request
+                client._queue_step()
+            else:
+                await client.step()
     return Result.Undecided
 
 
+# Numbers the games of this process, see file_utils.game_file_path
+_game_numbers = itertools.count(1)
+
+
 async def _play_game(
     player: AbstractPlayer,
     client: Client,
@@ -215,15 +247,37 @@ async def _play_game(
 ) -> Result:
     assert isinstance(realtime, bool), repr(realtime)
 
-    player_id = await client.join_game(
-        player.name, player.race, portconfig=portconfig, rgb_render_config=rgb_render_config
-    )
-    logger.info(f"Player {player_id} - {player.name if player.name else str(player)}")
+    # Bot can decide to record the game to a capture file, see capture.py
+    capture_path = None if isinstance(player, Human) else getattr(player.ai, "capture_path", None)
+    if capture_path is not None:
+        client.start_capture(capture_path, compress=getattr(player.ai, "capture_compress", False))
+    # Bot can decide to record type, size and latency of all requests, see request_trace.py
+    if not isinstance(player, Human):
+        trace_capacity = getattr(player.ai, "request_trace_capacity", 0)
+        player.ai.request_trace = client.start_trace(RequestTrace(trace_capacity)) if trace_capacity else None
+
+    game_number = next(_game_numbers)
+    player_id: Optional[int] = None
+    try:
+        player_id = await client.join_game(
+            player.name, player.race, portconfig=portconfig, rgb_render_config=rgb_render_config
+        )
+        logger.info(f"Player {player_id} - {player.name if player.name else str(player)}")
 
-    if isinstance(player, Human):
-        result = await _play_game_human(client, player_id, realtime, game_time_limit)
-    else:
-        result = await _play_game_ai(client, player_id, player.ai, realtime, game_time_limit)
+        if isinstance(player, Human):
+            result = await _play_game_human(client, player_id, realtime, game_time_limit)
+        else:
+            result = await _play_game_ai(client, player_id, player.ai, realtime, game_time_limit)
+    finally:
+        client.stop_capture()
+        client.stop_trace()
+        # Also written if the game ended with an exception, a failed write must not replace that exception
+        if player_id is not None and not isinstance(player, Human):
+            try:
+                player.ai._dump_step_profile(player_id, game_number)
+                player.ai._dump_request_trace(player_id, game_number)
+            except Exception as e:  # pylint: disable=W0703
+                logger.error(f"Could not write the step profile or request trace: {e}")
 
     logger.info(
         f"Result for player {player_id} - {player.name if player.name else str(player)}: "
@@ -236,9 +290,9 @@ async def _play_game(
 async def _play_replay(client, ai, realtime=False, player_id=0):
     ai._initialize_variables()
 
-    game_data = await client.get_game_data()
-    game_info = await client.get_game_info()
     ping_response = await client.ping()
+    game_data = await client.get_game_data(ai.game_data_cache_dir, ping_response.ping)
+    game_info = await client.get_game_info()
 
     client.game_step = 1
     # This game_data will become self._game_data in botAI
@@ -265,6 +319,7 @@ async def _play_replay(client, ai, realtime=False, player_id=0):
 
     iteration = 0
     while True:
+        ai.step_profiler.begin_step()
         if iteration != 0:
             if realtime:
                 # TODO: check what happens if a bot takes too long to respond, so that the requested
@@ -280,18 +335,21 @@ async def _play_replay(client, ai, realtime=False, player_id=0):
                     return client._game_result[player_id]
                 return client._game_result[player_id]
             gs = GameState(state.observation)
-            logger.debug(f"Score: {gs.score.score}")
+            logger.debug("Score: {}", gs.score.score)
 
-            proto_game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
+            proto_game_info = None
+            if ai._pathing_grid_resync_due(gs.game_loop):
+                proto_game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
             ai._prepare_step(gs, proto_game_info)
 
-        logger.debug(f"Running AI step, it={iteration} {gs.game_loop * 0.725 * (1 / 16):.2f}s")
+        logger.debug("Running AI step, it={} {:.2f}s", iteration, gs.game_loop * 0.725 * (1 / 16))
 
         try:
             # Issue event like unit created or unit destroyed
             await ai.issue_events()
             await ai.on_step(iteration)
             await ai._after_step()
+            ai.step_profiler.end_step()
 
         # pylint: disable=W0703
         # TODO Catching too general exception Exception (broad-except)
@@ -511,6 +569,31 @@ def run_replay(ai, replay_path, realtime=False, observed_id=0):
     return result
 
 
+async def _play_capture(capture_path: Union[str, Path], player: Bot, game_time_limit: Optional[int] = None):
+    ws = ReplayWebSocket(capture_path)
+    try:
+        return await _play_game(player, Client(ws), False, None, game_time_limit=game_time_limit)
+    finally:
+        await ws.close()
+
+
+def run_capture(capture_path: Union[str, Path], player: Bot, game_time_limit: Optional[int] = None) -> Result:
+    """Plays a bot against a game that was recorded with the bot attribute 'capture_path', without starting SC2.
+    The responses of the recorded game are replayed as fast as the bot can handle them, which is useful for profiling.
+    The bot needs to send the same kind of requests as the recorded bot (e.g. the same game_step and queries),
+    see capture.ReplayWebSocket.
+
+    Example::
+
+        run_capture("my_game.sc2cap", Bot(Race.Terran, MyBot()))
+
+    :param capture_path:
+    :param player:
+    :param game_time_limit:
+    """
+    return asyncio.run(_play_capture(capture_path, player, game_time_limit))
+
+
 async def play_from_websocket(
     ws_connection: Union[str, ClientWebSocketResponse],
     player: AbstractPlayer,
@@ -694,13 +777,20 @@ def run_multiple_games(matches: List[GameMatch]):
 
 # TODO Catching too general exception Exception (broad-except)
 # pylint: disable=W0703
-async def a_run_multiple_games(matches: List[GameMatch]) -> List[Dict[AbstractPlayer, Result]]:
+async def a_run_multiple_games(matches: List[GameMatch],
+                               pool: Optional[SC2ProcessPool] = None) -> List[Dict[AbstractPlayer, Result]]:
     """Run multiple matches.
     Non-python bots are supported.
     When playing bot vs bot, this is less likely to fatally crash than repeating run_game()
+
+    :param matches:
+    :param pool: take the SC2 clients from this pool instead of launching them for each match,
+        the sc2_config of the matches is not used then
     """
     if not matches:
         return []
+    if pool is not None:
+        return await _a_run_multiple_games_pooled(matches, pool)
 
     results = []
     controllers = []
@@ -723,6 +813,29 @@ async def a_run_multiple_games(matches: List[GameMatch]) -> List[Dict[AbstractPl
     return results
 
 
+async def _a_run_multiple_games_pooled(matches: List[GameMatch],
+                                       pool: SC2ProcessPool) -> List[Dict[AbstractPlayer, Result]]:
+    results = []
+    for m in matches:
+        result = None
+        controllers: List[Controller] = []
+        crashed = True
+        try:
+            controllers = await pool.acquire(m.needed_sc2_count)
+            result = await run_match(controllers, m, close_ws=False)
+            crashed = False
+        except SystemExit as e:
+            logger.info(f"Game exit'ed as {e} during match {m}")
+        except Exception as e:
+            logger.exception(f"Caught unknown exception: {e}")
+            logger.info(f"Exception {e} thrown in match {m}")
+        finally:
+            # The pool leaves the game and replaces the clients that don't respond afterwards
+            await pool.release(controllers, replace=crashed)
+            results.append(result)
+    return results
+
+
 # TODO Catching too general exception Exception (broad-except)
 # pylint: disable=W0703
 async def a_run_multiple_games_nokill(matches: List[GameMatch]) -> List[Dict[AbstractPlayer, Result]]:
@@ -0,0 +1,162 @@
+"""
+Stores the map analysis of BotAI._prepare_first_step (expansion locations, ramps, vision blockers and the wall positions
+of the ramps) in files, so that it is only computed once per map instead of once per game.
+
+Files are identified by the map name and a hash of the grids and the resources of the map, so a changed map version gets
+a new file. The wall positions depend on the start location and are stored in one file per start location.
+Files are replaced atomically, several game processes can use the same directory at the same time.
+"""
+from __future__ import annotations
+
+import hashlib
+import pickle
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, Iterable, List, Optional, Union
+
+import numpy as np
+from loguru import logger
+
+from sc2.file_utils import write_atomically
+from sc2.position import Point2
+
+if TYPE_CHECKING:
+    from sc2.game_info import GameInfo, Ramp
+    from sc2.unit import Unit
+
+# Increase when the analysis or the file format changes, files of other versions are ignored
+MAP_CACHE_VERSION: int = 2
+
+# Cached properties of Ramp that are stored, they are computed for the start location of the player
+RAMP_PROPERTIES = (
+    "upper",
+    "upper2_for_ramp_wall",
+    "top_center",
+    "lower",
+    "bottom_center",
+    "barracks_in_middle",
+    "depot_in_middle",
+    "corner_depots",
+    "barracks_can_fit_addon",
+    "barracks_correct_placement",
+    "protoss_wall_pylon",
+    "protoss_wall_buildings",
+    "protoss_wall_warpin",
+)
+
+
+@dataclass
+class MapAnalysis:
+    expansion_locations: List[Point2]
+    # Resource position -> expansion location, see BotAI._resource_location_to_expansion_position_dict
+    resource_expansions: Dict[Point2, Point2]
+    ramps: List[FrozenSet[Point2]]
+    vision_blockers: FrozenSet[Point2]
+
+
+def ramp_properties(ramp: Ramp) -> Dict[str, Any]:
+    """Returns the values of the RAMP_PROPERTIES of a ramp that can be computed.
+
+    :param ramp:
+    """
+    values = {}
+    for name in RAMP_PROPERTIES:
+        try:
+            values[name] = getattr(ramp, name)
+        # Some properties are not implemented for ramps with an unusual amount of upper points
+        except Exception:  # pylint: disable=W0703
+            continue
+    return values
+
+
+class MapAnalysisCache:
+
+    def __init__(self, directory: Union[str, Path]):
+        """
+        :param directory: directory of the cache files, created if it does not exist
+        """
+        self.directory: Path = Path(directory)
+
+    @staticmethod
+    def key(game_info: GameInfo, resources: Iterable[Unit]) -> str:
+        """Returns the hash of everything the analysis depends on.
+
+        :param game_info:
+        :param resources: mineral fields and vespene geysers at the start of the game
+        """
+        digest = hashlib.sha256()
+        digest.update(f"{MAP_CACHE_VERSION}:{game_info.map_name}".encode())
+        for pixel_map in (game_info.pathing_grid, game_info.placement_grid, game_info.terrain_height):
+            digest.update(np.ascontiguousarray(pixel_map.data_numpy).tobytes())
+        resource_layout = sorted(
+            (resource._proto.unit_type, resource._proto.pos.x, resource._proto.pos.y) for resource in resources
+        )
+        digest.update(np.array(resource_layout, dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    def path(self, map_name: str, key: str) -> Path:
+        name = re.sub(r"[^\w-]", "", map_name) or "map"
+        return self.directory / f"{name}-{key[:16]}.pickle"
+
+    def ramp_properties_path(self, map_name: str, key: str, start_location: Point2) -> Path:
+        return self.path(map_name, key).with_suffix(f".ramps-{start_location.x:g}-{start_location.y:g}.pickle")
+
+    def _read(self, path: Path, key: str) -> Optional[Any]:
+        try:
+            with path.open("rb") as f:
+                version, stored_key, value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:  # pylint: disable=W0703
+            logger.warning(f"Ignoring map analysis cache file {path}: {e}")
+            return None
+        if version != MAP_CACHE_VERSION or stored_key != key:
+            return None
+        return value
+
+    def _write(self, path: Path, key: str, value: Any):
+        try:
+            write_atomically(path, pickle.dumps((MAP_CACHE_VERSION, key, value), protocol=pickle.HIGHEST_PROTOCOL))
+        except OSError as e:
+            logger.warning(f"Could not write map analysis cache file {path}: {e}")
+
+    def load(self, map_name: str, key: str) -> Optional[MapAnalysis]:
+        """Returns the stored analysis or None if there is none.
+
+        :param map_name:
+        :param key: see MapAnalysisCache.key
+        """
+        return self._read(self.path(map_name, key), key)
+
+    def save(self, map_name: str, key: str, analysis: MapAnalysis):
+        """Writes the analysis to a temporary file and replaces the cache file with it,
+        so that other processes never read a partially written file.
+
+        :param map_name:
+        :param key: see MapAnalysisCache.key
+        :param analysis:
+        """
+        self._write(self.path(map_name, key), key, analysis)
+
+    def load_ramp_properties(self, map_name: str, key: str, start_location: Point2) -> Optional[List[Dict[str, Any]]]:
+        """Returns the stored values of the RAMP_PROPERTIES of each ramp for the start location, or None.
+
+        :param map_name:
+        :param key: see MapAnalysisCache.key
+        :param start_location:
+        """
+        return self._read(self.ramp_properties_path(map_name, key, start_location), key)
+
+    def save_ramp_properties(
+        self, map_name: str, key: str, start_location: Point2, properties: List[Dict[str, Any]]
+    ):
+        """Stores the ramp properties in a file of their own, so that games with different start locations on the same
+        map don't overwrite each other's entries.
+
+        :param map_name:
+        :param key: see MapAnalysisCache.key
+        :param start_location:
+        :param properties: values of the RAMP_PROPERTIES of each ramp, see ramp_properties
+        """
+        self._write(self.ramp_properties_path(map_name, key, start_location), key, properties)
@@ -0,0 +1,188 @@
+"""
+Runs many matches in parallel, each worker process of a process pool keeps its own SC2 clients alive between matches.
+
+Example::
+
+    from sc2.match_scheduler import MatchScheduler
+
+    matches = [GameMatch(maps.get("AcropolisLE"), [Bot(Race.Terran, MyBot()), Computer(Race.Zerg, Difficulty.Hard)])
+               for _ in range(100)]
+    for index, result in MatchScheduler(concurrency=8).run(matches):
+        print(matches[index], result)
+
+Python bots are played inside the worker processes, so the matches (including the bot objects) have to be picklable
+and, when the 'spawn' start method is used, the script has to be guarded by 'if __name__ == "__main__":'.
+"""
+from __future__ import annotations
+
+import asyncio
+import atexit
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Deque, Dict, Generator, List, Optional, Tuple
+
+from loguru import logger
+
+from sc2.controller import Controller
+from sc2.data import Result
+from sc2.main import GameMatch, maintain_SCII_count, run_match
+from sc2.player import AbstractPlayer
+from sc2.sc2process import kill_switch
+
+
+class MatchCrashed(Exception):
+    pass
+
+
+# State of a worker process: the event loop and the SC2 clients that are reused between matches
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+_worker_controllers: List[Controller] = []
+
+
+def _initialize_worker():
+    # pylint: disable=W0603
+    global _worker_loop
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    # Don't leave SC2 clients behind when the pool shuts the worker down
+    atexit.register(kill_switch.kill_all)
+
+
+async def _a_play_match_in_worker(match: GameMatch) -> List[Optional[Result]]:
+    # Keeping the clients alive after a bot vs bot match can cause crashes, see a_run_multiple_games
+    dont_restart = match.needed_sc2_count == 2
+    try:
+        await maintain_SCII_count(match.needed_sc2_count, _worker_controllers, match.sc2_config)
+        result: Dict[AbstractPlayer, Result] = await run_match(_worker_controllers, match, close_ws=dont_restart)
+    except BaseException as e:
+        # The clients are in an unknown state, launch new ones for the next match
+        await maintain_SCII_count(0, _worker_controllers)
+        if isinstance(e, SystemExit):
+            # Raised by sys.exit in SC2Process or Protocol, the pool would re-raise it in the scheduler and end the run
+            raise MatchCrashed(f"Match exited with code {e.code}: {match}") from None
+        raise
+    if dont_restart:
+        await maintain_SCII_count(0, _worker_controllers)
+    # Exceptions of the players are returned as results by run_match, they might not be picklable
+    results = [value if isinstance(value, Result) else None for value in (result[player] for player in match.players)]
+    if any(value is None for player, value in zip(match.players, results) if player.needs_sc2):
+        await maintain_SCII_count(0, _worker_controllers)
+        raise MatchCrashed(f"Match did not finish: {match}")
+    return results
+
+
+def _play_match_in_worker(match: GameMatch) -> List[Optional[Result]]:
+    """ Executed in a worker process, returns the results in the order of match.players. """
+    return _worker_loop.run_until_complete(_a_play_match_in_worker(match))
+
+
+class MatchScheduler:
+    """Dispatches matches to a pool of worker processes and yields the results as soon as matches finish.
+    Matches that crash (exception, bot or client crash, dead worker process) are retried on a fresh set of clients."""
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        retries: int = 1,
+        mp_context: Optional[multiprocessing.context.BaseContext] = None,
+    ):
+        """
+        :param concurrency: amount of matches that run at the same time, defaults to half the cpu count
+            as most matches need two SC2 clients
+        :param retries: how often a crashed match is started again before it is reported with result None
+        :param mp_context: multiprocessing context of the pool, e.g. multiprocessing.get_context("spawn")
+        """
+        self.concurrency: int = concurrency or max(1, (os.cpu_count() or 2) // 2)
+        self.retries: int = retries
+        self.mp_context = mp_context
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.concurrency, mp_context=self.mp_context, initializer=_initialize_worker
+        )
+
+    def run(self, matches: List[GameMatch]) -> Generator[Tuple[int, Optional[Dict[AbstractPlayer, Result]]], None, None]:
+        """Yields (index of the match in 'matches', result) in the order in which matches finish.
+        The result maps the players of the given match objects to their result, like a_run_multiple_games,
+        or is None if the match crashed more often than allowed.
+
+        A dead worker process fails all matches of the pool and it is not known which match caused it. Only as many
+        matches as there are workers are submitted, and matches that were running when the pool broke are started again
+        one at a time, so that a dead worker only counts as a crash for a match that ran alone.
+
+        :param matches:
+        """
+        executor = self._new_executor()
+        attempts: List[int] = [0] * len(matches)
+        queued: Deque[int] = deque(range(len(matches)))
+        # Matches that were running together with others when the pool broke, they are run alone
+        suspects: Deque[int] = deque()
+        pending: Dict[Future, int] = {}
+        try:
+            while queued or suspects or pending:
+                if suspects:
+                    if not pending:
+                        index = suspects.popleft()
+                        pending[executor.submit(_play_match_in_worker, matches[index])] = index
+                else:
+                    while queued and len(pending) < self.concurrency:
+                        index = queued.popleft()
+                        pending[executor.submit(_play_match_in_worker, matches[index])] = index
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                broken: List[int] = []
+                crashed: List[int] = []
+                for future in done:
+                    index = pending.pop(future)
+                    match = matches[index]
+                    try:
+                        results = future.result()
+                    except BrokenProcessPool:
+                        broken.append(index)
+                    except Exception as e:  # pylint: disable=W0703
+                        logger.error(f"Match {match} crashed: {e}")
+                        crashed.append(index)
+                    else:
+                        yield index, dict(zip(match.players, results))
+                if broken:
+                    # All futures of a broken pool fail, also those that did not complete yet
+                    broken += pending.values()
+                    pending = {}
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = self._new_executor()
+                    if len(broken) == 1:
+                        logger.error(f"Worker process died during match {matches[broken[0]]}")
+                        crashed += broken
+                    else:
+                        logger.error(f"Worker process died while {len(broken)} matches were running")
+                        suspects.extend(broken)
+                for index in crashed:
+                    attempts[index] += 1
+                    if attempts[index] > self.retries:
+                        logger.error(f"Giving up on match {matches[index]} after {attempts[index]} attempts")
+                        yield index, None
+                    elif index in broken:
+                        # Killed its worker while running alone, keep it away from the other matches
+                        suspects.appendleft(index)
+                    else:
+                        queued.appendleft(index)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def run_matches_in_parallel(matches: List[GameMatch], concurrency: Optional[int] = None,
+                            retries: int = 1) -> List[Optional[Dict[AbstractPlayer, Result]]]:
+    """Like run_multiple_games, but runs up to 'concurrency' matches at the same time in worker processes.
+    Returns the results in the order of 'matches'.
+
+    :param matches:
+    :param concurrency:
+    :param retries:
+    """
+    results: List[Optional[Dict[AbstractPlayer, Result]]] = [None] * len(matches)
+    for index, result in MatchScheduler(concurrency, retries).run(matches):
+        logger.info(f"Finished match {index + 1} / {len(matches)}: {matches[index]}")
+        results[index] = result
+    return results
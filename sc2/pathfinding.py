@@ -0,0 +1,233 @@
+"""
+Path lengths and paths on the pathing grid, computed without querying the server.
+
+Paths move between cell centers in 8 directions, diagonal moves cost sqrt(2) and may not cut corners of unpathable
+cells. Lengths are therefore close to, but not exactly the same as the distances of Client.query_pathing.
+"""
+from __future__ import annotations
+
+import heapq
+import math
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from sc2.position import Point2
+
+SQRT2: float = math.sqrt(2)
+# (dx, dy, cost) of the moves to the neighbors of a cell
+_MOVES: Tuple[Tuple[int, int, float], ...] = (
+    (1, 0, 1),
+    (-1, 0, 1),
+    (0, 1, 1),
+    (0, -1, 1),
+    (1, 1, SQRT2),
+    (1, -1, SQRT2),
+    (-1, 1, SQRT2),
+    (-1, -1, SQRT2),
+)
+
+
+def octile_distance(x0: int, y0: int, x1: int, y1: int) -> float:
+    """Returns the length of the shortest path between two cells on a grid without obstacles.
+
+    :param x0:
+    :param y0:
+    :param x1:
+    :param y1:
+    """
+    dx, dy = abs(x1 - x0), abs(y1 - y0)
+    return max(dx, dy) + (SQRT2 - 1) * min(dx, dy)
+
+
+class Pathfinder:
+    """A* for single paths and Dijkstra on a sparse graph of the grid for one source and many targets.
+
+    Example::
+
+        length, waypoints = self.pathfinder.find_path(self.start_location, self.enemy_start_locations[0])
+        distances = self.pathfinder.distances(self.start_location, self.expansion_locations_list)
+    """
+
+    def __init__(self, pathing_grid: np.ndarray, snap_distance: int = 4):
+        """
+        :param pathing_grid: GameInfo.pathing_grid.data_numpy, indexed [y, x], non-zero where ground units can walk
+        :param snap_distance: start and target positions on unpathable cells (e.g. the center of a town hall) are
+            moved to the closest pathable cell within this amount of cells
+        """
+        self.snap_distance: int = snap_distance
+        self.grid: np.ndarray = np.empty((0, 0), dtype=bool)
+        self._pathable: List[bool] = []
+        self._graph: Optional[csr_matrix] = None
+        self.update(pathing_grid)
+
+    @property
+    def width(self) -> int:
+        return self.grid.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.grid.shape[0]
+
+    def update(self, pathing_grid: np.ndarray):
+        """Replaces the grid if it changed, e.g. because structures were built.
+
+        :param pathing_grid:
+        """
+        grid = pathing_grid != 0
+        if grid.shape == self.grid.shape and np.array_equal(grid, self.grid):
+            return
+        self.grid = grid
+        self._pathable = grid.ravel().tolist()
+        self._graph = None
+
+    def _moves(self) -> List[Tuple[int, int, int, float]]:
+        """ Returns the flat index offset, the move and the cost of the 8 moves. """
+        return [(dy * self.width + dx, dx, dy, cost) for dx, dy, cost in _MOVES]
+
+    @property
+    def graph(self) -> csr_matrix:
+        """ Sparse adjacency matrix of the pathable cells, built on first use after the grid changed. """
+        if self._graph is None:
+            grid = self.grid
+            height, width = grid.shape
+            sources: List[np.ndarray] = []
+            targets: List[np.ndarray] = []
+            costs: List[np.ndarray] = []
+            for dx, dy, cost in _MOVES:
+                # Cells (x, y) whose neighbor (x + dx, y + dy) is inside the grid
+                source = grid[max(0, -dy):height - max(0, dy), max(0, -dx):width - max(0, dx)]
+                target = grid[max(0, dy):height + min(0, dy), max(0, dx):width + min(0, dx)]
+                allowed = source & target
+                if dx and dy:
+                    # No corner cutting: both orthogonal neighbors have to be pathable as well
+                    allowed &= grid[max(0, -dy):height - max(0, dy), max(0, dx):width + min(0, dx)]
+                    allowed &= grid[max(0, dy):height + min(0, dy), max(0, -dx):width - max(0, dx)]
+                ys, xs = np.nonzero(allowed)
+                xs += max(0, -dx)
+                ys += max(0, -dy)
+                index = ys * width + xs
+                sources.append(index)
+                targets.append(index + dy * width + dx)
+                costs.append(np.full(index.size, cost))
+            size = height * width
+            self._graph = csr_matrix(
+                (np.concatenate(costs), (np.concatenate(sources), np.concatenate(targets))), shape=(size, size)
+            )
+        return self._graph
+
+    def _cell(self, position: Union[Point2, Tuple[float, float]]) -> Optional[Tuple[int, int]]:
+        """Returns the pathable cell of a position, or the closest pathable cell within 'snap_distance'.
+
+        :param position:
+        """
+        x, y = int(position[0]), int(position[1])
+        if 0 <= x < self.width and 0 <= y < self.height and self.grid[y, x]:
+            return x, y
+        r = self.snap_distance
+        x0, y0 = max(0, x - r), max(0, y - r)
+        window = self.grid[y0:y + r + 1, x0:x + r + 1]
+        ys, xs = np.nonzero(window)
+        if not xs.size:
+            return None
+        closest = np.argmin((xs + x0 - x)**2 + (ys + y0 - y)**2)
+        return int(xs[closest]) + x0, int(ys[closest]) + y0
+
+    def find_path(self, start: Union[Point2, Tuple[float, float]],
+                  goal: Union[Point2, Tuple[float, float]]) -> Optional[Tuple[float, List[Point2]]]:
+        """Returns (length, waypoints) of the shortest path with A*, or None if there is no path.
+        The waypoints are the cell centers where the path changes direction, including start and goal cell.
+
+        :param start:
+        :param goal:
+        """
+        start_cell, goal_cell = self._cell(start), self._cell(goal)
+        if start_cell is None or goal_cell is None:
+            return None
+        width, height = self.width, self.height
+        pathable = self._pathable
+        start_index = start_cell[1] * width + start_cell[0]
+        goal_index = goal_cell[1] * width + goal_cell[0]
+        goal_x, goal_y = goal_cell
+        moves = self._moves()
+        g_scores = {start_index: 0.0}
+        parents = {start_index: -1}
+        closed = set()
+        heap = [(octile_distance(*start_cell, *goal_cell), 0.0, start_index)]
+        while heap:
+            _, g_score, index = heapq.heappop(heap)
+            if index == goal_index:
+                return g_score, self._waypoints(parents, index)
+            if index in closed:
+                continue
+            closed.add(index)
+            y, x = divmod(index, width)
+            for offset, dx, dy, cost in moves:
+                neighbor = index + offset
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < width and 0 <= ny < height) or not pathable[neighbor] or neighbor in closed:
+                    continue
+                if dx and dy and not (pathable[index + dx] and pathable[index + dy * width]):
+                    continue
+                new_score = g_score + cost
+                if new_score < g_scores.get(neighbor, math.inf):
+                    g_scores[neighbor] = new_score
+                    parents[neighbor] = index
+                    dx_goal, dy_goal = abs(goal_x - nx), abs(goal_y - ny)
+                    heuristic = max(dx_goal, dy_goal) + (SQRT2 - 1) * min(dx_goal, dy_goal)
+                    heapq.heappush(heap, (new_score + heuristic, new_score, neighbor))
+        return None
+
+    def _waypoints(self, parents: dict, index: int) -> List[Point2]:
+        width = self.width
+        cells = []
+        while index != -1:
+            cells.append(divmod(index, width))
+            index = parents[index]
+        cells.reverse()
+        waypoints = [cells[0]]
+        for previous, cell, following in zip(cells, cells[1:], cells[2:]):
+            if (cell[0] - previous[0], cell[1] - previous[1]) != (following[0] - cell[0], following[1] - cell[1]):
+                waypoints.append(cell)
+        if len(cells) > 1:
+            waypoints.append(cells[-1])
+        return [Point2((x + 0.5, y + 0.5)) for y, x in waypoints]
+
+    def distance(self, start: Union[Point2, Tuple[float, float]],
+                 goal: Union[Point2, Tuple[float, float]]) -> Optional[float]:
+        """Returns the length of the shortest path or None if there is no path, like Client.query_pathing.
+
+        :param start:
+        :param goal:
+        """
+        path = self.find_path(start, goal)
+        return None if path is None else path[0]
+
+    def distance_field(self, start: Union[Point2, Tuple[float, float]]) -> Optional[np.ndarray]:
+        """Returns the path lengths from 'start' to all cells, indexed [y, x], inf where a cell is not reachable.
+        Returns None if there is no pathable cell near 'start'.
+
+        :param start:
+        """
+        start_cell = self._cell(start)
+        if start_cell is None:
+            return None
+        field = dijkstra(self.graph, indices=start_cell[1] * self.width + start_cell[0])
+        return field.reshape(self.grid.shape)
+
+    def distances(self, start: Union[Point2, Tuple[float, float]],
+                  goals: Sequence[Union[Point2, Tuple[float, float]]]) -> List[Optional[float]]:
+        """Returns the path lengths from one start to many goals with one search, None for goals that can't be reached.
+
+        :param start:
+        :param goals:
+        """
+        field = self.distance_field(start)
+        results: List[Optional[float]] = []
+        for goal in goals:
+            goal_cell = self._cell(goal)
+            distance = math.inf if field is None or goal_cell is None else field.item(goal_cell[1], goal_cell[0])
+            results.append(None if math.isinf(distance) else distance)
+        return results
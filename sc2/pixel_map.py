@@ -1,10 +1,54 @@
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Callable, FrozenSet, List, Set, Tuple, Union
 
 import numpy as np
+from scipy import ndimage
 
 from sc2.position import Point2
 
+# Neighbors of a pixel including diagonals, like flood_fill
+EIGHT_CONNECTIVITY: np.ndarray = np.ones((3, 3), dtype=bool)
+
+
+@dataclass
+class Components:
+    """ Connected components of a PixelMap, see PixelMap.label_components. """
+
+    # Label of every pixel, indexed [y, x], 0 for pixels that are not part of a component, 1 to count otherwise
+    labels: np.ndarray
+    count: int
+    # Amount of pixels of each component, sizes[label - 1]
+    sizes: np.ndarray
+    # (x0, y0, x1, y1) of each component, x1 and y1 exclusive, bounding_boxes[label - 1]
+    bounding_boxes: List[Tuple[int, int, int, int]]
+
+    def pixels(self) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """ Returns the (xs, ys) pixel coordinates of each component, ordered by label. """
+        if not self.count:
+            return []
+        flat = self.labels.ravel()
+        order = np.argsort(flat, kind="stable")
+        # Skip the unlabeled pixels, which come first
+        order = order[flat.size - int(self.sizes.sum()):]
+        width = self.labels.shape[1]
+        ys, xs = np.divmod(order, width)
+        bounds = np.cumsum(self.sizes)[:-1]
+        return list(zip(np.split(xs, bounds), np.split(ys, bounds)))
+
+
+def label_mask(mask: np.ndarray) -> Components:
+    """Labels the connected groups of True values of a boolean array, values are connected to all 8 neighbors.
+
+    :param mask: indexed [y, x]
+    """
+    labels, count = ndimage.label(mask, structure=EIGHT_CONNECTIVITY)
+    sizes = np.bincount(labels.ravel(), minlength=count + 1)[1:]
+    bounding_boxes = [
+        (xs.start, ys.start, xs.stop, ys.stop) for ys, xs in ndimage.find_objects(labels, max_label=count)
+    ]
+    return Components(labels, count, sizes, bounding_boxes)
+
 
 class PixelMap:
 
@@ -66,36 +110,58 @@ class PixelMap:
     def copy(self) -> "PixelMap":
         return PixelMap(self._proto, in_bits=self._in_bits)
 
+    def mask(self, pred: Callable[[int], bool]) -> np.ndarray:
+        """Returns the boolean array of the pixels whose value satisfies 'pred', indexed [y, x].
+        'pred' is only called once per distinct value.
+
+        :param pred:
+        """
+        values = np.unique(self.data_numpy)
+        selected = values[[bool(pred(int(value))) for value in values]]
+        return np.isin(self.data_numpy, selected)
+
+    def label_components(self, pred: Callable[[int], bool]) -> Components:
+        """Labels the connected groups of pixels whose value satisfies 'pred', pixels are connected to all 8 neighbors.
+
+        Example::
+
+            components = self.game_info.pathing_grid.label_components(lambda value: value != 0)
+            biggest_label = int(components.sizes.argmax()) + 1
+
+        :param pred:
+        """
+        return label_mask(self.mask(pred))
+
     def flood_fill(self, start_point: Point2, pred: Callable[[int], bool]) -> Set[Point2]:
-        nodes: Set[Point2] = set()
-        queue: List[Point2] = [start_point]
+        width, height = self.width, self.height
+        data = self.data_numpy
+        nodes: Set[Tuple[int, int]] = set()
+        queue: List[Tuple[int, int]] = [(start_point[0], start_point[1])]
 
         while queue:
             x, y = queue.pop()
 
-            if not (0 <= x < self.width and 0 <= y < self.height):
+            if not (0 <= x < width and 0 <= y < height):
                 continue
 
-            if Point2((x, y)) in nodes:
+            if (x, y) in nodes:
                 continue
 
-            if pred(self[x, y]):
-                nodes.add(Point2((x, y)))
-                queue += [Point2((x + a, y + b)) for a in [-1, 0, 1] for b in [-1, 0, 1] if not (a == 0 and b == 0)]
-        return nodes
+            if pred(int(data[y, x])):
+                nodes.add((x, y))
+                queue += [(x + a, y + b) for a in [-1, 0, 1] for b in [-1, 0, 1] if not (a == 0 and b == 0)]
+        return {Point2(node) for node in nodes}
 
     def flood_fill_all(self, pred: Callable[[int], bool]) -> Set[FrozenSet[Point2]]:
-        groups: Set[FrozenSet[Point2]] = set()
+        """Returns the pixels of each connected group of pixels whose value satisfies 'pred'.
+        Prefer label_components, which does not create a Point2 for each pixel.
 
-        for x in range(self.width):
-            for y in range(self.height):
-                if any((x, y) in g for g in groups):
-                    continue
-
-                if pred(self[x, y]):
-                    groups.add(frozenset(self.flood_fill(Point2((x, y)), pred)))
-
-        return groups
+        :param pred:
+        """
+        return {
+            frozenset(Point2(point) for point in zip(xs.tolist(), ys.tolist()))
+            for xs, ys in self.label_components(pred).pixels()
+        }
 
     def print(self, wide: bool = False) -> None:
         for y in range(self.height):
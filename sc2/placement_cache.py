@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import math
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+
+# (ability id, x, y)
+PlacementKey = Tuple[int, float, float]
+# Position and radius of a unit that blocks placement, e.g. a structure or a mineral field
+Blocker = Tuple[float, float, float]
+
+
+class PlacementCache:
+    """Caches the results of building placement queries, see BotAI.can_place.
+
+    Entries are stored in square regions of the map. When something that changes placement happens in a region,
+    e.g. a structure appears or disappears, creep spreads or recedes or a power source changes,
+    only the entries of the affected regions are dropped.
+    Units that are not structures (e.g. an enemy unit standing on the position) are not tracked,
+    'max_age' limits for how long such a result can be outdated.
+    """
+
+    def __init__(self, region_size: int = 8, margin: float = 6, max_age: Optional[int] = 224):
+        """
+        :param region_size: side length of a region in cells
+        :param margin: distance in which a change can affect the placement of a building, has to cover the half size
+            of the largest footprint and the distance a town hall keeps to resources
+        :param max_age: amount of game loops after which an entry is queried again, None to keep entries until
+            they are invalidated
+        """
+        self.region_size: int = region_size
+        self.margin: float = margin
+        self.max_age: Optional[int] = max_age
+        # Region -> placement key -> (placement is possible, game loop of the query)
+        self._regions: Dict[Tuple[int, int], Dict[PlacementKey, Tuple[bool, int]]] = {}
+        self._blockers: Dict[int, Blocker] = {}
+        self._power_sources: Set[Blocker] = set()
+        self._creep: Optional[np.ndarray] = None
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._regions.values())
+
+    def _region(self, x: float, y: float) -> Tuple[int, int]:
+        return int(x // self.region_size), int(y // self.region_size)
+
+    def get(self, ability_id: int, x: float, y: float, game_loop: int) -> Optional[bool]:
+        """Returns the cached placement result or None if the position has to be queried.
+
+        :param ability_id:
+        :param x:
+        :param y:
+        :param game_loop: current game loop
+        """
+        entry = self._regions.get(self._region(x, y), {}).get((ability_id, x, y))
+        if entry is None or self.max_age is not None and game_loop - entry[1] > self.max_age:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def set(self, ability_id: int, x: float, y: float, result: bool, game_loop: int):
+        """
+        :param ability_id:
+        :param x:
+        :param y:
+        :param result: placement is possible
+        :param game_loop: game loop of the query
+        """
+        self._regions.setdefault(self._region(x, y), {})[ability_id, x, y] = (result, game_loop)
+
+    def clear(self):
+        self._regions.clear()
+
+    def invalidate_area(self, x0: float, y0: float, x1: float, y1: float):
+        """Drops the entries whose placement can be affected by a change inside the rectangle, 'margin' is added.
+
+        :param x0:
+        :param y0:
+        :param x1:
+        :param y1:
+        """
+        region_x0, region_y0 = self._region(x0 - self.margin, y0 - self.margin)
+        region_x1, region_y1 = self._region(x1 + self.margin, y1 + self.margin)
+        for region_x in range(region_x0, region_x1 + 1):
+            for region_y in range(region_y0, region_y1 + 1):
+                self._regions.pop((region_x, region_y), None)
+
+    def invalidate_cells(self, xs: np.ndarray, ys: np.ndarray):
+        """Drops the entries whose placement can be affected by a change of the given grid cells, 'margin' is added.
+
+        :param xs: x coordinates of the changed cells
+        :param ys: y coordinates of the changed cells
+        """
+        if not self._regions or not xs.size:
+            return
+        # Regions within this many regions of a changed cell can contain affected entries
+        reach = math.ceil((self.margin + 1) / self.region_size)
+        changed_regions = set(zip((xs // self.region_size).tolist(), (ys // self.region_size).tolist()))
+        for region_x, region_y in changed_regions:
+            for dx in range(-reach, reach + 1):
+                for dy in range(-reach, reach + 1):
+                    self._regions.pop((region_x + dx, region_y + dy), None)
+
+    def update_blockers(self, blockers: Dict[int, Blocker]):
+        """Invalidates the areas of units that block placement and appeared, disappeared or moved (e.g. landed).
+
+        :param blockers: unit tag -> (x, y, radius) of the current structures, resources and destructables
+        """
+        previous = self._blockers
+        self._blockers = blockers
+        if not self._regions:
+            return
+        for tag, blocker in blockers.items():
+            if previous.get(tag) != blocker:
+                self._invalidate_blocker(blocker)
+        for tag, blocker in previous.items():
+            if tag not in blockers:
+                self._invalidate_blocker(blocker)
+
+    def _invalidate_blocker(self, blocker: Blocker):
+        x, y, radius = blocker
+        self.invalidate_area(x - radius, y - radius, x + radius, y + radius)
+
+    def update_power_sources(self, power_sources: Iterable[Blocker]):
+        """Invalidates the areas of power sources that appeared or disappeared.
+
+        :param power_sources: (x, y, radius) of the current power sources
+        """
+        power_sources = set(power_sources)
+        changed = power_sources ^ self._power_sources
+        self._power_sources = power_sources
+        for power_source in changed:
+            self._invalidate_blocker(power_source)
+
+    def update_creep(self, creep: np.ndarray):
+        """Invalidates the areas where creep spread or receded.
+
+        :param creep: creep grid of the current observation, indexed [y, x]
+        """
+        previous = self._creep
+        self._creep = creep.copy()
+        if previous is None or previous.shape != creep.shape:
+            self.clear()
+            return
+        ys, xs = np.nonzero(previous != creep)
+        self.invalidate_cells(xs, ys)
@@ -0,0 +1,147 @@
+"""
+Decides building placement from grids instead of server queries.
+
+Masks returned by the PlacementEngine are indexed [y, x] like the grids of GameInfo.
+mask[y, x] is True if a building with a footprint of 'size' x 'size' cells can be placed at
+(x + footprint_offset(size), y + footprint_offset(size)), as buildings with an odd footprint size are centered on
+cell centers and buildings with an even footprint size on cell corners.
+"""
+from __future__ import annotations
+
+import math
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+# (x0, y0, x1, y1) of grid cells, x1 and y1 exclusive
+Rectangle = Tuple[int, int, int, int]
+# (x, y, radius)
+PowerSource = Tuple[float, float, float]
+
+
+def footprint_offset(size: int) -> float:
+    """Returns the offset from the grid index to the center of a footprint with 'size' x 'size' cells.
+
+    :param size:
+    """
+    return 0.5 if size % 2 else 0
+
+
+def footprint_index(x: float, y: float, size: int) -> Tuple[int, int]:
+    """Returns the mask index of the position that a building with 'size' x 'size' cells snaps to when placed at (x, y).
+
+    :param x:
+    :param y:
+    :param size:
+    """
+    offset = footprint_offset(size)
+    return math.floor(x - offset + 0.5), math.floor(y - offset + 0.5)
+
+
+def box_sums(grid: np.ndarray, size: int) -> np.ndarray:
+    """Returns the sums of all 'size' x 'size' windows of the grid, result[y, x] = grid[y:y + size, x:x + size].sum().
+    Computed with a summed area table, so the cost does not depend on 'size'.
+
+    :param grid:
+    :param size:
+    """
+    height, width = grid.shape
+    integral = np.zeros((height + 1, width + 1), dtype=np.int32)
+    np.cumsum(np.cumsum(grid, axis=0, dtype=np.int32), axis=1, out=integral[1:, 1:])
+    return (
+        integral[size:, size:] - integral[:-size, size:] - integral[size:, :-size] + integral[:-size, :-size]
+    )
+
+
+class PlacementEngine:
+    """Keeps an occupancy raster of structures and resources and combines it with the placement grid, creep and power
+    to find all positions where a building fits, see BotAI.placement_mask."""
+
+    def __init__(self, placement_grid: np.ndarray):
+        """
+        :param placement_grid: GameInfo.placement_grid.data_numpy, 1 where buildings can be placed
+        """
+        self.placement_grid: np.ndarray = placement_grid.astype(bool)
+        # Cells covered by the footprint of a structure, resource or destructable
+        self.occupied: np.ndarray = np.zeros(self.placement_grid.shape, dtype=bool)
+        # Cells that are too close to resources for a town hall
+        self.near_resources: np.ndarray = np.zeros(self.placement_grid.shape, dtype=bool)
+
+    def _fill(self, grid: np.ndarray, rectangles: Iterable[Rectangle], margin: int = 0):
+        height, width = grid.shape
+        for x0, y0, x1, y1 in rectangles:
+            grid[max(0, y0 - margin):min(height, y1 + margin), max(0, x0 - margin):min(width, x1 + margin)] = True
+
+    def update(self, footprints: Iterable[Rectangle], resource_footprints: Iterable[Rectangle],
+               townhall_resource_distance: int = 3):
+        """Rebuilds the occupancy raster.
+
+        :param footprints: footprints of structures and destructables
+        :param resource_footprints: footprints of mineral fields and vespene geysers
+        :param townhall_resource_distance: amount of cells a town hall footprint keeps to resources
+        """
+        resource_footprints = list(resource_footprints)
+        self.occupied.fill(False)
+        self._fill(self.occupied, footprints)
+        self._fill(self.occupied, resource_footprints)
+        self.near_resources.fill(False)
+        self._fill(self.near_resources, resource_footprints, margin=townhall_resource_distance)
+
+    def mask(
+        self,
+        size: int,
+        townhall: bool = False,
+        creep: Optional[np.ndarray] = None,
+        needs_creep: Optional[bool] = None,
+        power_sources: Optional[Iterable[PowerSource]] = None,
+    ) -> np.ndarray:
+        """Returns the mask of all positions where a building with a footprint of 'size' x 'size' cells can be placed.
+
+        :param size: footprint size in cells
+        :param townhall: the building has to keep its distance to resources
+        :param creep: creep grid of the current observation, required if 'needs_creep' is not None
+        :param needs_creep: True if all footprint cells need creep, False if none may have creep, None to ignore creep
+        :param power_sources: if not None, the center of the building has to be within the radius of a power source
+        """
+        blocked = ~self.placement_grid | self.occupied
+        if townhall:
+            blocked |= self.near_resources
+        if needs_creep is not None:
+            blocked |= (creep == 0) if needs_creep else (creep != 0)
+        fits = box_sums(blocked, size) == 0
+
+        mask = np.zeros(self.placement_grid.shape, dtype=bool)
+        # A window with its lower left corner at (x, y) belongs to the building at index (x + size // 2, y + size // 2)
+        shift = size // 2
+        mask[shift:shift + fits.shape[0], shift:shift + fits.shape[1]] = fits
+
+        if power_sources is not None:
+            powered = np.zeros(mask.shape, dtype=bool)
+            offset = footprint_offset(size)
+            height, width = mask.shape
+            for x, y, radius in power_sources:
+                # Only the bounding box of the power field is checked
+                x0, x1 = max(0, math.floor(x - radius - offset)), min(width, math.ceil(x + radius - offset) + 1)
+                y0, y1 = max(0, math.floor(y - radius - offset)), min(height, math.ceil(y + radius - offset) + 1)
+                if x0 >= x1 or y0 >= y1:
+                    continue
+                xs = np.arange(x0, x1) + offset - x
+                ys = np.arange(y0, y1) + offset - y
+                powered[y0:y1, x0:x1] |= ys[:, None]**2 + xs[None, :]**2 <= radius**2
+            mask &= powered
+        return mask
+
+    def geyser_mask(self, geyser_positions: Iterable[Tuple[float, float]], size: int = 3) -> np.ndarray:
+        """Returns the mask of gas buildings, which can only be placed on vespene geysers.
+        Geysers are not part of the placement grid, so mask() never allows a gas building.
+
+        :param geyser_positions: centers of the geysers that don't have a gas building yet
+        :param size: footprint size of the gas building in cells
+        """
+        mask = np.zeros(self.placement_grid.shape, dtype=bool)
+        height, width = mask.shape
+        for x, y in geyser_positions:
+            index_x, index_y = footprint_index(x, y, size)
+            if 0 <= index_x < width and 0 <= index_y < height:
+                mask[index_y, index_x] = True
+        return mask
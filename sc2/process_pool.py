@@ -0,0 +1,205 @@
+"""
+Keeps SC2 clients launched and connected in the background, so that matches don't have to wait for the client launch.
+
+Example::
+
+    from sc2.process_pool import SC2ProcessPool
+
+    async def play_many(matches: List[GameMatch]):
+        async with SC2ProcessPool(size=2) as pool:
+            return await a_run_multiple_games(matches, pool=pool)
+"""
+from __future__ import annotations
+
+import asyncio
+import platform
+from contextlib import suppress
+from typing import Dict, Iterable, List, Optional, Set
+
+from loguru import logger
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from sc2.controller import Controller
+from sc2.data import Status
+from sc2.sc2process import SC2Process, kill_switch
+
+
+class SC2ProcessPool:
+    """A pool of 'size' SC2 clients. Clients are launched and validated with a ping in the background,
+    handed out with acquire() and given back with release() after the match, which leaves the game
+    and replaces clients that are no longer healthy."""
+
+    def __init__(
+        self,
+        size: int = 2,
+        proc_args: Optional[List[Dict]] = None,
+        launch_timeout: float = 50,
+        ping_timeout: float = 20,
+        launch_attempts: int = 3,
+    ):
+        """
+        :param size: amount of clients that are kept alive, idle and in use
+        :param proc_args: keyword arguments of SC2Process, the clients use them round robin
+        :param launch_timeout: seconds until a client has to accept the websocket connection
+        :param ping_timeout: seconds a healthy client takes at most to answer a ping or leave a game
+        :param launch_attempts: attempts to launch one client before acquire() raises an error
+        """
+        assert size > 0, f"Pool size has to be positive, got {size}"
+        self.size: int = size
+        self.proc_args: List[Dict] = proc_args or [{}]
+        self.launch_timeout: float = launch_timeout
+        self.ping_timeout: float = ping_timeout
+        self.launch_attempts: int = launch_attempts
+        # Launched clients that wait to be acquired, None marks a client that could not be launched
+        self._idle: Optional[asyncio.Queue] = None
+        self._in_use: Set[Controller] = set()
+        self._launching: Set[asyncio.Task] = set()
+        # Starting two clients at nearly the same time doesn't work on linux, see maintain_SCII_count
+        self._launch_lock: Optional[asyncio.Lock] = None
+        self._launched: int = 0
+        self._closed: bool = False
+
+    async def start(self):
+        """ Starts launching the clients in the background, returns immediately. """
+        if self._idle is not None:
+            return
+        # Created here, so they belong to the running event loop
+        self._idle = asyncio.Queue()
+        self._launch_lock = asyncio.Lock()
+        for _ in range(self.size):
+            self._launch_in_background()
+
+    def _launch_in_background(self):
+        if self._closed:
+            return
+        task = asyncio.ensure_future(self._launch())
+        self._launching.add(task)
+        task.add_done_callback(self._launching.discard)
+
+    async def _launch(self):
+        for attempt in range(1, self.launch_attempts + 1):
+            process = SC2Process(**self.proc_args[self._launched % len(self.proc_args)])
+            self._launched += 1
+            try:
+                if platform.system() == "Linux":
+                    async with self._launch_lock:
+                        # pylint: disable=C2801
+                        controller = await asyncio.wait_for(process.__aenter__(), timeout=self.launch_timeout)
+                else:
+                    # pylint: disable=C2801
+                    controller = await asyncio.wait_for(process.__aenter__(), timeout=self.launch_timeout)
+                await asyncio.wait_for(controller.ping(), timeout=self.ping_timeout)
+            except asyncio.CancelledError:
+                await self._discard_process(process)
+                raise
+            except Exception as e:  # pylint: disable=W0703
+                logger.warning(f"Launching SC2 failed (attempt {attempt} / {self.launch_attempts}): {e}")
+                await self._discard_process(process)
+                continue
+            if self._closed:
+                await self._discard_process(process)
+                return
+            logger.debug(f"SC2 listening to {process._port} is ready")
+            self._idle.put_nowait(controller)
+            return
+        self._idle.put_nowait(None)
+
+    @staticmethod
+    async def _discard_process(process: SC2Process):
+        with suppress(Exception):
+            await process._close_connection()
+        process._clean(verbose=False)
+        if process in kill_switch._to_kill:
+            kill_switch._to_kill.remove(process)
+
+    async def _replace(self, controller: Controller):
+        """ Kills the client and launches a new one in the background. """
+        logger.info(f"Replacing SC2 listening to {controller._process._port}")
+        self._in_use.discard(controller)
+        await self._discard_process(controller._process)
+        self._launch_in_background()
+
+    async def _is_healthy(self, controller: Controller) -> bool:
+        """Pings the client and leaves the game it is still in. Returns False if the client does not respond.
+
+        :param controller:
+        """
+        if controller._ws is None or controller._ws.closed:
+            return False
+        try:
+            await asyncio.wait_for(controller.ping(), timeout=self.ping_timeout)
+            if controller._status != Status.launched:
+                await asyncio.wait_for(
+                    controller._execute(leave_game=sc_pb.RequestLeaveGame()), timeout=self.ping_timeout
+                )
+        except Exception as e:  # pylint: disable=W0703
+            logger.warning(f"SC2 listening to {controller._process._port} is not healthy: {e}")
+            return False
+        return controller._status == Status.launched
+
+    async def acquire(self, count: int = 1) -> List[Controller]:
+        """Returns 'count' healthy clients that are not in a game, waits until enough clients are launched.
+        Raises RuntimeError if a client could not be launched.
+
+        :param count: at most the size of the pool
+        """
+        assert 0 < count <= self.size, f"Can not acquire {count} clients from a pool of size {self.size}"
+        await self.start()
+        controllers: List[Controller] = []
+        try:
+            while len(controllers) < count:
+                controller: Optional[Controller] = await self._idle.get()
+                if controller is None:
+                    # Keep the size of the pool, the next launch might succeed
+                    self._launch_in_background()
+                    raise RuntimeError(f"Could not launch SC2 after {self.launch_attempts} attempts")
+                # Idle clients might have crashed since they were launched
+                if await self._is_healthy(controller):
+                    self._in_use.add(controller)
+                    controllers.append(controller)
+                else:
+                    await self._replace(controller)
+        except BaseException:
+            for controller in controllers:
+                self._in_use.discard(controller)
+                self._idle.put_nowait(controller)
+            raise
+        return controllers
+
+    async def release(self, controllers: Iterable[Controller], replace: bool = False):
+        """Gives clients back to the pool after a match. Clients that don't leave the game cleanly are replaced.
+
+        :param controllers: clients returned by acquire()
+        :param replace: replace the clients without checking them, e.g. after a match crashed
+        """
+        for controller in controllers:
+            if controller not in self._in_use:
+                continue
+            if replace or self._closed or not await self._is_healthy(controller):
+                await self._replace(controller)
+            else:
+                self._in_use.discard(controller)
+                self._idle.put_nowait(controller)
+
+    async def close(self):
+        """ Kills all clients of the pool, clients that are in use as well. """
+        self._closed = True
+        for task in list(self._launching):
+            task.cancel()
+        if self._launching:
+            await asyncio.gather(*self._launching, return_exceptions=True)
+        controllers = list(self._in_use)
+        self._in_use.clear()
+        while self._idle is not None and not self._idle.empty():
+            controller = self._idle.get_nowait()
+            if controller is not None:
+                controllers.append(controller)
+        for controller in controllers:
+            await self._discard_process(controller._process)
+
+    async def __aenter__(self) -> SC2ProcessPool:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
@@ -1,12 +1,17 @@
 import asyncio
 import sys
+import time
 from contextlib import suppress
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
 
 from aiohttp import ClientWebSocketResponse
 from loguru import logger
 from s2clientprotocol import sc2api_pb2 as sc_pb
 
+from sc2.capture import CaptureWriter
 from sc2.data import Status
+from sc2.request_trace import RequestTrace
 
 
 class ProtocolError(Exception):
@@ -30,54 +35,149 @@ class Protocol:
         assert ws
         self._ws: ClientWebSocketResponse = ws
         self._status: Status = None
+        self._capture: Optional[CaptureWriter] = None
+        self._trace: Optional[RequestTrace] = None
+        # Requests that are sent together with the next request, and whether errors in their responses are ignored
+        self._queued: List[Tuple[sc_pb.Request, bool]] = []
 
-    async def __request(self, request):
-        logger.debug(f"Sending request: {request !r}")
+    def start_capture(self, path: Union[str, Path], compress: bool = False):
+        """Writes all following requests and responses to a capture file, see capture.py.
+
+        :param path:
+        :param compress: compress the capture with zstd, requires the 'zstandard' package
+        """
+        self.stop_capture()
+        self._capture = CaptureWriter(path, compress=compress)
+        logger.info(f"Capturing requests and responses to {path}")
+
+    def stop_capture(self):
+        if self._capture is not None:
+            self._capture.close()
+            self._capture = None
+
+    def start_trace(self, trace: Optional[RequestTrace] = None) -> RequestTrace:
+        """Records type, size and latency of all following requests, see request_trace.py.
+
+        :param trace: continue recording into this trace, a new one is created if None
+        """
+        self._trace = trace if trace is not None else RequestTrace()
+        return self._trace
+
+    def stop_trace(self) -> Optional[RequestTrace]:
+        trace, self._trace = self._trace, None
+        return trace
+
+    def _queue(self, ignore_errors: bool = False, **kwargs):
+        """Queues a request that is sent right before the next request, without waiting for its response in between.
+        SC2 answers the requests of one connection in order, so the responses are read in the same order afterwards.
+        This saves a round trip per queued request, e.g. for the action, debug and step requests at the end of a frame.
+
+        :param ignore_errors: if False, an error in the response raises a ProtocolError in the request that sends it
+        """
+        assert len(kwargs) == 1, "Only one request allowed by the API"
+        self._queued.append((sc_pb.Request(**kwargs), ignore_errors))
+
+    async def _flush(self):
+        """ Sends the queued requests and reads their responses, without sending another request. """
+        if self._queued:
+            await self.__request(None)
+
+    async def __request(self, request: Optional[sc_pb.Request]) -> Optional[sc_pb.Response]:
+        """Sends the queued requests and the request, then reads all responses. Returns the response to 'request'.
+
+        :param request: None to only send the queued requests
+        """
+        queued, self._queued = self._queued, []
+        requests = [queued_request for queued_request, _ in queued]
+        if request is not None:
+            requests.append(request)
+        requests_bytes = []
+        for request_proto in requests:
+            # The repr of a request is only built if a handler accepts debug messages
+            logger.opt(lazy=True).debug("Sending request: {}", request_proto.__repr__)
+            requests_bytes.append(request_proto.SerializeToString())
+        time_before_request = time.perf_counter() if self._trace is not None else 0
         try:
-            await self._ws.send_bytes(request.SerializeToString())
+            for request_bytes in requests_bytes:
+                await self._ws.send_bytes(request_bytes)
         except TypeError as exc:
             logger.exception("Cannot send: Connection already closed.")
             raise ConnectionAlreadyClosed("Connection already closed.") from exc
         logger.debug("Request sent")
 
-        response = sc_pb.Response()
-        try:
-            response_bytes = await self._ws.receive_bytes()
-        except TypeError as exc:
-            if self._status == Status.ended:
-                logger.info("Cannot receive: Game has already ended.")
-                raise ConnectionAlreadyClosed("Game has already ended") from exc
-            logger.error("Cannot receive: Connection already closed.")
-            raise ConnectionAlreadyClosed("Connection already closed.") from exc
-        except asyncio.CancelledError:
-            # If request is sent, the response must be received before reraising cancel
+        responses = []
+        for index, request_bytes in enumerate(requests_bytes):
             try:
-                await self._ws.receive_bytes()
+                response_bytes = await self._ws.receive_bytes()
+            except TypeError as exc:
+                if self._status == Status.ended:
+                    logger.info("Cannot receive: Game has already ended.")
+                    raise ConnectionAlreadyClosed("Game has already ended") from exc
+                logger.error("Cannot receive: Connection already closed.")
+                raise ConnectionAlreadyClosed("Connection already closed.") from exc
             except asyncio.CancelledError:
-                logger.critical("Requests must not be cancelled multiple times")
-                sys.exit(2)
-            raise
-
-        response.ParseFromString(response_bytes)
+                # If requests are sent, their responses must be received before reraising cancel
+                try:
+                    for _ in range(len(requests_bytes) - index):
+                        await self._ws.receive_bytes()
+                except asyncio.CancelledError:
+                    logger.critical("Requests must not be cancelled multiple times")
+                    sys.exit(2)
+                raise
+
+            if self._trace is not None:
+                self._trace.record(
+                    requests[index].WhichOneof("request"), len(request_bytes), len(response_bytes),
+                    time.perf_counter() - time_before_request
+                )
+            if self._capture is not None:
+                self._capture.write_request(request_bytes)
+                self._capture.write_response(response_bytes)
+            response = sc_pb.Response()
+            response.ParseFromString(response_bytes)
+            responses.append(response)
         logger.debug("Response received")
-        return response
 
-    async def _execute(self, **kwargs):
-        assert len(kwargs) == 1, "Only one request allowed by the API"
-
-        response = await self.__request(sc_pb.Request(**kwargs))
+        # Errors of queued requests are raised after the status was updated by all responses
+        queued_error: Optional[ProtocolError] = None
+        for (_, ignore_errors), response in zip(queued, responses):
+            try:
+                self._process_response(response)
+            except ProtocolError as e:
+                if not ignore_errors and queued_error is None:
+                    queued_error = e
+        if request is None:
+            if queued_error is not None:
+                raise queued_error
+            return None
+        response = responses[-1]
+        if queued_error is not None:
+            self._update_status(response)
+            raise queued_error
+        return response
 
+    def _update_status(self, response: sc_pb.Response):
         new_status = Status(response.status)
         if new_status != self._status:
             logger.info(f"Client status changed to {new_status} (was {self._status})")
         self._status = new_status
 
+    def _process_response(self, response: sc_pb.Response) -> sc_pb.Response:
+        """ Updates the client status and raises a ProtocolError if the response contains an error. """
+        self._update_status(response)
+
         if response.error:
             logger.debug(f"Response contained an error: {response.error}")
             raise ProtocolError(f"{response.error}")
 
         return response
 
+    async def _execute(self, **kwargs):
+        assert len(kwargs) == 1, "Only one request allowed by the API"
+
+        response = await self.__request(sc_pb.Request(**kwargs))
+        return self._process_response(response)
+
     async def ping(self):
         result = await self._execute(ping=sc_pb.RequestPing())
         return result
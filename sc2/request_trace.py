@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+from loguru import logger
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+# Field names of the 'request' oneof of sc_pb.Request, e.g. "observation", "action", "query"
+REQUEST_TYPES: Tuple[str, ...] = tuple(
+    field.name for field in sc_pb.Request.DESCRIPTOR.oneofs_by_name["request"].fields
+)
+_REQUEST_TYPE_INDEX: Dict[str, int] = {name: index for index, name in enumerate(REQUEST_TYPES)}
+
+
+class RequestTrace:
+    """Records type, serialized size and latency of the last 'capacity' requests that Protocol sent, in a ring buffer.
+    This is much cheaper than logging the repr of each request and response.
+
+    Example::
+
+        class MyBot(BotAI):
+            def __init__(self):
+                self.request_trace_capacity = 10000
+                self.request_trace_path = "requests.npz"
+
+            async def on_step(self, iteration: int):
+                if iteration % 100 == 0:
+                    print(self.request_trace.summary().get("query"))
+    """
+
+    def __init__(self, capacity: int = 10000, log_level: Optional[str] = None):
+        """
+        :param capacity: amount of requests that are kept
+        :param log_level: additionally log every request at this level, e.g. "TRACE".
+            Type, sizes and latency are passed as keyword arguments, so they end up in the 'extra' dict of the record
+        """
+        assert capacity > 0, f"Capacity has to be positive, got {capacity}"
+        self.capacity: int = capacity
+        self.log_level: Optional[str] = log_level
+        self.request_types: np.ndarray = np.zeros(capacity, dtype=np.int16)
+        self.request_sizes: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        self.response_sizes: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        # Seconds from sending the request until the response was received
+        self.latencies: np.ndarray = np.zeros(capacity)
+        # Amount of requests recorded since creation
+        self.requests: int = 0
+
+    def __len__(self) -> int:
+        """ Returns the amount of requests that are stored. """
+        return min(self.requests, self.capacity)
+
+    def record(self, request_type: str, request_size: int, response_size: int, latency: float):
+        """
+        :param request_type: name of the request field, see REQUEST_TYPES
+        :param request_size: bytes of the serialized request
+        :param response_size: bytes of the serialized response
+        :param latency: seconds
+        """
+        row = self.requests % self.capacity
+        self.request_types[row] = _REQUEST_TYPE_INDEX[request_type]
+        self.request_sizes[row] = request_size
+        self.response_sizes[row] = response_size
+        self.latencies[row] = latency
+        self.requests += 1
+        if self.log_level is not None:
+            # Formatted by loguru only if a handler accepts the level
+            logger.log(
+                self.log_level,
+                "{request_type} request {request_size} B, response {response_size} B, {latency_ms:.2f} ms",
+                request_type=request_type,
+                request_size=request_size,
+                response_size=response_size,
+                latency_ms=latency * 1000,
+            )
+
+    def _ordered(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """ Returns request types, request sizes, response sizes and latencies of the stored requests, oldest first. """
+        if self.requests <= self.capacity:
+            order = slice(0, self.requests)
+        else:
+            start = self.requests % self.capacity
+            order = np.r_[start:self.capacity, 0:start]
+        return self.request_types[order], self.request_sizes[order], self.response_sizes[order], self.latencies[order]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Returns count, total KiB sent and received and mean, 95th percentile and max latency in milliseconds
+        of the stored requests per request type, e.g.
+        {"observation": {"count": 500, "request_kib": 2.0, "response_kib": 9500.0, "mean_ms": 1.9, "p95_ms": 3.1,
+        "max_ms": 12.0}, ...}"""
+        request_types, request_sizes, response_sizes, latencies = self._ordered()
+        summary: Dict[str, Dict[str, float]] = {}
+        for index in np.unique(request_types).tolist():
+            mask = request_types == index
+            latencies_ms = latencies[mask] * 1000
+            summary[REQUEST_TYPES[index]] = {
+                "count": int(mask.sum()),
+                "request_kib": request_sizes[mask].sum().item() / 1024,
+                "response_kib": response_sizes[mask].sum().item() / 1024,
+                "mean_ms": latencies_ms.mean().item(),
+                "p95_ms": np.percentile(latencies_ms, 95).item(),
+                "max_ms": latencies_ms.max().item(),
+            }
+        return summary
+
+    def dump(self, path: Union[str, Path]):
+        """Writes the stored requests to a compressed numpy file with the arrays 'request_type_names',
+        'request_types' (n,) as index into the names, 'request_bytes' (n,), 'response_bytes' (n,)
+        and 'latency_ms' (n,), oldest request first.
+
+        :param path:
+        """
+        request_types, request_sizes, response_sizes, latencies = self._ordered()
+        np.savez_compressed(
+            path,
+            request_type_names=np.array(REQUEST_TYPES),
+            request_types=request_types,
+            request_bytes=request_sizes,
+            response_bytes=response_sizes,
+            latency_ms=(latencies * 1000).astype(np.float32),
+        )
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import enum
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Generator, List, Tuple, Union
+
+import numpy as np
+
+
+class StepPhase(enum.IntEnum):
+    """ Phases of one bot iteration that are timed by the StepProfiler. """
+
+    # Observation request (and game info request, if the pathing grid is refreshed)
+    OBSERVATION = 0
+    # Creating the GameState from the observation
+    GAME_STATE = 1
+    # BotAIInternal._prepare_step, includes _prepare_units
+    PREPARE_STEP = 2
+    PREPARE_UNITS = 3
+    ISSUE_EVENTS = 4
+    ON_STEP = 5
+    DO_ACTIONS = 6
+    SEND_DEBUG = 7
+
+
+class StepProfiler:
+    """Records the wall time of each StepPhase for the last 'capacity' bot iterations in a ring buffer.
+
+    Example::
+
+        from sc2.step_profiler import StepPhase
+
+        async def on_step(self, iteration: int):
+            if iteration % 100 == 0:
+                print(self.step_profiler.summary()["on_step"])
+                game_loop, total_ms, phases_ms = self.step_profiler.slowest_steps(1)[0]
+    """
+
+    def __init__(self, capacity: int = 2048):
+        """
+        :param capacity: amount of iterations that are kept
+        """
+        assert capacity > 0, f"Capacity has to be positive, got {capacity}"
+        self.capacity: int = capacity
+        # Seconds spent in each phase, one row per iteration
+        self.times: np.ndarray = np.zeros((capacity, len(StepPhase)))
+        self.game_loops: np.ndarray = np.full(capacity, -1, dtype=np.int64)
+        # Amount of iterations started since creation, the current iteration is in row (iterations - 1) % capacity
+        self.iterations: int = 0
+        self._row: int = 0
+        # True between begin_step and end_step, timings outside of an iteration are dropped
+        self._recording: bool = False
+
+    def __len__(self) -> int:
+        """ Returns the amount of iterations that are stored. """
+        return min(self.iterations, self.capacity)
+
+    def begin_step(self):
+        """ Starts a new row, the oldest row gets overwritten once the ring buffer is full. """
+        self._row = self.iterations % self.capacity
+        self.times[self._row] = 0
+        self.game_loops[self._row] = -1
+        self.iterations += 1
+        self._recording = True
+
+    def end_step(self):
+        """ Ends the current row, timings that are added until the next begin_step are dropped. """
+        self._recording = False
+
+    @contextmanager
+    def paused(self) -> Generator[None, None, None]:
+        """ Drops the timings that are added inside, e.g. of steps that are advanced during on_step. """
+        recording, self._recording = self._recording, False
+        try:
+            yield
+        finally:
+            self._recording = recording
+
+    def set_game_loop(self, game_loop: int):
+        """
+        :param game_loop: game loop of the current iteration
+        """
+        if self._recording:
+            self.game_loops[self._row] = game_loop
+
+    def add(self, phase: StepPhase, seconds: float):
+        """Adds time to a phase of the current iteration. Phases that run more than once in an iteration are summed up.
+        Does nothing if no iteration was started with begin_step.
+
+        :param phase:
+        :param seconds:
+        """
+        if self._recording:
+            self.times[self._row, phase] += seconds
+
+    def _ordered(self) -> Tuple[np.ndarray, np.ndarray]:
+        """ Returns game loops and times of the stored iterations, oldest first. """
+        if self.iterations <= self.capacity:
+            return self.game_loops[:self.iterations], self.times[:self.iterations]
+        start = self.iterations % self.capacity
+        order = np.r_[start:self.capacity, 0:start]
+        return self.game_loops[order], self.times[order]
+
+    def samples(self, phase: StepPhase) -> np.ndarray:
+        """Returns the durations of a phase in milliseconds of the stored iterations, oldest first.
+
+        :param phase:
+        """
+        return self._ordered()[1][:, phase] * 1000
+
+    def last(self, phase: StepPhase) -> float:
+        """Returns the duration of a phase in milliseconds in the current iteration.
+
+        :param phase:
+        """
+        return self.times.item(self._row, phase) * 1000
+
+    def histogram(self, phase: StepPhase, bins: Union[int, np.ndarray] = 20) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (counts, bin edges in milliseconds) of a phase over the stored iterations, see numpy.histogram.
+
+        :param phase:
+        :param bins:
+        """
+        return np.histogram(self.samples(phase), bins=bins)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Returns min, mean, median, 95th and 99th percentile and max duration in milliseconds of each phase, e.g.
+        {"on_step": {"min": 0.4, "mean": 1.2, "p50": 1.1, "p95": 2.5, "p99": 4.0, "max": 9.8}, ...}"""
+        if not len(self):
+            return {}
+        times = self._ordered()[1] * 1000
+        percentiles = np.percentile(times, [50, 95, 99], axis=0)
+        return {
+            phase.name.lower(): {
+                "min": times[:, phase].min().item(),
+                "mean": times[:, phase].mean().item(),
+                "p50": percentiles.item(0, phase),
+                "p95": percentiles.item(1, phase),
+                "p99": percentiles.item(2, phase),
+                "max": times[:, phase].max().item(),
+            }
+            for phase in StepPhase
+        }
+
+    def slowest_steps(self, n: int = 10) -> List[Tuple[int, float, Dict[str, float]]]:
+        """Returns the n slowest stored iterations as (game loop, total milliseconds, milliseconds per phase).
+        The total does not count PREPARE_UNITS twice, as it is part of PREPARE_STEP.
+
+        :param n:
+        """
+        game_loops, times = self._ordered()
+        totals = times.sum(axis=1) - times[:, StepPhase.PREPARE_UNITS]
+        rows = np.argsort(totals)[::-1][:n]
+        return [
+            (
+                game_loops.item(row),
+                totals.item(row) * 1000,
+                {phase.name.lower(): times.item(row, phase) * 1000
+                 for phase in StepPhase},
+            ) for row in rows.tolist()
+        ]
+
+    def dump(self, path: Union[str, Path]):
+        """Writes the stored iterations to a compressed numpy file with the arrays
+        'phases' (phase names), 'game_loops' (n,) and 'times_ms' (n, phases), oldest iteration first.
+
+        Load it with::
+
+            data = numpy.load(path)
+            on_step_ms = data["times_ms"][:, list(data["phases"]).index("on_step")]
+
+        :param path:
+        """
+        game_loops, times = self._ordered()
+        np.savez_compressed(
+            path,
+            phases=np.array([phase.name.lower() for phase in StepPhase]),
+            game_loops=game_loops,
+            times_ms=(times * 1000).astype(np.float32),
+        )
@@ -7,13 +7,10 @@ from dataclasses import dataclass
 from functools import cached_property
 from typing import TYPE_CHECKING, Any, FrozenSet, List, Optional, Set, Tuple, Union
 
-from sc2.cache import CacheDict
 from sc2.constants import (
     CAN_BE_ATTACKED,
     DAMAGE_BONUS_PER_UPGRADE,
-    IS_ARMORED,
     IS_ATTACKING,
-    IS_BIOLOGICAL,
     IS_CARRYING_MINERALS,
     IS_CARRYING_RESOURCES,
     IS_CARRYING_VESPENE,
@@ -24,17 +21,13 @@ from sc2.constants import (
     IS_ENEMY,
     IS_GATHERING,
     IS_LIGHT,
-    IS_MASSIVE,
-    IS_MECHANICAL,
     IS_MINE,
     IS_PATROLLING,
     IS_PLACEHOLDER,
-    IS_PSIONIC,
     IS_REPAIRING,
     IS_RETURNING,
     IS_REVEALED,
     IS_SNAPSHOT,
-    IS_STRUCTURE,
     IS_VISIBLE,
     OFF_CREEP_SPEED_INCREASE_DICT,
     OFF_CREEP_SPEED_UPGRADE_DICT,
@@ -46,23 +39,22 @@ from sc2.constants import (
     TARGET_BOTH,
     TARGET_GROUND,
     TARGET_HELPER,
-    UNIT_BATTLECRUISER,
     UNIT_COLOSSUS,
-    UNIT_ORACLE,
     UNIT_PHOTONCANNON,
     transforming,
 )
 from sc2.data import Alliance, Attribute, CloakState, Race, Target, race_gas, warpgate_abilities
 from sc2.ids.ability_id import AbilityId
-from sc2.ids.buff_id import BuffId
-from sc2.ids.unit_typeid import UnitTypeId
+from sc2.ids.buff_id import BuffId, buff_id_from_value
+from sc2.ids.unit_typeid import UnitTypeId, unit_type_id_from_value
 from sc2.ids.upgrade_id import UpgradeId
 from sc2.position import Point2, Point3
 from sc2.unit_command import UnitCommand
 
 if TYPE_CHECKING:
     from sc2.bot_ai import BotAI
-    from sc2.game_data import AbilityData, UnitTypeData
+    from sc2.game_data import AbilityData, UnitTypeData, UnitTypeTable
+    from sc2.unit_frame import UnitFrame
 
 
 @dataclass
@@ -103,7 +95,6 @@ class UnitOrder:
 
 # pylint: disable=R0904
 class Unit:
-    class_cache = CacheDict()
 
     def __init__(
         self,
@@ -111,19 +102,24 @@ class Unit:
         bot_object: BotAI,
         distance_calculation_index: int = -1,
         base_build: int = -1,
+        unit_frame: Optional[UnitFrame] = None,
     ):
         """
         :param proto_data:
         :param bot_object:
         :param distance_calculation_index:
         :param base_build:
+        :param unit_frame:
         """
         self._proto = proto_data
         self._bot_object: BotAI = bot_object
         self.game_loop: int = bot_object.state.game_loop
         self.base_build = base_build
         # Index used in the 2D numpy array to access the 2D distance between two units
+        # This is also the row of this unit in the unit frame
         self.distance_calculation_index: int = distance_calculation_index
+        # Column store of the observation this unit was created from, None if the unit was not created by _prepare_units
+        self._unit_frame: Optional[UnitFrame] = unit_frame
 
     def __repr__(self) -> str:
         """ Returns string of this form: Unit(name='SCV', tag=4396941328). """
@@ -132,14 +128,18 @@ class Unit:
     @property
     def type_id(self) -> UnitTypeId:
         """ UnitTypeId found in sc2/ids/unit_typeid. """
-        unit_type: int = self._proto.unit_type
-        return self.class_cache.retrieve_and_set(unit_type, lambda: UnitTypeId(unit_type))
+        return unit_type_id_from_value(self._proto.unit_type)
 
     @cached_property
     def _type_data(self) -> UnitTypeData:
         """ Provides the unit type data. """
         return self._bot_object.game_data.units[self._proto.unit_type]
 
+    @property
+    def _type_table(self) -> UnitTypeTable:
+        """ Static attributes of all unit types, see GameData.unit_type_table. """
+        return self._bot_object.game_data.unit_type_table
+
     @cached_property
     def _creation_ability(self) -> AbilityData:
         """ Provides the AbilityData of the creation ability of this unit. """
@@ -163,37 +163,37 @@ class Unit:
     @property
     def is_structure(self) -> bool:
         """ Checks if the unit is a structure. """
-        return IS_STRUCTURE in self._type_data.attributes
+        return self._type_table.is_structure.item(self._proto.unit_type)
 
     @property
     def is_light(self) -> bool:
         """ Checks if the unit has the 'light' attribute. """
-        return IS_LIGHT in self._type_data.attributes
+        return self._type_table.is_light.item(self._proto.unit_type)
 
     @property
     def is_armored(self) -> bool:
         """ Checks if the unit has the 'armored' attribute. """
-        return IS_ARMORED in self._type_data.attributes
+        return self._type_table.is_armored.item(self._proto.unit_type)
 
     @property
     def is_biological(self) -> bool:
         """ Checks if the unit has the 'biological' attribute. """
-        return IS_BIOLOGICAL in self._type_data.attributes
+        return self._type_table.is_biological.item(self._proto.unit_type)
 
     @property
     def is_mechanical(self) -> bool:
         """ Checks if the unit has the 'mechanical' attribute. """
-        return IS_MECHANICAL in self._type_data.attributes
+        return self._type_table.is_mechanical.item(self._proto.unit_type)
 
     @property
     def is_massive(self) -> bool:
         """ Checks if the unit has the 'massive' attribute. """
-        return IS_MASSIVE in self._type_data.attributes
+        return self._type_table.is_massive.item(self._proto.unit_type)
 
     @property
     def is_psionic(self) -> bool:
         """ Checks if the unit has the 'psionic' attribute. """
-        return IS_PSIONIC in self._type_data.attributes
+        return self._type_table.is_psionic.item(self._proto.unit_type)
 
     @cached_property
     def tech_alias(self) -> Optional[List[UnitTypeId]]:
@@ -217,8 +217,7 @@ class Unit:
     @cached_property
     def can_attack(self) -> bool:
         """ Checks if the unit can attack at all. """
-        # TODO BATTLECRUISER doesnt have weapons in proto?!
-        return bool(self._weapons) or self.type_id in {UNIT_BATTLECRUISER, UNIT_ORACLE}
+        return self._type_table.can_attack.item(self._proto.unit_type)
 
     @property
     def can_attack_both(self) -> bool:
@@ -228,62 +227,32 @@ class Unit:
     @cached_property
     def can_attack_ground(self) -> bool:
         """ Checks if the unit can attack ground units. """
-        if self.type_id in {UNIT_BATTLECRUISER, UNIT_ORACLE}:
-            return True
-        if self._weapons:
-            return any(weapon.type in TARGET_GROUND for weapon in self._weapons)
-        return False
+        return self._type_table.can_attack_ground.item(self._proto.unit_type)
 
     @cached_property
     def ground_dps(self) -> float:
         """ Returns the dps against ground units. Does not include upgrades. """
-        if self.can_attack_ground:
-            weapon = next((weapon for weapon in self._weapons if weapon.type in TARGET_GROUND), None)
-            if weapon:
-                return (weapon.damage * weapon.attacks) / weapon.speed
-        return 0
+        return self._type_table.ground_dps.item(self._proto.unit_type)
 
     @cached_property
     def ground_range(self) -> float:
         """ Returns the range against ground units. Does not include upgrades. """
-        if self.type_id == UNIT_ORACLE:
-            return 4
-        if self.type_id == UNIT_BATTLECRUISER:
-            return 6
-        if self.can_attack_ground:
-            weapon = next((weapon for weapon in self._weapons if weapon.type in TARGET_GROUND), None)
-            if weapon:
-                return weapon.range
-        return 0
+        return self._type_table.ground_range.item(self._proto.unit_type)
 
     @cached_property
     def can_attack_air(self) -> bool:
         """ Checks if the unit can air attack at all. Does not include upgrades. """
-        if self.type_id == UNIT_BATTLECRUISER:
-            return True
-        if self._weapons:
-            return any(weapon.type in TARGET_AIR for weapon in self._weapons)
-        return False
+        return self._type_table.can_attack_air.item(self._proto.unit_type)
 
     @cached_property
     def air_dps(self) -> float:
         """ Returns the dps against air units. Does not include upgrades. """
-        if self.can_attack_air:
-            weapon = next((weapon for weapon in self._weapons if weapon.type in TARGET_AIR), None)
-            if weapon:
-                return (weapon.damage * weapon.attacks) / weapon.speed
-        return 0
+        return self._type_table.air_dps.item(self._proto.unit_type)
 
     @cached_property
     def air_range(self) -> float:
         """ Returns the range against air units. Does not include upgrades. """
-        if self.type_id == UNIT_BATTLECRUISER:
-            return 6
-        if self.can_attack_air:
-            weapon = next((weapon for weapon in self._weapons if weapon.type in TARGET_AIR), None)
-            if weapon:
-                return weapon.range
-        return 0
+        return self._type_table.air_range.item(self._proto.unit_type)
 
     @cached_property
     def bonus_damage(self) -> Optional[Tuple[int, str]]:
@@ -300,19 +269,19 @@ class Unit:
     @property
     def armor(self) -> float:
         """ Returns the armor of the unit. Does not include upgrades """
-        return self._type_data._proto.armor
+        return self._type_table.armor.item(self._proto.unit_type)
 
     @property
     def sight_range(self) -> float:
         """ Returns the sight range of the unit. """
-        return self._type_data._proto.sight_range
+        return self._type_table.sight_range.item(self._proto.unit_type)
 
     @property
     def movement_speed(self) -> float:
         """Returns the movement speed of the unit.
         This is the unit movement speed on game speed 'normal'. To convert it to 'faster' movement speed, multiply it by a factor of '1.4'. E.g. reaper movement speed is listed here as 3.75, but should actually be 5.25.
         Does not include upgrades or buffs."""
-        return self._type_data._proto.movement_speed
+        return self._type_table.movement_speed.item(self._proto.unit_type)
 
     @cached_property
     def real_speed(self) -> float:
@@ -391,7 +360,9 @@ class Unit:
     @property
     def health(self) -> float:
         """ Returns the health of the unit. Does not include shields. """
-        return self._proto.health
+        if self._unit_frame is None:
+            return self._proto.health
+        return self._unit_frame.health.item(self.distance_calculation_index)
 
     @property
     def health_max(self) -> float:
@@ -408,7 +379,9 @@ class Unit:
     @property
     def shield(self) -> float:
         """ Returns the shield points the unit has. Returns 0 for non-protoss units. """
-        return self._proto.shield
+        if self._unit_frame is None:
+            return self._proto.shield
+        return self._unit_frame.shield.item(self.distance_calculation_index)
 
     @property
     def shield_max(self) -> float:
@@ -434,7 +407,9 @@ class Unit:
     @property
     def energy(self) -> float:
         """ Returns the amount of energy the unit has. Returns 0 for units without energy. """
-        return self._proto.energy
+        if self._unit_frame is None:
+            return self._proto.energy
+        return self._unit_frame.energy.item(self.distance_calculation_index)
 
     @property
     def energy_max(self) -> float:
@@ -525,7 +500,10 @@ class Unit:
     @property
     def position_tuple(self) -> Tuple[float, float]:
         """ Returns the 2d position of the unit as tuple without conversion to Point2. """
-        return self._proto.pos.x, self._proto.pos.y
+        if self._unit_frame is None:
+            return self._proto.pos.x, self._proto.pos.y
+        index = self.distance_calculation_index
+        return self._unit_frame.x.item(index), self._unit_frame.y.item(index)
 
     @cached_property
     def position(self) -> Point2:
@@ -858,17 +836,22 @@ class Unit:
 
         NOTE: This can be None if a building doesn't have a creation ability.
         For rich vespene buildings, flying terran buildings, this returns None"""
-        return self._type_data.footprint_radius
+        footprint_radius = self._type_table.footprint_radius.item(self._proto.unit_type)
+        return None if math.isnan(footprint_radius) else footprint_radius
 
     @property
     def radius(self) -> float:
         """ Half of unit size. See https://liquipedia.net/starcraft2/Unit_Statistics_(Legacy_of_the_Void) """
-        return self._proto.radius
+        if self._unit_frame is None:
+            return self._proto.radius
+        return self._unit_frame.radius.item(self.distance_calculation_index)
 
     @property
     def build_progress(self) -> float:
         """ Returns completion in range [0,1]."""
-        return self._proto.build_progress
+        if self._unit_frame is None:
+            return self._proto.build_progress
+        return self._unit_frame.build_progress.item(self.distance_calculation_index)
 
     @property
     def is_ready(self) -> bool:
@@ -900,7 +883,7 @@ class Unit:
     @cached_property
     def buffs(self) -> FrozenSet[BuffId]:
         """ Returns the set of current buffs the unit has. """
-        return frozenset(BuffId(buff_id) for buff_id in self._proto.buff_ids)
+        return frozenset(buff_id_from_value(buff_id) for buff_id in self._proto.buff_ids)
 
     @cached_property
     def is_carrying_minerals(self) -> bool:
@@ -1172,7 +1155,7 @@ class Unit:
     @property
     def cargo_size(self) -> int:
         """ Returns the amount of cargo space the unit needs. """
-        return self._type_data.cargo_size
+        return self._type_table.cargo_size.item(self._proto.unit_type)
 
     @property
     def cargo_max(self) -> int:
@@ -1215,7 +1198,9 @@ class Unit:
         else:
             unit.move(retreatPosition)"""
         if self.can_attack:
-            return self._proto.weapon_cooldown
+            if self._unit_frame is None:
+                return self._proto.weapon_cooldown
+            return self._unit_frame.weapon_cooldown.item(self.distance_calculation_index)
         return -1
 
     @property
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+from functools import cached_property
+from typing import Any, List
+
+import numpy as np
+
+from sc2.constants import IS_CLOAKED, IS_SNAPSHOT, IS_VISIBLE
+from sc2.ids.buff_id import BuffId
+
+# Bits of the UnitFrame.flags column
+FLAG_FLYING: int = 1 << 0
+FLAG_BURROWED: int = 1 << 1
+FLAG_HALLUCINATION: int = 1 << 2
+FLAG_POWERED: int = 1 << 3
+FLAG_ACTIVE: int = 1 << 4
+FLAG_CLOAKED: int = 1 << 5
+FLAG_VISIBLE: int = 1 << 6
+FLAG_SNAPSHOT: int = 1 << 7
+FLAG_IDLE: int = 1 << 8
+
+
+class UnitFrame:
+    """Column store of all units of one observation.
+
+    Row 'i' belongs to the unit with 'unit.distance_calculation_index == i', so a group of units can be
+    evaluated at once by indexing the columns with the indices of the group, e.g.::
+
+        frame = self.unit_frame
+        indices = np.array([unit.distance_calculation_index for unit in self.units])
+        low_health = frame.health[indices] < 0.5 * frame.health_max[indices]
+
+    Columns are numpy arrays which are created on first access and then kept for the rest of the frame.
+    """
+
+    def __init__(self, protos: List[Any], game_loop: int):
+        """
+        :param protos: raw units (no blips, no fake effects) in order of their distance calculation index
+        :param game_loop:
+        """
+        self._protos = protos
+        self.game_loop: int = game_loop
+        self.size: int = len(protos)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __repr__(self) -> str:
+        return f"UnitFrame(game_loop={self.game_loop}, size={self.size})"
+
+    @cached_property
+    def tag(self) -> np.ndarray:
+        return np.fromiter((p.tag for p in self._protos), dtype=np.uint64, count=self.size)
+
+    @cached_property
+    def unit_type(self) -> np.ndarray:
+        return np.fromiter((p.unit_type for p in self._protos), dtype=np.int32, count=self.size)
+
+    @cached_property
+    def alliance(self) -> np.ndarray:
+        return np.fromiter((p.alliance for p in self._protos), dtype=np.int8, count=self.size)
+
+    @cached_property
+    def positions(self) -> np.ndarray:
+        """ Array of shape (n, 2) with the 2d positions of all units. """
+        # Converts tuple [(1, 2), (3, 4)] to flat list like [1, 2, 3, 4], then back to shape (n, 2)
+        return np.fromiter(
+            (coord for p in self._protos for coord in (p.pos.x, p.pos.y)),
+            dtype=float,
+            count=2 * self.size,
+        ).reshape((-1, 2))
+
+    @cached_property
+    def x(self) -> np.ndarray:
+        return self.positions[:, 0]
+
+    @cached_property
+    def y(self) -> np.ndarray:
+        return self.positions[:, 1]
+
+    @cached_property
+    def z(self) -> np.ndarray:
+        return np.fromiter((p.pos.z for p in self._protos), dtype=float, count=self.size)
+
+    @cached_property
+    def health(self) -> np.ndarray:
+        return np.fromiter((p.health for p in self._protos), dtype=float, count=self.size)
+
+    @cached_property
+    def health_max(self) -> np.ndarray:
+        return np.fromiter((p.health_max for p in self._protos), dtype=float, count=self.size)
+
+    @cached_property
+    def shield(self) -> np.ndarray:
+        return np.fromiter((p.shield for p in self._protos), dtype=float, count=self.size)
+
+    @cached_property
+    def shield_max(self) -> np.ndarray:
+        return np.fromiter((p.shield_max for p in self._protos), dtype=float, count=self.size)
+
+    @cached_property
+    def energy(self) -> np.ndarray:
+        return np.fromiter((p.energy for p in self._protos), dtype=float, count=self.size)
+
+    @cached_property
+    def build_progress(self) -> np.ndarray:
+        return np.fromiter((p.build_progress for p in self._protos), dtype=float, count=self.size)
+
+    @cached_property
+    def radius(self) -> np.ndarray:
+        return np.fromiter((p.radius for p in self._protos), dtype=float, count=self.size)
+
+    @cached_property
+    def weapon_cooldown(self) -> np.ndarray:
+        """ Raw weapon cooldown as sent by the API, this is 0 for units that can't attack (see Unit.weapon_cooldown). """
+        return np.fromiter((p.weapon_cooldown for p in self._protos), dtype=float, count=self.size)
+
+    @cached_property
+    def flags(self) -> np.ndarray:
+        """ Bitmask of the FLAG_* constants in this file. """
+        graviton_beam: int = BuffId.GRAVITONBEAM.value
+        return np.fromiter(
+            (
+                (p.is_flying or graviton_beam in p.buff_ids) * FLAG_FLYING
+                | p.is_burrowed * FLAG_BURROWED
+                | p.is_hallucination * FLAG_HALLUCINATION
+                | p.is_powered * FLAG_POWERED
+                | p.is_active * FLAG_ACTIVE
+                | (p.cloak in IS_CLOAKED) * FLAG_CLOAKED
+                | (p.display_type == IS_VISIBLE) * FLAG_VISIBLE
+                | (p.display_type == IS_SNAPSHOT) * FLAG_SNAPSHOT
+                | (not p.orders) * FLAG_IDLE for p in self._protos
+            ),
+            dtype=np.uint16,
+            count=self.size,
+        )
+
+    def has_flag(self, flag: int) -> np.ndarray:
+        """Returns a boolean array which is True for all units that have the given flag set.
+
+        Example::
+
+            from sc2.unit_frame import FLAG_FLYING
+            flying_mask = self.unit_frame.has_flag(FLAG_FLYING)
+
+        :param flag:
+        """
+        return (self.flags & flag) != 0
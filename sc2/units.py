@@ -2,12 +2,16 @@
 from __future__ import annotations
 
 import random
-from itertools import chain
+from itertools import chain, compress
 from typing import TYPE_CHECKING, Any, Callable, Generator, Iterable, List, Optional, Set, Tuple, Union
 
+import numpy as np
+
+from sc2.constants import UNIT_COLOSSUS
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.position import Point2
 from sc2.unit import Unit
+from sc2.unit_frame import FLAG_FLYING, FLAG_IDLE, UnitFrame
 
 if TYPE_CHECKING:
     from sc2.bot_ai import BotAI
@@ -17,6 +21,9 @@ if TYPE_CHECKING:
 class Units(list):
     """A collection of Unit objects. Makes it easy to select units by selectors."""
 
+    # Groups smaller than this are evaluated unit by unit, as the numpy overhead outweighs the gain
+    VECTORIZE_MIN_UNITS: int = 16
+
     @classmethod
     def from_proto(cls, units, bot_object: BotAI):
         # pylint: disable=E1120
@@ -29,6 +36,56 @@ class Units(list):
         """
         super().__init__(units)
         self._bot_object = bot_object
+        # Unit frame and the result of _frame_indices for it, cleared by the methods below that change the list
+        self._frame_indices_cache: Optional[Tuple[UnitFrame, Optional[np.ndarray]]] = None
+
+    def append(self, unit: Unit):
+        self._frame_indices_cache = None
+        super().append(unit)
+
+    def extend(self, units: Iterable[Unit]):
+        self._frame_indices_cache = None
+        super().extend(units)
+
+    def insert(self, index: int, unit: Unit):
+        self._frame_indices_cache = None
+        super().insert(index, unit)
+
+    def remove(self, unit: Unit):
+        self._frame_indices_cache = None
+        super().remove(unit)
+
+    def pop(self, index: int = -1) -> Unit:
+        self._frame_indices_cache = None
+        return super().pop(index)
+
+    def clear(self):
+        self._frame_indices_cache = None
+        super().clear()
+
+    def sort(self, *args, **kwargs):
+        self._frame_indices_cache = None
+        super().sort(*args, **kwargs)
+
+    def reverse(self):
+        self._frame_indices_cache = None
+        super().reverse()
+
+    def __setitem__(self, index, value):
+        self._frame_indices_cache = None
+        super().__setitem__(index, value)
+
+    def __delitem__(self, index):
+        self._frame_indices_cache = None
+        super().__delitem__(index)
+
+    def __iadd__(self, units: Iterable[Unit]) -> Units:
+        self._frame_indices_cache = None
+        return super().__iadd__(units)
+
+    def __imul__(self, n: int) -> Units:
+        self._frame_indices_cache = None
+        return super().__imul__(n)
 
     def __call__(self, unit_types: Union[UnitTypeId, Iterable[UnitTypeId]]) -> Units:
         """Creates a new mutable Units object from Units or list object.
@@ -174,7 +231,19 @@ class Units(list):
         :param unit:
         :param bonus_distance:
         """
-        return self.filter(lambda x: unit.target_in_range(x, bonus_distance=bonus_distance))
+        indices = self._frame_indices()
+        if indices is None:
+            return self.filter(lambda x: unit.target_in_range(x, bonus_distance=bonus_distance))
+        frame = self._bot_object.unit_frame
+        flying = frame.has_flag(FLAG_FLYING)[indices]
+        # Same rules as Unit.target_in_range: units that can't be attacked get an attack range of NaN
+        attack_range = np.full(len(indices), np.nan)
+        if unit.can_attack_air:
+            attack_range[flying | (frame.unit_type[indices] == UNIT_COLOSSUS.value)] = unit.air_range
+        if unit.can_attack_ground:
+            attack_range[~flying] = unit.ground_range
+        max_distance = unit.radius + frame.radius[indices] + attack_range + bonus_distance
+        return self._compress(self._distances_squared_to(indices, unit) <= max_distance**2, indices)
 
     def closest_distance_to(self, position: Union[Unit, Point2]) -> float:
         """Returns the distance between the closest unit from this group to the target unit.
@@ -190,6 +259,9 @@ class Units(list):
         :param position:
         """
         assert self, "Units object is empty"
+        indices = self._frame_indices()
+        if indices is not None:
+            return self._distances_squared_to(indices, position).min().item()**0.5
         if isinstance(position, Unit):
             return min(self._bot_object._distance_squared_unit_to_unit(unit, position) for unit in self)**0.5
         return min(self._bot_object._distance_units_to_pos(self, position))
@@ -209,6 +281,9 @@ class Units(list):
         :param position:
         """
         assert self, "Units object is empty"
+        indices = self._frame_indices()
+        if indices is not None:
+            return self._distances_squared_to(indices, position).max().item()**0.5
         if isinstance(position, Unit):
             return max(self._bot_object._distance_squared_unit_to_unit(unit, position) for unit in self)**0.5
         return max(self._bot_object._distance_units_to_pos(self, position))
@@ -227,6 +302,13 @@ class Units(list):
         :param position:
         """
         assert self, "Units object is empty"
+        indices = self._frame_indices()
+        if indices is not None:
+            if self._uses_spatial_index():
+                position_tuple = position.position_tuple if isinstance(position, Unit) else position
+                row = self._bot_object._rows_closest_to(position_tuple, self._members(indices))[0]
+                return self[int(np.flatnonzero(indices == row)[0])]
+            return self[self._distances_squared_to(indices, position).argmin()]
         if isinstance(position, Unit):
             return min(
                 (unit1 for unit1 in self),
@@ -250,6 +332,9 @@ class Units(list):
         :param position:
         """
         assert self, "Units object is empty"
+        indices = self._frame_indices()
+        if indices is not None:
+            return self[self._distances_squared_to(indices, position).argmax()]
         if isinstance(position, Unit):
             return max(
                 (unit1 for unit1 in self),
@@ -274,6 +359,14 @@ class Units(list):
         """
         if not self:
             return self
+        indices = self._frame_indices()
+        if indices is not None:
+            if self._uses_spatial_index():
+                position_tuple = position.position_tuple if isinstance(position, Unit) else position
+                close = np.zeros(self._bot_object.unit_frame.size, dtype=bool)
+                close[self._bot_object._rows_closer_than(distance, position_tuple)] = True
+                return self._compress(close[indices], indices)
+            return self._compress(self._distances_squared_to(indices, position) < distance**2, indices)
         if isinstance(position, Unit):
             distance_squared = distance**2
             return self.subgroup(
@@ -299,6 +392,9 @@ class Units(list):
         """
         if not self:
             return self
+        indices = self._frame_indices()
+        if indices is not None:
+            return self._compress(distance**2 < self._distances_squared_to(indices, position), indices)
         if isinstance(position, Unit):
             distance_squared = distance**2
             return self.subgroup(
@@ -327,6 +423,10 @@ class Units(list):
         """
         if not self:
             return self
+        indices = self._frame_indices()
+        if indices is not None:
+            distances_squared = self._distances_squared_to(indices, position)
+            return self._compress((distance1**2 < distances_squared) & (distances_squared < distance2**2), indices)
         if isinstance(position, Unit):
             distance1_squared = distance1**2
             distance2_squared = distance2**2
@@ -353,6 +453,13 @@ class Units(list):
         """
         if not self:
             return self
+        if self._uses_spatial_index() and n < len(self):
+            indices = self._frame_indices()
+            if indices is not None:
+                position_tuple = position.position_tuple if isinstance(position, Unit) else position
+                rows = self._bot_object._rows_closest_to(position_tuple, self._members(indices), n)
+                unit_by_row = {row: unit for row, unit in zip(indices.tolist(), self)}
+                return self.subgroup(unit_by_row[row] for row in rows.tolist())
         return self.subgroup(self._list_sorted_by_distance_to(position)[:n])
 
     def furthest_n_units(self, position: Union[Unit, Point2], n: int) -> Units:
@@ -392,6 +499,19 @@ class Units(list):
                 return self
             return self.subgroup([])
 
+        indices = self._frame_indices()
+        if indices is not None and self._uses_spatial_index():
+            close = np.zeros(self._bot_object.unit_frame.size, dtype=bool)
+            close[self._bot_object._rows_closer_than(distance, other_units._positions_array())] = True
+            return self._compress(close[indices], indices)
+        if indices is not None:
+            positions = self._bot_object.unit_frame.positions[indices]
+            other_positions = other_units._positions_array()
+            # Squared distance matrix of shape (len(self), len(other_units))
+            differences = positions[:, np.newaxis, :] - other_positions[np.newaxis, :, :]
+            distances_squared = np.einsum("ijk,ijk->ij", differences, differences)
+            return self._compress((distances_squared < distance_squared).any(axis=1), indices)
+
         return self.subgroup(
             self_unit for self_unit in self if any(
                 self._bot_object._distance_squared_unit_to_unit(self_unit, other_unit) < distance_squared
@@ -455,6 +575,101 @@ class Units(list):
         """
         return Units(units, self._bot_object)
 
+    def _frame_indices(self) -> Optional[np.ndarray]:
+        """Returns the rows of these units in the bot's current unit frame (see unit_frame.py).
+        Returns None if the group is too small to be worth vectorizing, or if any unit is not part of the current frame
+        (e.g. units that were stored from a previous step).
+        The result is cached until the list is changed or a new frame is created."""
+        if len(self) < self.VECTORIZE_MIN_UNITS:
+            return None
+        frame = getattr(self._bot_object, "unit_frame", None)
+        if frame is None:
+            return None
+        cache = self._frame_indices_cache
+        if cache is not None and cache[0] is frame:
+            return cache[1]
+        indices: Optional[np.ndarray] = None
+        if all(unit._unit_frame is frame for unit in self):
+            indices = np.fromiter((unit.distance_calculation_index for unit in self), dtype=np.intp, count=len(self))
+        self._frame_indices_cache = (frame, indices)
+        return indices
+
+    def _compress(self, mask: np.ndarray, indices: np.ndarray) -> Units:
+        """Returns the units where the boolean mask is True, the mask has to be in the same order as this group.
+        The new group gets its rows from 'indices', so it doesn't have to look them up again.
+
+        :param mask:
+        :param indices: result of self._frame_indices()
+        """
+        units = self.subgroup(compress(self, mask.tolist()))
+        units._frame_indices_cache = (self._bot_object.unit_frame, indices[mask])
+        return units
+
+    def _filter_flag(self, flag: int, pred: Callable[[Unit], Any], expected: bool = True) -> Units:
+        """Filters by a bit of the unit frame flags column, falls back to 'pred' if the group can't be vectorized.
+
+        :param flag:
+        :param pred:
+        :param expected:
+        """
+        indices = self._frame_indices()
+        if indices is None:
+            return self.filter(pred)
+        return self._compress(self._bot_object.unit_frame.has_flag(flag)[indices] == expected, indices)
+
+    def _distances_squared_to(self, indices: np.ndarray, position: Union[Unit, Point2]) -> np.ndarray:
+        """Returns the squared distances of the units at rows 'indices' of the unit frame to a unit or position.
+
+        :param indices:
+        :param position:
+        """
+        if isinstance(position, Unit):
+            x, y = position.position_tuple
+        else:
+            x, y = position[0], position[1]
+        positions = self._bot_object.unit_frame.positions[indices]
+        return (positions[:, 0] - x)**2 + (positions[:, 1] - y)**2
+
+    def _uses_spatial_index(self) -> bool:
+        """ Returns True if the bot uses distance method 4, which answers radius and nearest neighbour queries from a KD-tree. """
+        return getattr(self._bot_object, "distance_calculation_method", None) == 4
+
+    def _members(self, indices: np.ndarray) -> np.ndarray:
+        """Returns a boolean array of the size of the unit frame which is True at the rows of this group.
+
+        :param indices:
+        """
+        members = np.zeros(self._bot_object.unit_frame.size, dtype=bool)
+        members[indices] = True
+        return members
+
+    def _positions_array(self) -> np.ndarray:
+        """ Returns the positions of these units as array of shape (n, 2). """
+        indices = self._frame_indices()
+        if indices is not None:
+            return self._bot_object.unit_frame.positions[indices]
+        return np.fromiter(
+            (coord for unit in self for coord in unit.position_tuple),
+            dtype=float,
+            count=2 * len(self),
+        ).reshape((-1, 2))
+
+    def unit_type_values(self, column: str) -> np.ndarray:
+        """Returns a column of GameData.unit_type_table for these units, in the order of this Units object.
+
+        Example::
+
+            army_ground_dps = self.units.unit_type_values("ground_dps").sum()
+
+        :param column: one of UnitTypeTable.BOOL_COLUMNS, FLOAT_COLUMNS or INT_COLUMNS
+        """
+        indices = self._frame_indices()
+        if indices is not None:
+            unit_types = self._bot_object.unit_frame.unit_type[indices]
+        else:
+            unit_types = np.fromiter((unit._proto.unit_type for unit in self), dtype=np.int32, count=len(self))
+        return self._bot_object.game_data.unit_type_table.gather(column, unit_types)
+
     def filter(self, pred: Callable[[Unit], Any]) -> Units:
         """Filters the current Units object and returns a new Units object.
 
@@ -487,6 +702,12 @@ class Units(list):
         :param position:
         :param reverse:
         """
+        indices = self._frame_indices()
+        if indices is not None:
+            distances_squared = self._distances_squared_to(indices, position)
+            # Stable sort to keep the order of units with equal distances the same as 'sorted'
+            order = np.argsort(-distances_squared if reverse else distances_squared, kind="stable")
+            return [self[i] for i in order.tolist()]
         if isinstance(position, Unit):
             return sorted(
                 self, key=lambda unit: self._bot_object._distance_squared_unit_to_unit(unit, position), reverse=reverse
@@ -636,6 +857,9 @@ class Units(list):
     def center(self) -> Point2:
         """ Returns the central position of all units. """
         assert self, "Units object is empty"
+        indices = self._frame_indices()
+        if indices is not None:
+            return Point2(self._bot_object.unit_frame.positions[indices].mean(axis=0).tolist())
         return Point2(
             (
                 sum(unit._proto.pos.x for unit in self) / self.amount,
@@ -656,17 +880,23 @@ class Units(list):
     @property
     def ready(self) -> Units:
         """ Returns all structures that are ready (construction complete). """
+        indices = self._frame_indices()
+        if indices is not None:
+            return self._compress(self._bot_object.unit_frame.build_progress[indices] == 1, indices)
         return self.filter(lambda unit: unit.is_ready)
 
     @property
     def not_ready(self) -> Units:
         """ Returns all structures that are not ready (construction not complete). """
+        indices = self._frame_indices()
+        if indices is not None:
+            return self._compress(self._bot_object.unit_frame.build_progress[indices] != 1, indices)
         return self.filter(lambda unit: not unit.is_ready)
 
     @property
     def idle(self) -> Units:
         """ Returns all units or structures that are doing nothing (unit is standing still, structure is doing nothing). """
-        return self.filter(lambda unit: unit.is_idle)
+        return self._filter_flag(FLAG_IDLE, lambda unit: unit.is_idle)
 
     @property
     def owned(self) -> Units:
@@ -681,12 +911,12 @@ class Units(list):
     @property
     def flying(self) -> Units:
         """ Returns all units that are flying. """
-        return self.filter(lambda unit: unit.is_flying)
+        return self._filter_flag(FLAG_FLYING, lambda unit: unit.is_flying)
 
     @property
     def not_flying(self) -> Units:
         """ Returns all units that not are flying. """
-        return self.filter(lambda unit: not unit.is_flying)
+        return self._filter_flag(FLAG_FLYING, lambda unit: not unit.is_flying, expected=False)
 
     @property
     def structure(self) -> Units:
@@ -0,0 +1,61 @@
+"""
+Replays a capture with the ReplayWebSocket, without SC2.
+"""
+import asyncio
+
+from s2clientprotocol import data_pb2 as data_pb
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from sc2.capture import CaptureWriter, ReplayWebSocket
+from sc2.client import Client
+from sc2.game_data import GameData
+from sc2.game_data_cache import GameDataCache
+
+PING = sc_pb.ResponsePing(game_version="4.10.0", data_version="ABCDEF", data_build=75689, base_build=75689)
+DATA = sc_pb.ResponseData(
+    abilities=[data_pb.AbilityData(ability_id=1, available=True, link_name="Smart", button_name="Smart")]
+)
+
+
+def write_game_start(path):
+    """ Writes the requests and responses of the start of a game that was played without a game data cache. """
+    with CaptureWriter(path) as writer:
+        for request, response in [
+            (sc_pb.Request(ping=sc_pb.RequestPing()), sc_pb.Response(ping=PING)),
+            (
+                sc_pb.Request(
+                    data=sc_pb.RequestData(
+                        ability_id=True, unit_type_id=True, upgrade_id=True, buff_id=True, effect_id=True
+                    )
+                ),
+                sc_pb.Response(data=DATA),
+            ),
+            (
+                sc_pb.Request(game_info=sc_pb.RequestGameInfo()),
+                sc_pb.Response(game_info=sc_pb.ResponseGameInfo(map_name="Test Map")),
+            ),
+        ]:
+            response.status = sc_pb.Status.in_game
+            writer.write_request(request)
+            writer.write_response(response)
+
+
+async def replay_game_start(path, cache_dir):
+    client = Client(ReplayWebSocket(path))
+    ping = await client.ping()
+    game_data = await client.get_game_data(cache_dir, ping.ping)
+    game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
+    return game_data, game_info.game_info
+
+
+def test_replay_cold_capture_with_warm_game_data_cache(tmp_path):
+    capture_path = tmp_path / "game.sc2cap"
+    write_game_start(capture_path)
+    cache_dir = tmp_path / "game_data_cache"
+    GameDataCache(cache_dir).save(PING, DATA, GameData(DATA))
+    assert GameDataCache(cache_dir).load(PING) is not None
+
+    game_data, game_info = asyncio.run(replay_game_start(capture_path, cache_dir))
+
+    assert 1 in game_data.abilities
+    assert game_info.map_name == "Test Map"
@@ -0,0 +1,38 @@
+"""
+Distance matrices of the units of a frame, calculated without SC2.
+"""
+import numpy as np
+from s2clientprotocol import common_pb2 as common_pb
+from s2clientprotocol import raw_pb2 as raw_pb
+
+from sc2.bot_ai import BotAI
+from sc2.unit_frame import UnitFrame
+
+
+def mineral_field(tag, x, y):
+    return raw_pb.Unit(tag=tag, unit_type=341, alliance=3, pos=common_pb.Point(x=x, y=y), radius=1)
+
+
+def marine(tag, x, y):
+    return raw_pb.Unit(tag=tag, unit_type=48, alliance=1, pos=common_pb.Point(x=x, y=y), radius=0.375)
+
+
+def distances_of_frame(bot, static_units, dynamic_units, game_loop):
+    bot._static_units_count = len(static_units)
+    bot.unit_frame = UnitFrame(static_units + dynamic_units, game_loop)
+    return bot._cdist_with_static_block(bot.unit_frame.positions)
+
+
+def test_distances_kept_across_frames_do_not_change():
+    bot = BotAI()
+    bot._initialize_variables()
+    static_units = [mineral_field(1, 10, 10), mineral_field(2, 12, 10)]
+
+    first = distances_of_frame(bot, static_units, [marine(3, 20, 10)], 1)
+    first_values = first.copy()
+    second = distances_of_frame(bot, static_units, [marine(3, 30, 10), marine(4, 40, 10)], 2)
+
+    np.testing.assert_array_equal(first, first_values)
+    assert first[0, 2] == 100
+    assert second[0, 2] == 400
+    assert second[1, 3] == 784
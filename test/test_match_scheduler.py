@@ -0,0 +1,42 @@
+"""
+Runs the MatchScheduler with a stand-in for run_match, without SC2.
+"""
+import multiprocessing
+import sys
+from types import SimpleNamespace
+
+from sc2 import match_scheduler
+from sc2.data import Difficulty, Race, Result
+from sc2.main import GameMatch
+from sc2.match_scheduler import MatchScheduler
+from sc2.player import Computer
+
+
+async def fake_maintain_SCII_count(count, controllers, proc_args=None):
+    pass
+
+
+async def fake_run_match(controllers, match, close_ws=False):
+    if match.map_sc2.name == "Exit":
+        # Like SC2Process._connect when the client can't be reached
+        sys.exit(2)
+    return {player: Result.Victory for player in match.players}
+
+
+def test_match_that_exits_does_not_end_the_run(monkeypatch):
+    # The worker processes are forked, so they use the stand-ins
+    monkeypatch.setattr(match_scheduler, "maintain_SCII_count", fake_maintain_SCII_count)
+    monkeypatch.setattr(match_scheduler, "run_match", fake_run_match)
+    matches = [
+        GameMatch(
+            SimpleNamespace(name=name),
+            [Computer(Race.Terran, Difficulty.Easy), Computer(Race.Zerg, Difficulty.Easy)],
+        ) for name in ["First", "Exit", "Third"]
+    ]
+
+    scheduler = MatchScheduler(concurrency=2, retries=1, mp_context=multiprocessing.get_context("fork"))
+    results = dict(scheduler.run(matches))
+
+    assert results[1] is None
+    for index in [0, 2]:
+        assert list(results[index].values()) == [Result.Victory, Result.Victory]
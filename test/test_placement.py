@@ -0,0 +1,74 @@
+"""
+Building placement computed by the placement engine, without SC2.
+"""
+from types import SimpleNamespace
+
+import numpy as np
+from s2clientprotocol import common_pb2 as common_pb
+from s2clientprotocol import data_pb2 as data_pb
+from s2clientprotocol import raw_pb2 as raw_pb
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from sc2.bot_ai import BotAI
+from sc2.game_data import GameData
+from sc2.ids.ability_id import AbilityId
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.placement_engine import PlacementEngine
+from sc2.position import Point2
+from sc2.unit import Unit
+from sc2.units import Units
+
+GEYSERS = [(20.5, 20.5), (40.5, 20.5)]
+
+
+def test_geyser_mask():
+    # Geysers are not placeable in the placement grid
+    engine = PlacementEngine(np.zeros((64, 64), dtype=np.uint8))
+
+    assert not engine.mask(3).any()
+    mask = engine.geyser_mask(GEYSERS, 3)
+    assert list(zip(*np.nonzero(mask))) == [(20, 20), (20, 40)]
+
+
+def refinery_bot() -> BotAI:
+    """ A bot on an empty map with two geysers, one of which has a refinery. """
+    bot = BotAI()
+    bot._initialize_variables()
+    bot.game_data = GameData(
+        sc_pb.ResponseData(
+            abilities=[
+                data_pb.AbilityData(
+                    ability_id=AbilityId.TERRANBUILD_REFINERY.value, available=True, footprint_radius=1.5
+                )
+            ],
+            units=[
+                data_pb.UnitTypeData(
+                    unit_id=UnitTypeId.REFINERY.value,
+                    available=True,
+                    ability_id=AbilityId.TERRANBUILD_REFINERY.value,
+                    race=common_pb.Terran,
+                ),
+                data_pb.UnitTypeData(unit_id=UnitTypeId.VESPENEGEYSER.value, available=True),
+            ],
+        )
+    )
+    bot.game_info = SimpleNamespace(placement_grid=SimpleNamespace(data_numpy=np.ones((64, 64), dtype=np.uint8)))
+    bot.state = SimpleNamespace(game_loop=1)
+
+    def unit(unit_type, alliance, x, y):
+        return Unit(
+            raw_pb.Unit(unit_type=unit_type.value, alliance=alliance, pos=common_pb.Point(x=x, y=y), radius=1.8),
+            bot,
+        )
+
+    bot.vespene_geyser = Units([unit(UnitTypeId.VESPENEGEYSER, 3, x, y) for x, y in GEYSERS], bot)
+    bot.resources = bot.vespene_geyser
+    bot.structures = Units([unit(UnitTypeId.REFINERY, 1, *GEYSERS[1])], bot)
+    return bot
+
+
+def test_placement_positions_of_gas_buildings_are_free_geysers():
+    bot = refinery_bot()
+
+    assert bot.placement_positions(UnitTypeId.REFINERY, Point2((30, 20)), 20) == [Point2(GEYSERS[0])]
+    assert not bot.placement_mask(UnitTypeId.REFINERY, Point2((50, 50)), 10).any()